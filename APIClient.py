@@ -1,20 +1,174 @@
 import spotipy
 from spotipy.oauth2 import SpotifyOAuth
 
-from datetime import datetime
+from ResponseCache import ResponseCache
+from Scheduler import Scheduler, RateLimited, RequestExpired
+from PlaybackState import PlaybackState
+from MetadataStore import MetadataStore
+from Metrics import Metrics
+from Formatter import Formatter
+from DeviceRegistry import DeviceRegistry
 
-def current_time():
-    return f"{datetime.now():%d.%m.%y (%H:%M:%S)}"
+import json
+import requests
+import threading
+import time
+
+from concurrent.futures import Future, ThreadPoolExecutor, wait, FIRST_COMPLETED
+from contextlib import contextmanager
+from contextvars import ContextVar, copy_context
+from functools import partial
+from urllib3.util.retry import Retry
+
+from Logger import console
+
+class Superseded(Exception):
+    '''
+    An exception that's raised instead of making a Spotify call for a command that was replaced by a newer one (see `RequestScope`).
+    '''
+
+class RequestScope(object):
+    '''
+    A class that keeps track of the Spotify calls made while handling one websocket command.
+    Reads are remembered for the rest of the command, so asking for the same endpoint with the same arguments twice only calls Spotify once.
+    Once the command's `cancelled` event is set, the rest of its calls raise `Superseded` instead of being made.
+    '''
+    calls: int                 = 0
+    response_bytes: int        = 0    # How big the bodies of the Spotify responses were
+    error: Exception           = None # Set if one of the calls was rate limited or dropped by the scheduler
+    cancelled: threading.Event = None # Set once nobody is waiting for the command anymore
+    _results: dict             = None
+    _lock: threading.Lock      = None
+    
+    def __init__(self, cancelled: threading.Event = None):
+        self._results  = {}
+        self._lock     = threading.Lock()
+        self.cancelled = cancelled
+    
+    def count(self):
+        with self._lock:
+            self.calls += 1
+    
+    def received(self, size: int):
+        with self._lock:
+            self.response_bytes += size
+    
+    def check(self):
+        if (self.cancelled is not None) and (self.cancelled.is_set()):
+            raise Superseded()
+    
+    def forget(self):
+        '''
+        A function that forgets the remembered reads, used after an action changed something on Spotify's side.
+        '''
+        
+        with self._lock:
+            self._results.clear()
+
+_scope: ContextVar    = ContextVar("request_scope", default=None)  # The RequestScope of the command that's currently being handled
+_received: ContextVar = ContextVar("received_bytes", default=None) # The response sizes of the Spotify call that's currently being made
+
+# The pool that runs the independent parts of composite views side by side. It's separate from the server's command pool,
+# so a command waiting on its parts can never take the threads those parts need
+FANOUT: int = 8 # How many calls of one view (or of the views of every command) run at the same time
+_fanout: ThreadPoolExecutor = ThreadPoolExecutor(max_workers=FANOUT, thread_name_prefix="spotify-fanout")
+
+# The pages of streams and library syncs are fetched on their own pool, so a long playlist never queues ahead of the views of other users
+PAGING: int = 8
+_paging: ThreadPoolExecutor = ThreadPoolExecutor(max_workers=PAGING, thread_name_prefix="spotify-paging")
+
+# The calls of the background work (prefetches and library syncs) run on a small pool of their own, so a burst of prefetches never
+# takes the fan-out or paging threads a user's view is waiting for
+BACKGROUND: int = 3 # Enough for the three parts of an artist view
+_background: ThreadPoolExecutor = ThreadPoolExecutor(max_workers=BACKGROUND, thread_name_prefix="spotify-background")
+
+def pool(shared: ThreadPoolExecutor) -> ThreadPoolExecutor:
+    '''
+    A function that returns the pool the parts of the current call go to: the background pool in the prefetch lane, the given one otherwise.
+    '''
+    
+    return _background if (Scheduler.current() == Scheduler.PREFETCH) else shared
+
+def make_session(pool_size: int) -> requests.Session:
+    '''
+    A function that returns the HTTP session the Spotify calls and token refreshes of an account share, with enough kept alive
+    connections for every thread that can make a call at the same time (so none of them has to open a new TLS connection).
+    
+    :param pool_size:
+        How many connections to keep open to each Spotify host
+    '''
+    
+    # Like spotipy's own session, connection errors and 5xx are retried but a read that timed out isn't (the call might have gone through)
+    retry: Retry = Retry(total=3, connect=None, read=False, status=3, backoff_factor=0.3, status_forcelist=(500, 502, 503, 504),
+                         allowed_methods=frozenset(["GET", "POST", "PUT", "DELETE"]))
+    adapter: requests.adapters.HTTPAdapter = requests.adapters.HTTPAdapter(pool_connections=2, pool_maxsize=pool_size, max_retries=retry)
+    
+    session: requests.Session = requests.Session()
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    
+    return session
 
 class APIClient(object):
     '''
     A class to handle the Spotify API with special functions for formatting and returning specific API call results.
     '''
     _api: spotipy.Spotify = None
-    _device: str = None
+    _devices: DeviceRegistry = None
     _debug: bool = False
+    _log: callable = None # Where the debug lines go, the server's Logger or the console
+    _cache: ResponseCache = None
+    _scheduler: Scheduler = None
+    _state: PlaybackState = None
+    _store: MetadataStore = None
+    _snapshots: ResponseCache = None # Playlist URI -> the playlist without its tracks and when it was seen
+    _metrics: Metrics = None
+    _formatter: Formatter = None
+    _measured: bool = False # If the Spotify client's HTTP session reports the size of every response
+    _in_flight: dict = None
+    _in_flight_lock: threading.Lock = None
+    
+    coalesced: int = 0 # How many reads shared the result of an identical read that was already in flight
+    token_refreshes: int = 0 # How many times the token was refreshed ahead of time
+    
+    REFRESH_MARGIN: int = 300 # How many seconds before the token expires it's refreshed in the background (spotipy itself waits until 60 are left)
     
-    def __init__(self, client_id: str, client_secret: str, redirect_uri: str, scope: str):
+    # The biggest page size Spotify allows for each paginated endpoint
+    PAGE_SIZES: dict = {
+        "playlist_tracks":           100,
+        "current_user_saved_tracks": 50,
+        "current_user_playlists":    50,
+        "album_tracks":              50,
+    }
+    
+    # How many seconds the formatted payload of each view stays cached. Albums and artists barely ever change, the queue does.
+    # The pages of a playlist are kept by its snapshot, so they can't go stale, but the Liked Songs don't have one
+    CACHE_TTLS: dict = {
+        "album":     86400,
+        "artist":    3600,
+        "search":    600,
+        "playlist":  86400,
+        "liked":     60,
+        "playlists": 60,
+        "queue":     5,
+    }
+    
+    PAGE_WINDOW: int = 4 # How many pages of one stream (or library sync) are fetched at the same time
+    
+    STORED: tuple = ("album", "artist", "playlist") # The views whose payloads are kept in the on-disk store, by the same name
+    
+    SNAPSHOT_TTL: int = 5 # How many seconds the snapshot of a playlist is trusted before it's checked with Spotify again
+    SNAPSHOTS: int    = 2000 # How many playlists the last seen snapshots are kept of, the least recently used ones are forgotten first
+    
+    # The parts of a playlist its pages are made with, asked for on their own so checking its snapshot doesn't fetch any tracks
+    PLAYLIST_FIELDS: str = "name,uri,images,owner.display_name,snapshot_id,tracks.total"
+    
+    # The parts of a track its rows (and the library index) are made with, for the endpoints that take Spotify's `fields` parameter
+    TRACK_FIELDS: str = "name,uri,artists(name),album(name,images)"
+    
+    def __init__(self, client_id: str, client_secret: str, redirect_uri: str, scope: str, cache_size: int = 256, rate: float = 10.0, burst: int = 20,
+                 store: MetadataStore = None, cache_path: str = None, api: spotipy.Spotify = None, metrics: Metrics = None, image_size: int = None,
+                 workers: int = 4, timeout: float = 5.0, devices: list[str] = None, device_ttl: float = 30.0, log: callable = None):
         '''
         A constructor for the APIClient class.
         
@@ -26,65 +180,343 @@ class APIClient(object):
             One of your Spotify application's redirect URIs
         :param scope:
             The scopes you want to use for the API
+        :param cache_size:
+            The maximum amount of formatted payloads kept in the response cache
+        :param rate:
+            How many Spotify calls per second the scheduler lets through on average
+        :param burst:
+            How many Spotify calls the scheduler lets through at once after being idle
+        :param store:
+            The on-disk store of catalog payloads to share, if there is one
+        :param cache_path:
+            The file the account's token is cached in (spotipy's default if it's `None`)
+        :param api:
+            The Spotify client to use instead of logging in, like the FakeSpotify backend of the benchmarks
+        :param metrics:
+            Where to record the latency and errors of every Spotify call, if anywhere
+        :param image_size:
+            The width in pixels of the pictures the client shows, the biggest picture is sent if it's `None`
+        :param workers:
+            How many commands can make Spotify calls at the same time, the connection pool is sized for them and the fan-out calls
+        :param timeout:
+            How many seconds a Spotify call (or token refresh) can wait for an answer before it fails
+        :param devices:
+            The names or IDs of the devices to play from, in order of preference (the active device is used if none of them is there)
+        :param device_ttl:
+            How many seconds the device list is trusted before it's looked up again
+        :param log:
+            The function that writes the messages of the client and its scheduler (like `Logger.log`), they're printed if it's `None`
+        '''
+        # 429s aren't retried by the session, the scheduler handles them (and their Retry-After) for every call of the account.
+        # The fan-out, paging, and background pools, the playback poller, and the library sync make calls too, so they get connections of their own
+        if (api is None):
+            session: requests.Session = make_session(pool_size=workers + FANOUT + PAGING + BACKGROUND + 2)
+            auth: SpotifyOAuth        = SpotifyOAuth(client_id=client_id, client_secret=client_secret, redirect_uri=redirect_uri, scope=scope, cache_path=cache_path,
+                                                     requests_session=session, requests_timeout=timeout)
+            api = spotipy.Spotify(auth_manager=auth, requests_session=session, requests_timeout=timeout)
+        
+        self._log       = log or console
+        self._api       = api
+        self._cache     = ResponseCache(self.CACHE_TTLS, max_size=cache_size)
+        self._scheduler = Scheduler(rate=rate, burst=burst, log=self._log)
+        self._state     = PlaybackState()
+        self._devices   = DeviceRegistry(lambda: self.fetch("devices")["devices"], preferred=devices, ttl=device_ttl)
+        self._store     = store
+        self._snapshots = ResponseCache({"playlist": self.CACHE_TTLS["playlist"]}, max_size=self.SNAPSHOTS) # Kept as long as their pages
+        self._metrics   = metrics
+        self._formatter = Formatter(image_size=image_size)
+        
+        # spotipy makes its calls with a requests session, whose response hook sees the size of every response body
+        if (getattr(self._api, "_session", None) is not None):
+            self._api._session.hooks["response"].append(self.measure)
+            self._measured = True
+        
+        self._in_flight      = {}
+        self._in_flight_lock = threading.Lock()
+        self._log("Connected to Spotify")
+    
+    @contextmanager
+    def request_scope(self, cancelled: threading.Event = None, scope: RequestScope = None):
+        '''
+        A context manager that makes every Spotify call inside of it count towards (and be remembered by) a new RequestScope.
+        
+        :param cancelled:
+            An event that stops the rest of the calls once it's set, for commands that can be replaced by newer ones
+        :param scope:
+            The RequestScope to use instead of a new one, for commands that make their calls in several steps (like the streams)
+        
+        :return scope:
+            The RequestScope, whose `calls` tell how many Spotify calls were made inside of the context
+        '''
+        
+        scope = scope or RequestScope(cancelled)
+        token = _scope.set(scope)
+        try:
+            yield scope
+        finally:
+            _scope.reset(token)
+    
+    def request(self, func: callable, *args, **kwargs):
+        '''
+        A function that makes a Spotify call through the account's scheduler, so it's rate limited and prioritized by the lane it's in.
+        If the scheduler gives up on the call, the reason is kept in the current RequestScope before the exception is raised.
+        The call's latency (including its wait in the scheduler) and the size of its response are recorded in the metrics.
+        
+        :param func:
+            The `spotipy.Spotify` function to call
+        :param args:
+            The arguments to pass to the function
+        :param kwargs:
+            The keyword arguments to pass to the function
+        '''
+        
+        start: float               = time.perf_counter()
+        failed: bool               = True
+        received: list             = [0] # Filled in by `measure`, a list so the retries of the scheduler add up
+        token                      = _received.set(received)
+        scope: RequestScope | None = _scope.get()
+        
+        def make(*args, **kwargs): # The command might have been replaced while the call waited for its turn
+            scope.check() if (scope is not None) else None
+            return func(*args, **kwargs)
+        
+        try:
+            scope.check() if (scope is not None) else None
+            result = self._scheduler.run(make, *args, **kwargs)
+            failed = False
+            
+            if (not self._measured): # Clients without HTTP (like the made up backend) are measured by the size of their JSON
+                received[0] = len(json.dumps(result))
+            
+            return result
+        except (RateLimited, RequestExpired) as e:
+            if (scope is not None):
+                scope.error = e
+            raise
+        except Superseded: # Not a Spotify call, so it isn't recorded as one
+            failed = None
+            raise
+        finally:
+            _received.reset(token)
+            scope.received(received[0]) if (scope is not None) else None
+            self._metrics.upstream(func.__name__, time.perf_counter() - start, error=failed, response_bytes=received[0]) if (self._metrics) and (failed is not None) else None
+    
+    def measure(self, response, *args, **kwargs):
+        '''
+        A response hook for spotipy's requests session, it adds the size of the response body to the Spotify call that's being made.
+        
+        :param response:
+            The `requests.Response`
+        '''
+        
+        received: list | None = _received.get()
+        if (received is not None):
+            received[0] += len(response.content)
+    
+    def fetch_all(self, *requests: callable) -> list:
+        '''
+        A function that runs the given requests at the same time and waits for all of them, so a view made of several
+        independent calls takes about as long as its slowest call instead of all of them added up.
+        
+        :param requests:
+            The functions to run, usually `partial(self.fetch, endpoint, ...)`
+        
+        :return results:
+            The results in the same order as the requests. If a request failed, its exception is returned in its place
+            so the caller can decide whether that part is needed or not
+        '''
+        
+        # Every request gets a copy of the caller's context, so its calls still count towards the command's RequestScope
+        futures: list = [pool(_fanout).submit(copy_context().run, x) for x in requests]
+        results: list = []
+        
+        for future in futures:
+            try:
+                results.append(future.result())
+            except Exception as e:
+                results.append(e)
+        
+        return results
+    
+    def fetch(self, endpoint: str, *args, **kwargs):
+        '''
+        A function that reads from the given Spotify endpoint, only once per RequestScope for the same arguments.
+        If the exact same read is already in flight for another command (or connection), it waits for that one and shares its result.
+        
+        Results can be shared between commands, so they must not be modified.
+        
+        :param endpoint:
+            The name of the `spotipy.Spotify` function to call
+        :param args:
+            The arguments to pass to the function
+        :param kwargs:
+            The keyword arguments to pass to the function
+        '''
+        
+        key: tuple                 = (endpoint, args, tuple(sorted(kwargs.items())))
+        scope: RequestScope | None = _scope.get()
+        
+        if (scope is not None):
+            with scope._lock:
+                if (key in scope._results):
+                    return scope._results[key]
+        
+        result = self.fetch_once(key, endpoint, *args, **kwargs)
+        
+        if (scope is not None):
+            with scope._lock:
+                scope._results[key] = result
+        
+        return result
+    
+    def fetch_once(self, key: tuple, endpoint: str, *args, **kwargs):
         '''
-        self._api = spotipy.Spotify(auth_manager=SpotifyOAuth(client_id=client_id, client_secret=client_secret, redirect_uri=redirect_uri, scope=scope))
-        print(current_time(), "Connected to Spotify")
+        A function that makes identical reads that happen at the same time share one Spotify call (single-flight).
+        The first caller makes the call, everyone who asks for the same key while it's in flight waits for its result (or exception).
+        A read only waits for a call of its own lane or a more urgent one, so a user's read never waits behind a prefetch.
+        
+        :param key:
+            The key of the read, the endpoint plus its arguments
+        :param endpoint:
+            The name of the `spotipy.Spotify` function to call
+        '''
+        
+        lane: int                  = Scheduler.current()
+        scope: RequestScope | None = _scope.get()
+        
+        with self._in_flight_lock:
+            joined: list          = [x for x in range(lane + 1) if ((x, key) in self._in_flight)] # The calls in flight that are at least as urgent
+            future: Future | None = self._in_flight[(joined[0], key)] if (joined) else None
+            leader: bool          = future is None
+            
+            if (leader):
+                future = self._in_flight[(lane, key)] = Future()
+            else:
+                self.coalesced += 1
+        
+        if (not leader):
+            try:
+                return future.result()
+            except Superseded: # The read was given up by the command that made it, not by Spotify, so it's made again
+                return self.fetch_once(key, endpoint, *args, **kwargs)
+            except (RateLimited, RequestExpired) as e:
+                if (isinstance(e, RequestExpired) and joined[0] != lane): # The other lane gave up sooner than this one would have
+                    return self.fetch_once(key, endpoint, *args, **kwargs)
+                if (scope is not None): # The command has to know why, the same as if it made the call itself
+                    scope.error = e
+                raise
+        
+        scope.count() if (scope is not None) else None
+        
+        try:
+            try:
+                result = self.request(getattr(self._api, endpoint), *args, **kwargs)
+                self._state.sync(result) if (endpoint == "current_playback") else None # Every read of the playback reconciles the local model
+            finally: # Taken out before the waiting reads wake up, so the ones that make it again can't join the call that just ended
+                with self._in_flight_lock:
+                    del self._in_flight[(lane, key)]
+        except Exception as e:
+            future.set_exception(e)
+            raise
+        
+        future.set_result(result)
+        return result
     
-    def find_device(self, *device_id: str):
+    def refresh_token(self) -> float | None:
         '''
-        A function that finds an available device to play from.
-        Raises an exception if it can't find any.
+        A function that refreshes the token if it expires within `REFRESH_MARGIN` seconds, so no command has to wait for the refresh.
         
-        :param device_id:
-            The ID of the device to use if the user specified one, otherwise the first available device will be used
+        :return wait:
+            How many seconds until the token needs to be refreshed again, or `None` if the client has no token to refresh
         '''
         
-        if (self._device):
+        auth: SpotifyOAuth | None = getattr(self._api, "auth_manager", None)
+        if (not isinstance(auth, SpotifyOAuth)):
             return None
+        
+        token: dict | None = auth.cache_handler.get_cached_token()
+        if (token is None):
+            return None
+        
+        if (token["expires_at"] - time.time() <= self.REFRESH_MARGIN):
+            token = auth.refresh_access_token(token["refresh_token"])
+            self.token_refreshes += 1
+            self._log("Refreshed the token") if self._debug else None
+        
+        return max(1.0, token["expires_at"] - time.time() - self.REFRESH_MARGIN)
     
-        device_list: list = self._api.devices()['devices']
+    def find_device(self, refresh: bool = False) -> str | None:
+        '''
+        A function that returns the ID of the device to play from, the devices are only looked up if the last lookup is too old.
+        It never asks which device to use, the preferred devices are picked first, then the active one, then the first one.
+        
+        :param refresh:
+            If the devices should be looked up even if the last lookup is recent
+        '''
+        
+        device: str | None = self._devices.current(refresh=refresh)
         
-        if (not device_list):
-            print("[ERROR] No active devices found")
+        if (device is None):
+            self._log("[ERROR] No active devices found") if self._debug else None
         else:
-            if (len(device_list) == 1):
-                self._device = self._api.devices()['devices'][0]['id']
-            elif (len(device_list) > 1) and (device_id):
-                self._device = [x for x in device_list if x['id'] == device_id][0]['id']
-            else:
-                run: bool = True
-                while (run):
-                    for (i, x) in enumerate(device_list):
-                        print(f"[{i}]: Device: {x['name']}")
-                    _ = int(input("Please enter the index of the device to use: "))
-                    
-                    if (device_list[_]['id']):
-                        self._device = device_list[_]['id']
-                        run = False
-                        break
-                    else:
-                        print("[ERROR] Invalid index")
-
-            print(f"Active device: {self._device}") if self._debug else None
+            self._log(f"Active device: {device}") if self._debug else None
+        
+        return device
     
-    def run_action(self, action: callable, *args):
+    def refresh_devices(self) -> list[dict]:
+        '''
+        A function that looks up the devices of the account again, it's meant to run in the background so its call goes through the
+        scheduler's prefetch lane.
         '''
-        A function that attempts to run the given action with the given arguments and if it can't, it will attempt to run it with the stored device ID.
+        
+        with Scheduler.lane(Scheduler.PREFETCH):
+            return self._devices.refresh()
+    
+    def run_action(self, action: callable, *args, **kwargs):
+        '''
+        A function that attempts to run the given action with the given arguments on the device to play from.
         This is only useful for actions that require there to be an active device, such as pausing/resuming playback.
+        If the device is gone, the action is tried once more on the next device. Raises the error if it didn't go through.
         
         :param action:
             The function to call
         :param args:
             The arguments to pass to the function
+        :param kwargs:
+            The keyword arguments to pass to the function (besides the `device_id`)
         '''
         
-        self.find_device()
+        device: str | None = self.find_device()
         
-        try:
-            action(*args, self._device) if args else action(device_id = self._device)
-            print(f"[SUCCESS] Action '{action}' ran successfully") if self._debug else None
-        except:
-            print("[ERROR] Device not found")
+        scope: RequestScope | None = _scope.get()
+        if (scope is not None):
+            scope.count()
+            scope.forget() # Whatever was read before the action might not be true anymore
+        
+        for attempt in range(2):
+            try:
+                self.request(action, *args, device_id=device, **kwargs)
+                self._log(f"[SUCCESS] Action '{action.__name__}' ran successfully") if self._debug else None
+                return None
+            except (RateLimited, RequestExpired): # The command has to know it didn't go through
+                self._state.expire()
+                raise
+            except Exception as e:
+                following: str | None = None
+                if (attempt == 0) and (DeviceRegistry.gone(e)):
+                    try:
+                        following = self._devices.fail(device)
+                    except Exception as error:
+                        self._log(f"[ERROR] Looking up the devices failed: {error}") if self._debug else None
+                
+                if (following is not None):
+                    self._log(f"[DEVICE] Device {device} is gone, retrying '{action.__name__}' on {following}") if self._debug else None
+                    device = following
+                    continue
+                
+                self._state.expire() # Whatever the command changes optimistically didn't actually happen
+                self._log(f"[ERROR] Action '{action.__name__}' failed: {e}") if self._debug else None
+                raise
     
     def get_playback_states(self, shuffle = "read", repeat = "read", playing = "read") -> str:
         '''
@@ -102,8 +534,41 @@ class APIClient(object):
             `[INIT]\t{shuffle}\t{repeat}\t{playing}`
         '''
         
+        return self.format_playback_states(self.playback(), shuffle, repeat, playing)
+    
+    def playback(self) -> dict | None:
+        '''
+        A function that returns the playback in the shape of a `current_playback` result. It's answered from the local playback model
+        while that can be trusted, otherwise it's read from Spotify (which also reconciles the model).
+        
+        :return result:
+            The `current_playback` dictionary, `None` if there's no active playback
+        '''
+        
+        if (self._state.fresh()):
+            return self._state.as_result()
+        
+        return self.fetch("current_playback")
+    
+    def format_playback_states(self, result: dict, shuffle = "read", repeat = "read", playing = "read") -> str:
+        '''
+        A function that formats the playback states from an already fetched `current_playback` result, so callers that poll it don't have to fetch it again.
+        
+        :param result:
+            The `current_playback` dictionary to read from (`None` if there's no active playback)
+        :param shuffle:
+            If shuffle is `read`, it'll use the shuffle state in the result. Otherwise, it'll use the given value (`true` or `false`)
+        :param repeat:
+            If repeat is `read`, it'll use the repeat state in the result. Otherwise, it'll use the given value (`track`, `context`, or `off`)
+        :param playing:
+            If playing is `read`, it'll use the playing state in the result. Otherwise, it'll use the given value (`true` or `false`)
+            
+        :return payload:
+            The playback states in the following format:
+            `[INIT]\t{shuffle}\t{repeat}\t{playing}`
+        '''
+        
         payload: str = "[INIT]\t"
-        result: str  = self._api.current_playback()
         
         if (result is None):
             return "[ERROR] No playback active"
@@ -133,32 +598,11 @@ class APIClient(object):
             `[{ws_call}]\t{artists}\t{track_name}\t{album_name}\t{album_cover}\t{uri}`
         '''
         
-        data: str  = ""
-        info: dict = track_dict['item']
-        
-        try:    
-            header: str = f"[{ws_call.capitalize()}]"
-            
-            for idx, artist in enumerate(info['artists']):
-                data += artist['name']
-                data += ", " if (idx + 1 != len(info['artists'])) else ""
-            artists: str = data
-            
-            track_name: str = info['name']
-            album_name: str = info['album']['name']
-            uri: str        = info['uri'] if ws_call != "current" else info["external_urls"]["spotify"]
-            
-            try:
-                album_cover: str = info['album']['images'][0]['url']
-            except IndexError: # If the track doesn't have an album cover
-                album_cover: str = "https://developer.spotify.com/images/guidelines/design/icon3@2x.png"
-            
-            payload: str = (header + "\t" +
-                            artists + "\t" +
-                            track_name + "\t" +
-                            album_name + "\t" +
-                            album_cover + "\t" +
-                            uri)
+        try:
+            info: dict   = track_dict['item']
+            uri: str     = info['uri'] if ws_call != "current" else info["external_urls"]["spotify"]
+            payload: str = (f"[{ws_call.capitalize()}]\t{self._formatter.artists(info['artists'])}\t{info['name']}\t{info['album']['name']}"
+                            f"\t{self._formatter.image(info['album']['images'])}\t{uri}")
         except:
             payload: str = "[ERROR] Error getting song data"
         
@@ -182,38 +626,9 @@ class APIClient(object):
             `[{ws_call}]\t{name}\t{artists}\t{uri}\t{icon}\n...`
         '''
         
-        data: str    = ""
-        payload: str = f"[{ws_call.upper()}]"
-        
-        iterate: dict = results[keyword] if keyword != "" else results
+        iterate: list = results[keyword] if keyword != "" else results
         
-        for i in range(len(iterate)):
-            try:
-                item: dict = iterate[i]['track']
-            except:
-                item: dict = iterate[i]
-            
-            data = ""
-            for idx, artist in enumerate(item['artists']):
-                data += artist['name']
-                data += ", " if (idx + 1 != len(item['artists'])) else ""
-            artists: str = data
-            
-            name: str = item['name']
-            uri: str  = item['uri']
-            
-            try: # Checking if the result is that of a track
-                icon: str = item['album']['images'][0]['url']
-            except:
-                try: # Checking if the result is that of an album
-                    icon: str = item['images'][0]['url']
-                    name = f"<u>{name}</u>"
-                except: # If there's no album cover
-                    icon: str = "https://developer.spotify.com/images/guidelines/design/icon3@2x.png"
-            
-            payload += ("\t" + name + "\t" + artists + "\t" + uri + "\t" + icon + "\n")
-        
-        return payload
+        return f"[{ws_call.upper()}]" + self._formatter.rows(iterate)
     
     def get_artists(self, results: dict) -> str:
         '''
@@ -227,20 +642,7 @@ class APIClient(object):
             `[ARTISTS]\t{name}\t{count}\t{uri}\t{icon}\n...`
         '''
         
-        payload: str = "[SEARCH]"
-        
-        for artist in results["items"]:
-            name:       str = artist["name"]
-            uri:        str = artist["external_urls"]["spotify"]
-            try:
-                icon:       str = artist["images"][0]["url"]
-            except:
-                icon:       str = "https://developer.spotify.com/images/guidelines/design/icon3@2x.png"
-            followers:  str = str(artist["followers"]["total"]) + " Followers"
-            
-            payload += ("\t" + name + "\t" + followers + "\t" + uri + "\t" + icon + "\n")
-        
-        return payload
+        return "[SEARCH]" + self._formatter.artist_rows(results["items"])
     
     def get_playlists(self) -> str:
         '''
@@ -251,28 +653,47 @@ class APIClient(object):
             `[PLAYLISTS]\t{name}\t"{count} Songs"\t{uri}\t{icon}`
         '''
         
-        result: str  = self._api.current_user_saved_tracks()
-        payload: str = ("[PLAYLISTS]\t" + "Liked Songs" + "\t" + f"{str(result['total'])} Songs" + "\t"
-                        + f"{self._api.current_user()['uri']}:collection" + "\t" + "https://developer.spotify.com/images/guidelines/design/icon3@2x.png" + "\n")
+        saved, user, playlists = self.fetch_all(partial(self.fetch, "current_user_saved_tracks", limit=1), # Only their count is shown
+                                                partial(self.fetch, "current_user"),
+                                                partial(self.fetch, "current_user_playlists"))
         
-        result = self._api.current_user_playlists()
+        if (isinstance(saved, Exception) and isinstance(playlists, Exception)): # Nothing to show at all
+            raise playlists
         
-        for i in range(len(result["items"])):
-            item: dict = result['items'][i]
-            
-            name: str  = item['name']
-            count: str = item['tracks']['total']
-            uri: str   = item['uri']
-            
-            try:
-                icon: str = item['images'][0]['url']
-            except:
-                icon: str = "https://developer.spotify.com/images/guidelines/design/icon3@2x.png"
-
-            payload += "\t" + name + "\t" + f"{str(count)} Songs" + "\t" + uri + "\t" + icon + "\n"
+        payload: str = "[PLAYLISTS]"
+        
+        if (not isinstance(saved, Exception)) and (not isinstance(user, Exception)):
+            payload += ("\t" + "Liked Songs" + "\t" + f"{str(saved['total'])} Songs" + "\t"
+                        + f"{user['uri']}:collection" + "\t" + "https://developer.spotify.com/images/guidelines/design/icon3@2x.png" + "\n")
+        
+        if (not isinstance(playlists, Exception)):
+            self.remember_snapshots(playlists["items"])
+            payload += self.get_playlist_rows(playlists["items"])
         
         return payload
     
+    def get_playlist_rows(self, items: list[dict]) -> str:
+        '''
+        A function that returns the rows of the given saved playlists
+        
+        :param items:
+            The playlist dictionaries to read from
+        
+        :return payload:
+            The playlists in the following format:
+            `\t{name}\t"{count} Songs"\t{uri}\t{icon}\n...`
+        '''
+        
+        return self._formatter.playlist_rows(items)
+    
+    def strip_rows(self, rows: str) -> str:
+        '''
+        A function that drops the first tab of the given rows, like the album and playlist pages always did. A page without rows has always
+        been sent with `[NONE]` in their place.
+        '''
+        
+        return rows[1:] if (rows) else "[NONE]"
+    
     def display_album(self, album: dict) -> str:
         '''
         A function that displays the album information from the given album dictionary
@@ -285,38 +706,15 @@ class APIClient(object):
             `[ALBUM]\t{name}\t{artists}\t{count}\t{uri}\t{tracks}`
         '''
         
-        data: str    = ""
-        payload: str = "[ALBUM]"
-        
-        for idx, artist in enumerate(album["artists"]):
-            data += artist["name"]
-            data += ", " if (idx + 1 != len(album["artists"])) else ""
-        artists: str = data
+        discs: list = [[x for x in album["tracks"]["items"] if x["disc_number"] == disc] for disc in (1, 2)]
         
-        name: str  = album["name"]
-        count: str = str(album["total_tracks"])
-        uri: str   = album["uri"]
-        icon: str  = album["images"][0]["url"]
+        payload: list = [f"[ALBUM]\t{album['name']}\t{self._formatter.artists(album['artists'])}\t{album['total_tracks']}\t{album['uri']}"
+                         f"\t{self._formatter.image(album['images'])}\n", self.strip_rows(self._formatter.rows(discs[0]))]
         
-        disc1_dict: list[dict] = []
-        disc2_dict: list[dict] = []
+        if (len(discs[1]) > 0):
+            payload.append("\t[DISC2]\t" + self.strip_rows(self._formatter.rows(discs[1])))
         
-        for idx, item in enumerate(album["tracks"]["items"]):
-            if (item["disc_number"] == 1):
-                disc1_dict.append(item)
-            elif (item["disc_number"] == 2):
-                disc2_dict.append(item)
-                
-        payload += ("\t" + name + "\t" + artists + "\t" + count + "\t" + uri + "\t" + icon + "\n")
-        
-        disc1: str = self.get_results(disc1_dict, ws_call="none", keyword="")
-        payload += disc1.removeprefix("[NONE]\t")
-        
-        if (len(disc2_dict) > 0):
-            disc2: str = self.get_results(disc2_dict, ws_call="none", keyword="")
-            payload += ("\t" + "[DISC2]\t" + disc2.removeprefix("[NONE]\t"))
-        
-        return payload
+        return "".join(payload)
     
     def display_playlist(self, playlist: dict, offset: int, uri: str = "") -> str:
         '''
@@ -338,25 +736,18 @@ class APIClient(object):
             count: str = str(playlist["tracks"]["total"])
             uri: str   = playlist["uri"]
             
-            track_dict: dict = self._api.playlist_tracks(playlist_id=playlist["uri"], offset=int(count)-offset-20, limit=20)
-            track_dict["items"] = track_dict["items"][::-1]
+            track_dict: dict = self.fetch("playlist_tracks", playlist_id=playlist["uri"], offset=int(count)-offset-20, limit=20, fields=f"items(track({self.TRACK_FIELDS}))")
+            track_dict: dict = {"items": track_dict["items"][::-1]} # A new dictionary, since the fetched one might be shared
         except:
             name: str  = "Liked Songs"
             owner: str = " "
             count: str =str(playlist["total"])
             
-            track_dict: dict = self._api.current_user_saved_tracks(offset=offset, limit=20)
-
-        try:
-            icon: str  = playlist["images"][0]["url"]
-        except:
-            icon: str = "https://developer.spotify.com/images/guidelines/design/icon3@2x.png"
-        
-        tracks: str         = self.get_results(track_dict, ws_call="none")
+            track_dict: dict = self.fetch("current_user_saved_tracks", offset=offset, limit=20)
         
-        payload += ("\t" + name + "\t" + owner + "\t" + count + "\t" + uri + "\t" + icon + "\n" + tracks.removeprefix("[NONE]\t") + "\t")
+        icon: str = self._formatter.image(playlist.get("images"))
         
-        return payload
+        return f"{payload}\t{name}\t{owner}\t{count}\t{uri}\t{icon}\n{self.strip_rows(self._formatter.rows(track_dict['items']))}\t"
 
     def display_artist(self, artist: dict, artist_top_tracks: dict, aritst_albums: dict) -> str:
         '''
@@ -374,16 +765,406 @@ class APIClient(object):
             `[ARTIST]\t{name}\t{uri}\t{icon}\t{followers}\t{top_tracks}\t{albums}`
         '''
         
-        payload: str = "[ARTIST]"
+        # The top tracks and albums keep their headers, the client splits the page by them
+        return (f"[ARTIST]\t{artist['name']}\t{artist['uri']}\t{self._formatter.image(artist.get('images'))}\t{artist['followers']['total']}"
+                f"\t\t\t[TOP]{self._formatter.rows(artist_top_tracks['tracks'])}\t\t\t[ALBUMS]{self._formatter.rows(aritst_albums['items'])}")
+    
+    def cached(self, endpoint: str, key, build: callable) -> str:
+        '''
+        A function that returns the cached payload of the given endpoint and key, or builds and caches it if there's no fresh one.
+        Payloads are only cached if building them didn't raise an exception.
+        
+        :param endpoint:
+            The endpoint to look the payload up for (`album`, `artist`, `search`, `playlist`, `playlists`, or `queue`)
+        :param key:
+            The key of the payload, usually the URI and arguments of the request
+        :param build:
+            The function that fetches and formats the payload on a cache miss
+        '''
+        
+        payload = self._cache.get(endpoint, key)
+        
+        if (payload is ResponseCache.MISSING):
+            payload = build()
+            self._cache.set(endpoint, key, payload)
+        
+        return payload
+    
+    def invalidate(self, endpoint: str = None, key = None) -> int:
+        '''
+        A function that removes cached payloads, so the next request for them goes to Spotify again.
+        The entries of albums, artists, and playlists are removed from the on-disk store too, otherwise the next miss would read them back.
+        
+        :param endpoint:
+            The endpoint to remove the payloads of, everything is removed if it's `None`
+        :param key:
+            The key to remove, every payload of the endpoint is removed if it's `None`
+        '''
+        
+        removed: int = self._cache.invalidate(endpoint, key)
+        
+        if (self._store is not None) and (endpoint in (None, *self.STORED)):
+            uri: str | None = key[0] if (isinstance(key, tuple)) else key # The keys of playlist pages start with the URI
+            removed += self._store.invalidate(uri, kind=endpoint)
+        
+        return removed
+    
+    def load(self, kind: str, uri: str, part: str = "", snapshot: str = None, build: callable = None) -> str:
+        '''
+        A function that returns the payload of the given entry from the on-disk store, or builds it if it isn't stored (or there's no store).
+        
+        :param kind:
+            The kind of the entry (`album`, `artist`, or `playlist`)
+        :param uri:
+            The Spotify URI of the entry
+        :param part:
+            Which part of the object the entry is, for example the offset of a playlist page
+        :param snapshot:
+            The current `snapshot_id` of the playlist
+        :param build:
+            The function that fetches, formats, and saves the payload if it isn't stored
+        '''
+        
+        payload: str | None = self._store.get(kind, uri, part, snapshot) if (self._store is not None) else None
+        
+        if (payload is None):
+            return build()
+        
+        self._log(f"Loaded {kind} {uri} {part} from the store") if self._debug else None
+        return payload
+    
+    def save(self, kind: str, uri: str, payload: str, part: str = "", snapshot: str = None):
+        '''
+        A function that saves the given payload into the on-disk store, if there is one. See `MetadataStore.put`.
+        '''
+        
+        self._store.put(kind, uri, payload, part, snapshot) if (self._store is not None) else None
+    
+    def remember_snapshots(self, items: list[dict]):
+        '''
+        A function that remembers the given playlists (and when they were seen), their `snapshot_id` is what tells if their cached and
+        stored pages are still valid.
+        
+        :param items:
+            The playlist dictionaries to read from, without their tracks (like the saved playlists)
+        '''
+        
+        now: float = time.monotonic()
+        
+        for item in items:
+            if (item.get("snapshot_id") is not None):
+                self._snapshots.set("playlist", item["uri"], (item, now))
+    
+    def last_seen(self, uri: str) -> tuple | None:
+        '''
+        A function that returns the last seen version of the given playlist and when it was seen, or `None` if it wasn't seen (lately).
+        '''
+        
+        seen = self._snapshots.get("playlist", uri)
+        return None if (seen is ResponseCache.MISSING) else seen
+    
+    def playlist_header(self, uri: str) -> dict:
+        '''
+        A function that returns the given playlist without its tracks. Unless it was seen in the last `SNAPSHOT_TTL` seconds, only the
+        fields in `PLAYLIST_FIELDS` are asked for, which is enough to tell if its snapshot changed.
+        
+        :param uri:
+            The URI of the playlist
+        '''
+        
+        seen: tuple | None = self.last_seen(uri)
+        
+        if (seen is not None) and (time.monotonic() - seen[1] < self.SNAPSHOT_TTL):
+            return seen[0]
+        
+        playlist: dict = self.fetch("playlist", playlist_id=uri, fields=self.PLAYLIST_FIELDS)
+        self.remember_snapshots([playlist])
+        
+        return playlist
+    
+    def playlist_key(self, uri: str, offset: int) -> tuple:
+        '''
+        A function that returns the cache endpoint and key of the given playlist page, with the last snapshot seen of the playlist.
+        '''
+        
+        if ("collection" in uri):
+            return ("liked", (uri, offset))
+        
+        seen: tuple | None = self.last_seen(uri)
+        return ("playlist", (uri, seen[0]["snapshot_id"] if (seen) else None, offset))
+    
+    def album_view(self, uri: str) -> str:
+        '''
+        A function that returns the (cached) album payload of the given album URI, see `display_album`.
+        '''
+        
+        def build() -> str:
+            album: dict = self.fetch("album", uri)
+            _ = album["tracks"]["items"][0] # Throws an error if there are no tracks in the album
+            
+            # The album only comes with its first page of tracks, the rest of the pages are fetched side by side
+            tracks: list = list(album["tracks"]["items"])
+            pages: list  = self.fetch_all(*[partial(self.fetch, "album_tracks", uri, limit=50, offset=x) for x in range(len(tracks), album["tracks"]["total"], 50)])
+            
+            for page in pages:
+                if (isinstance(page, Exception)):
+                    raise page
+                tracks += page["items"]
+            
+            album   = {**album, "tracks": {**album["tracks"], "items": tracks}} # A new dictionary, since the fetched one might be shared
+            payload = self.display_album(album)
+            
+            self.save("album", uri, payload)
+            return payload
+        
+        return self.cached("album", uri, partial(self.load, "album", uri, build=build))
+    
+    def playlist_view(self, uri: str, offset: int) -> str:
+        '''
+        A function that returns the (cached) playlist payload of the given playlist URI and offset, see `display_playlist`.
+        The pages of a playlist are kept by its snapshot, so reopening one that didn't change only asks Spotify for its snapshot.
+        '''
+        
+        if ("collection" in uri): # The Liked Songs don't have a snapshot, so their pages are only kept for a minute
+            def build_liked() -> str:
+                saved: dict = self.fetch("current_user_saved_tracks", limit=1) # Only their count is needed, the page is fetched by itself
+                _ = saved["items"][0] # Throws an error if there are no tracks in their Liked Songs
+                
+                return self.display_playlist(saved, offset=offset, uri=uri)
+            
+            return self.cached("liked", (uri, offset), build_liked)
+        
+        playlist: dict = self.playlist_header(uri)
+        snapshot: str  = playlist.get("snapshot_id")
+        
+        def build() -> str:
+            payload: str = self.display_playlist(playlist, offset=offset)
+            
+            self.save("playlist", uri, payload, part=str(offset), snapshot=snapshot)
+            return payload
+        
+        return self.cached("playlist", (uri, snapshot, offset), partial(self.load, "playlist", uri, part=str(offset), snapshot=snapshot, build=build))
+    
+    def artist_view(self, uri: str) -> str:
+        '''
+        A function that returns the (cached) artist payload of the given artist URI, see `display_artist`.
+        '''
+        
+        def build() -> str:
+            artist, top_tracks, albums = self.fetch_all(partial(self.fetch, "artist", uri),
+                                                        partial(self.fetch, "artist_top_tracks", uri),
+                                                        partial(self.fetch, "artist_albums", uri))
+            
+            for part in (artist, top_tracks):
+                if (isinstance(part, Exception)):
+                    raise part
+            
+            _ = top_tracks["tracks"][0] # Throws an error if the artist has no tracks
+            
+            if (isinstance(albums, Exception)): # The page still works without the albums
+                albums = {"items": []}
+            
+            payload: str = self.display_artist(artist, top_tracks, albums)
+            
+            self.save("artist", uri, payload)
+            return payload
+        
+        return self.cached("artist", uri, partial(self.load, "artist", uri, build=build))
+    
+    def search_view(self, search_type: str, query: str) -> str:
+        '''
+        A function that returns the (cached) search results payload of the given search.
         
-        name:       str = artist["name"]
-        url:        str = artist["uri"]
-        icon:       str = artist["images"][0]["url"]
-        followers:  str = str(artist["followers"]["total"])
+        :param search_type:
+            What to search for (`track`, `album`, `artist`, or several of them separated by commas)
+        :param query:
+            The search query
+        '''
+        
+        def build() -> str:
+            search_results = self.fetch("search", query, type=search_type, market="US")
+            
+            search_split = search_type.split(",")
+            if (len(search_split) > 1): # If the search is for more than one type
+                payload = ""
+                for type in search_split:
+                    res = search_results[f"{type}s"]
+                    payload += self.get_results(res, ws_call="search") if type != "artist" else self.get_artists(res)
+            elif (search_type == "artist"):
+                payload = self.get_artists(search_results["artists"])
+            else:
+                payload = self.get_results(search_results[f"{search_type}s"], ws_call="search")
+            
+            return payload
+        
+        return self.cached("search", (search_type, query), build)
+    
+    def queue_view(self) -> str:
+        '''
+        A function that returns the (cached) payload of the playback queue.
+        '''
+        
+        def build() -> str:
+            queue: dict = self.fetch("queue")
+            _ = queue["queue"][0] # Throws an error if there's no queue available
+            
+            return self.get_results(queue, ws_call="queue", keyword="queue")
+        
+        return self.cached("queue", None, build)
+    
+    def playlists_view(self) -> str:
+        '''
+        A function that returns the (cached) payload of the user's saved playlists, see `get_playlists`.
+        '''
+        
+        return self.cached("playlists", None, self.get_playlists)
+    
+    def iter_pages(self, endpoint: str, start: int, total: int, *args, **kwargs):
+        '''
+        A generator that fetches the pages of the given paginated endpoint side by side, at the biggest page size Spotify allows,
+        and yields every page as soon as it arrives (so not necessarily in order). Only `PAGE_WINDOW` pages of one stream are fetched
+        at once, the next one is asked for whenever one arrives.
+        
+        :param endpoint:
+            The name of the paginated `spotipy.Spotify` function to call
+        :param start:
+            The offset of the first page to fetch, usually the amount of items that were already loaded
+        :param total:
+            The total amount of items
+        :param args:
+            The arguments to pass to the function
+        :param kwargs:
+            The keyword arguments to pass to the function
         
-        top_tracks: str = self.get_results(artist_top_tracks, ws_call="TOP", keyword="tracks")
-        albums:     str = self.get_results(aritst_albums, ws_call="ALBUMS", keyword="items")
+        :return pages:
+            Yields `(offset, page)` tuples
+        '''
+        
+        size: int                  = self.PAGE_SIZES[endpoint]
+        offsets                    = iter(range(start, total, size))
+        futures: dict              = {} # Future -> the offset of its page
+        paging: ThreadPoolExecutor = pool(_paging) # The library sync pages on the background pool
+        
+        def submit():
+            for offset in offsets:
+                futures[paging.submit(copy_context().run, partial(self.fetch, endpoint, *args, limit=size, offset=offset, **kwargs))] = offset
+                return None
+        
+        for _ in range(self.PAGE_WINDOW):
+            submit()
+        
+        try:
+            while (futures):
+                (done, _) = wait(futures, return_when=FIRST_COMPLETED)
+                
+                for future in done:
+                    offset: int = futures.pop(future)
+                    submit()
+                    yield (offset, future.result())
+        finally: # Stops fetching pages nobody is going to read anymore
+            for future in futures:
+                future.cancel()
+    
+    def stream_playlist(self, uri: str):
+        '''
+        A generator that streams every track of the given playlist (or the Liked Songs), one websocket frame per page,
+        so the first rows can be shown while the rest of the pages are still loading.
+        
+        :param uri:
+            The URI of the playlist, or the user's URI ending with `:collection` for their Liked Songs
+        
+        :return frames:
+            Yields the frames in the following order and format:
+            `[PLAYLIST STREAM]\t{name}\t{owner}\t{count}\t{uri}\t{icon}`
+            `[PLAYLIST PAGE]\t{offset}\t{tracks}` for every page, as they arrive
+            `[PLAYLIST END]\t{count}`
+        '''
+        
+        icon: str = "https://developer.spotify.com/images/guidelines/design/icon3@2x.png"
+        
+        if ("collection" in uri):
+            endpoint: str = "current_user_saved_tracks"
+            kwargs: dict  = {}
+            first: dict   = self.fetch(endpoint, limit=self.PAGE_SIZES[endpoint], offset=0)
+            name: str     = "Liked Songs"
+            owner: str    = " "
+        else:
+            endpoint: str  = "playlist_tracks"
+            kwargs: dict   = {"playlist_id": uri, "fields": f"items(track({self.TRACK_FIELDS}))"}
+            playlist: dict = self.fetch("playlist", playlist_id=uri, fields=f"name,owner.display_name,images,tracks(total,items(track({self.TRACK_FIELDS})))") # Comes with the first page of tracks
+            first: dict    = playlist["tracks"]
+            name: str      = playlist["name"]
+            owner: str     = playlist["owner"]["display_name"]
+            
+            try:
+                icon = playlist["images"][0]["url"]
+            except:
+                pass
+        
+        total: int = first["total"]
+        
+        yield f"[PLAYLIST STREAM]\t{name}\t{owner}\t{total}\t{uri}\t{icon}"
+        yield self.get_page_frame("PLAYLIST", 0, first)
+        
+        for (offset, page) in self.iter_pages(endpoint, len(first["items"]), total, **kwargs):
+            yield self.get_page_frame("PLAYLIST", offset, page)
+        
+        yield f"[PLAYLIST END]\t{total}"
+    
+    def stream_playlists(self):
+        '''
+        A generator that streams every saved playlist of the user (instead of only the first page of them), one websocket frame per page.
+        
+        :return frames:
+            Yields the frames in the following order and format:
+            `[PLAYLISTS STREAM]\tLiked Songs\t"{count} Songs"\t{uri}\t{icon}`
+            `[PLAYLISTS PAGE]\t{offset}\t{playlists}` for every page, as they arrive
+            `[PLAYLISTS END]\t{count}`
+        '''
+        
+        endpoint: str = "current_user_playlists"
+        
+        saved, user, first = self.fetch_all(partial(self.fetch, "current_user_saved_tracks", limit=1),
+                                            partial(self.fetch, "current_user"),
+                                            partial(self.fetch, endpoint, limit=self.PAGE_SIZES[endpoint], offset=0))
+        
+        if (isinstance(first, Exception)):
+            raise first
+        
+        total: int = first["total"]
+        
+        if (isinstance(saved, Exception) or isinstance(user, Exception)):
+            yield "[PLAYLISTS STREAM]"
+        else:
+            yield (f"[PLAYLISTS STREAM]\tLiked Songs\t{saved['total']} Songs\t{user['uri']}:collection\t"
+                   + "https://developer.spotify.com/images/guidelines/design/icon3@2x.png")
+        
+        self.remember_snapshots(first["items"])
+        yield "[PLAYLISTS PAGE]\t0" + self.get_playlist_rows(first["items"])
+        
+        for (offset, page) in self.iter_pages(endpoint, len(first["items"]), total):
+            self.remember_snapshots(page["items"])
+            yield f"[PLAYLISTS PAGE]\t{offset}" + self.get_playlist_rows(page["items"])
+        
+        yield f"[PLAYLISTS END]\t{total}"
+    
+    def get_page_frame(self, ws_call: str, offset: int, page: dict) -> str:
+        '''
+        A function that returns one streamed page of tracks as a websocket frame.
+        
+        :param ws_call:
+            The specific keyword the websocket listens to know how to deal with the frame (`PLAYLIST`)
+        :param offset:
+            The offset of the first track of the page
+        :param page:
+            The page dictionary to read from
+        
+        :return payload:
+            The page in the following format:
+            `[{ws_call} PAGE]\t{offset}\t{tracks}`
+        '''
         
-        payload += ("\t" + name + "\t" + url + "\t" + icon + "\t" + followers + "\t\t\t" + top_tracks.removeprefix("[NONE]\t") + "\t\t\t" + albums.removeprefix("[NONE]\t"))
+        items: list  = [x for x in page["items"] if x.get("track") is not None] # Removed and local-only tracks don't have any track data
+        tracks: str  = self.get_results(items, ws_call="none", keyword="")
         
-        return payload
\ No newline at end of file
+        return f"[{ws_call} PAGE]\t{offset}\t" + tracks.removeprefix("[NONE]\t")
\ No newline at end of file
@@ -0,0 +1,113 @@
+import asyncio as aio
+
+from concurrent.futures import Executor
+
+from APIClient import APIClient
+from PlaybackPoller import PlaybackPoller
+from Prefetcher import Prefetcher
+from LibraryIndex import LibraryIndex
+
+class Account(object):
+    '''
+    A class for one Spotify account the server hosts: its APIClient (with its own token cache, device, and rate limit budget), its playback
+    poller, prefetcher, and library index. Apart from its token refresh, nothing of an account runs in the background while no connection uses it.
+    '''
+    key: str                 = ""
+    client: APIClient        = None
+    poller: PlaybackPoller   = None
+    prefetcher: Prefetcher   = None
+    library: LibraryIndex    = None
+    sessions: set            = None # The IDs of the connections that use the account
+    _syncing: aio.Task       = None
+    _watching: aio.Task      = None
+    _sync_interval: int      = 600
+    _debug: bool             = False
+    _log: callable           = None
+
+    def __init__(self, key: str, client: APIClient, executor: Executor, busy: callable, prefetch: bool = True, sync_interval: int = 600):
+        '''
+        A constructor for the Account class.
+
+        :param key:
+            The key connections use to pick the account
+        :param client:
+            The APIClient of the account
+        :param executor:
+            The executor that runs the (blocking) Spotify API calls
+        :param busy:
+            A function that returns `True` while a user command is running
+        :param prefetch:
+            If the views users are likely to open next should be prefetched
+        :param sync_interval:
+            How many seconds pass between syncs of the library index (0 disables it)
+        '''
+        self.key            = key
+        self.client         = client
+        self.prefetcher     = Prefetcher(client, busy=busy) if prefetch else None
+        self.poller         = PlaybackPoller(client, executor, on_track=self.prefetcher.after_track if self.prefetcher else None)
+        self.library        = LibraryIndex(client)
+        self.sessions       = set()
+        self._sync_interval = sync_interval
+        self._debug         = client._debug
+        self._log           = client._log
+
+    def attach(self, session_id: str):
+        '''
+        A function that adds a connection to the account, the library sync and the device lookups start with the first one.
+
+        :param session_id:
+            The ID of the connection
+        '''
+
+        self.sessions.add(session_id)
+
+        if (self._sync_interval > 0) and ((self._syncing is None) or (self._syncing.done())):
+            self._syncing = aio.create_task(self._sync())
+
+        if (self._watching is None) or (self._watching.done()):
+            self._watching = aio.create_task(self._watch_devices())
+
+    def detach(self, session_id: str, outbox = None):
+        '''
+        A function that removes a connection from the account, the library sync and the device lookups stop with the last one.
+
+        :param session_id:
+            The ID of the connection
+        :param outbox:
+            The outbox of the connection, so it stops getting playback state pushes
+        '''
+
+        self.sessions.discard(session_id)
+        self.poller.unsubscribe(outbox) if (outbox is not None) else None
+
+        if (not self.sessions) and (self._syncing is not None):
+            self._syncing.cancel()
+            self._syncing = None
+
+        if (not self.sessions) and (self._watching is not None):
+            self._watching.cancel()
+            self._watching = None
+
+    # Keeps the library index up to date while the account is used, only the playlists that changed since the last sync are reloaded
+    async def _sync(self):
+        while (True):
+            try:
+                await aio.to_thread(self.library.sync)
+            except aio.CancelledError:
+                raise
+            except Exception as e:
+                self._log(f"[{self.key}] Error syncing the library: {e}") if self._debug else None
+
+            await aio.sleep(self._sync_interval)
+
+    # Looks up the devices twice within their TTL while the account is used, so the controls never have to wait for the lookup
+    async def _watch_devices(self):
+        while (True):
+            try:
+                await aio.to_thread(self.client.refresh_devices)
+            except aio.CancelledError:
+                raise
+            except Exception as e:
+                self._log(f"[{self.key}] Error looking up the devices: {e}") if self._debug else None
+
+            await aio.sleep(self.client._devices.ttl / 2)
@@ -0,0 +1,69 @@
+import re
+
+URI = re.compile(r"spotify:(?:track|episode|album|artist|playlist):\w+|spotify:user:[^\t\n]+:collection")
+
+def key(line: str) -> str:
+    '''
+    A function that returns what a line of a payload is matched by: the last URI in it (the one of the row, since a header can share
+    its line with the first row), or the whole line if it has no URI.
+    '''
+
+    uris: list = URI.findall(line)
+    return uris[-1] if (uris) else line
+
+def diff(command: str, old: list[str], new: str) -> str | None:
+    '''
+    A function that returns the row level difference between the last payload of a command and the new one, or `None` if sending
+    the new payload whole is shorter.
+
+    :param command:
+        The command both payloads answer
+    :param old:
+        The lines of the last payload that was sent for the command
+    :param new:
+        The new payload
+
+    :return delta:
+        `[DELTA]\t{command}\n` and then one line for every run of rows the client already has (`={first line}\t{count}`) and for every
+        row it doesn't have (`+{line}`), the new payload is the lines put back together with `\n`
+    '''
+
+    lines: list[str] = new.split("\n")
+    index: dict      = {}
+    for (i, line) in enumerate(old):
+        index.setdefault(key(line), i)
+
+    ops: list[list] = [] # [first line, count] for the kept runs, the line itself for the new ones
+    for line in lines:
+        i: int | None = index.get(key(line))
+
+        if (i is None) or (old[i] != line): # A row that's new, or that has the same URI but changed (like a new play count)
+            ops.append(line)
+        elif (ops) and (isinstance(ops[-1], list)) and (ops[-1][0] + ops[-1][1] == i): # Goes on where the last kept run stopped
+            ops[-1][1] += 1
+        else:
+            ops.append([i, 1])
+
+    delta: str = f"[DELTA]\t{command}\n" + "\n".join([f"={x[0]}\t{x[1]}" if (isinstance(x, list)) else f"+{x}" for x in ops])
+    return delta if (len(delta) < len(new)) else None
+
+def patch(old: list[str], delta: str) -> str:
+    '''
+    A function that puts a payload back together from the last payload of its command and a delta, like a client does.
+
+    :param old:
+        The lines of the last payload of the command
+    :param delta:
+        The `[DELTA]` frame
+    '''
+
+    lines: list[str] = []
+
+    for op in delta.split("\n")[1:]:
+        if (op.startswith("=")):
+            (first, count) = [int(x) for x in op[1:].split("\t")]
+            lines += old[first:first + count]
+        else:
+            lines.append(op[1:])
+
+    return "\n".join(lines)
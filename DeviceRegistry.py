@@ -0,0 +1,117 @@
+import threading
+import time
+
+from spotipy.exceptions import SpotifyException
+
+class DeviceRegistry(object):
+    '''
+    A class for the Spotify devices of one account and the one its actions go to. The device list is kept for `ttl` seconds, a device
+    is picked by the preferred names or IDs first, then the active one, then the first one, and it's never asked for on the console.
+    When an action fails because its device is gone, the list is looked up again and the next device takes over.
+    '''
+    _fetch: callable      = None  # Returns the `devices` list of the `devices` endpoint
+    _devices: list        = None  # The devices of the last lookup
+    _fetched: float       = None  # The `time.monotonic()` of the last lookup
+    _device: str          = None  # The ID of the device the actions go to
+    _lock: threading.Lock = None
+
+    preferred: list = None # The names or IDs of the devices to pick first, in order
+    ttl: float      = 30.0
+    failovers: int  = 0    # How many times an action moved on to the next device
+
+    def __init__(self, fetch: callable, preferred: list[str] = None, ttl: float = 30.0):
+        '''
+        A constructor for the DeviceRegistry class.
+
+        :param fetch:
+            The function that looks up the devices of the account
+        :param preferred:
+            The names or IDs of the devices to pick first, in order (the name isn't case sensitive)
+        :param ttl:
+            How many seconds the device list is trusted before it's looked up again
+        '''
+        self._fetch    = fetch
+        self._devices  = []
+        self._lock     = threading.Lock()
+        self.preferred = list(preferred or [])
+        self.ttl       = ttl
+
+    def stale(self) -> bool:
+        return (self._fetched is None) or (time.monotonic() - self._fetched > self.ttl)
+
+    def devices(self) -> list[dict]:
+        with self._lock:
+            return list(self._devices)
+
+    def refresh(self) -> list[dict]:
+        '''
+        A function that looks up the devices again. The device the actions go to stays unless it's gone, or a preferred one showed up.
+        '''
+
+        devices: list = self._fetch()
+
+        with self._lock:
+            self._devices = list(devices)
+            self._fetched = time.monotonic()
+            self._device  = self._pick(keep=self._device)
+
+            return list(self._devices)
+
+    def current(self, refresh: bool = False) -> str | None:
+        '''
+        A function that returns the ID of the device the actions go to, or `None` if the account has none.
+
+        :param refresh:
+            If the devices should be looked up again even if the last lookup isn't older than `ttl` seconds
+        '''
+
+        if (refresh) or (self.stale()):
+            self.refresh()
+
+        return self._device
+
+    def fail(self, device_id: str | None) -> str | None:
+        '''
+        A function that moves on to the next device after an action failed because the given one is gone.
+
+        :param device_id:
+            The ID of the device the action was sent to
+        :return device:
+            The ID of the device to retry the action on, or `None` if there's no other one
+        '''
+
+        devices: list = self._fetch()
+
+        with self._lock:
+            self._devices = list(devices)
+            self._fetched = time.monotonic()
+            self._device  = self._pick(exclude=device_id)
+
+            if (self._device is not None) and (self._device != device_id):
+                self.failovers += 1
+                return self._device
+
+            return None
+
+    @staticmethod
+    def gone(error: Exception) -> bool:
+        '''
+        A function that checks if an action failed because its device is gone (or there's no active one), not for any other reason.
+        '''
+
+        return (isinstance(error, SpotifyException)) and ((error.http_status == 404) or (error.reason == "NO_ACTIVE_DEVICE"))
+
+    def _pick(self, keep: str = None, exclude: str = None) -> str | None:
+        devices: list = [x for x in self._devices if (x.get("id")) and (x["id"] != exclude) and (not x.get("is_restricted"))]
+        ids: list     = [x["id"] for x in devices]
+
+        for preference in self.preferred:
+            for x in devices:
+                if (x["id"] == preference) or (x.get("name", "").lower() == preference.lower()):
+                    return x["id"]
+
+        if (keep in ids):
+            return keep
+
+        active: list = [x["id"] for x in devices if (x.get("is_active"))]
+        return (active or ids or [None])[0]
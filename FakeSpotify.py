@@ -0,0 +1,338 @@
+import random
+import threading
+import time
+
+from collections import Counter
+
+from spotipy.exceptions import SpotifyException
+
+class FakeSpotify(object):
+    '''
+    A class that stands in for `spotipy.Spotify`, with a made up (but consistent) library and playback, so the server can be run and
+    measured without a Spotify account or device. It answers every endpoint the APIClient uses, after a configurable latency, and can
+    answer with 429s to exercise the scheduler.
+
+    The catalog is generated from indices: track `i` is `spotify:track:t{i}`, album `i` is `spotify:album:a{i}`, artist `i` is
+    `spotify:artist:r{i}`, and playlist `i` is `spotify:playlist:p{i}`.
+    '''
+    auth_manager = None
+
+    latency: float    = 0.05 # The average seconds every call takes, give or take half of it
+    rate_limit: float = 0.0  # The chance of a call being answered with a 429
+    retry_after: int  = 1    # The `Retry-After` of the 429s
+    calls: Counter    = None # How many times every endpoint was called
+
+    TRACKS: int     = 5000 # The size of the catalog
+    ALBUM_SIZE: int = 12
+    ARTISTS: int    = 200
+    PLAYLISTS: int  = 30
+    SAVED: int      = 800
+    IMAGE: str      = "https://i.scdn.co/image/fake"
+    DEVICE: dict    = {"id": "fake-device", "name": "Fake device", "type": "Computer", "is_active": True, "volume_percent": 50}
+
+    _random: random.Random = None
+    _lock: threading.Lock  = None
+    _playing: dict         = None # The playback: current track index, context, progress at `started`, and the states
+
+    def __init__(self, latency: float = 0.05, rate_limit: float = 0.0, retry_after: int = 1, seed: int = 0):
+        '''
+        A constructor for the FakeSpotify class.
+
+        :param latency:
+            The average amount of seconds every call takes
+        :param rate_limit:
+            The chance (0 to 1) of a call being answered with a 429
+        :param retry_after:
+            The `Retry-After` seconds of the 429s
+        :param seed:
+            The seed of the latency and 429 randomness
+        '''
+        self.latency     = latency
+        self.rate_limit  = rate_limit
+        self.retry_after = retry_after
+        self.calls       = Counter()
+        self._random     = random.Random(seed)
+        self._lock       = threading.Lock()
+        self._playing    = {"index": 0, "context": "spotify:playlist:p0", "progress": 0, "started": time.monotonic(),
+                            "is_playing": True, "shuffle_state": False, "repeat_state": "off"}
+
+    #-------------------------------------------------------------- The catalog
+
+    def images(self) -> list[dict]:
+        return [{"url": f"{self.IMAGE}/{x}", "height": x, "width": x} for x in (640, 300, 64)]
+
+    def artist_object(self, i: int) -> dict:
+        return {"name": f"Artist {i}", "uri": f"spotify:artist:r{i}", "id": f"r{i}", "type": "artist",
+                "external_urls": {"spotify": f"https://open.spotify.com/artist/r{i}"}}
+
+    def album_object(self, i: int) -> dict:
+        return {"name": f"Album {i}", "uri": f"spotify:album:a{i}", "id": f"a{i}", "type": "album", "album_type": "album",
+                "artists": [self.artist_object(i % self.ARTISTS)], "images": self.images(), "total_tracks": self.ALBUM_SIZE,
+                "release_date": f"{2000 + i % 25}-01-01", "external_urls": {"spotify": f"https://open.spotify.com/album/a{i}"}}
+
+    def track_object(self, i: int) -> dict:
+        i = i % self.TRACKS
+        album: int = i // self.ALBUM_SIZE
+
+        return {"name": f"Track {i}", "uri": f"spotify:track:t{i}", "id": f"t{i}", "type": "track",
+                "artists": [self.artist_object(album % self.ARTISTS)] + ([self.artist_object((i * 7) % self.ARTISTS)] if (i % 3 == 0) else []),
+                "album": self.album_object(album), "duration_ms": 150000 + (i % 120) * 1000, "explicit": False,
+                "disc_number": 2 if (i % self.ALBUM_SIZE >= self.ALBUM_SIZE - 2) else 1, "track_number": i % self.ALBUM_SIZE + 1,
+                "popularity": i % 100, "external_urls": {"spotify": f"https://open.spotify.com/track/t{i}"}}
+
+    def playlist_size(self, i: int) -> int:
+        return 20 + (i * 137) % 480
+
+    def playlist_object(self, i: int) -> dict:
+        return {"name": f"Playlist {i}", "uri": f"spotify:playlist:p{i}", "id": f"p{i}", "type": "playlist",
+                "owner": {"display_name": "Fake user", "uri": "spotify:user:fake"}, "images": self.images() if (i % 5) else [],
+                "snapshot_id": f"snapshot-{i}", "tracks": {"total": self.playlist_size(i)}}
+
+    def page(self, items: callable, total: int, limit: int, offset: int) -> dict:
+        return {"items": [items(x) for x in range(offset, min(total, offset + limit))], "total": total, "limit": limit, "offset": offset}
+
+    def album_page(self, i: int, limit: int, offset: int) -> dict:
+        return self.page(lambda x: self.track_object(i * self.ALBUM_SIZE + x), self.ALBUM_SIZE, limit, offset)
+
+    def playlist_page(self, i: int, limit: int, offset: int) -> dict:
+        return self.page(lambda x: {"added_at": "2024-01-01T00:00:00Z", "track": self.track_object(i * 997 + x * 13)}, self.playlist_size(i), limit, offset)
+
+    @staticmethod
+    def fields(fields: str) -> dict:
+        '''
+        A function that parses Spotify's `fields` parameter (like `name,tracks.total,items(track(name,uri))`) into a dictionary of the
+        fields to keep, where `None` keeps all of a field.
+        '''
+
+        parts: list = []
+        (depth, start) = (0, 0)
+        for (i, x) in enumerate(fields + ","):
+            depth += (x == "(") - (x == ")")
+            if (x == ",") and (depth == 0):
+                parts.append(fields[start:i].strip())
+                start = i + 1
+
+        spec: dict = {}
+        for part in [x for x in parts if (x)]:
+            split: int = min([x for x in (part.find("."), part.find("(")) if (x != -1)], default=len(part))
+            (name, rest) = (part[:split], part[split + 1:].removesuffix(")") if (part[split:split + 1] == "(") else part[split + 1:])
+            sub: dict | None = FakeSpotify.fields(rest) if (rest) else None
+
+            if (name in spec) and (spec[name] is not None) and (sub is not None):
+                spec[name] = {**spec[name], **sub}
+            else:
+                spec[name] = sub if (name not in spec) else None
+
+        return spec
+
+    @staticmethod
+    def select(item, fields: str | dict | None):
+        '''
+        A function that keeps only the given fields of an object (and of every object in a list), like Spotify's `fields` parameter does.
+        '''
+
+        spec: dict | None = FakeSpotify.fields(fields) if (isinstance(fields, str)) else fields
+
+        if (not spec):
+            return item
+        if (isinstance(item, list)):
+            return [FakeSpotify.select(x, spec) for x in item]
+        if (isinstance(item, dict)):
+            return {k: FakeSpotify.select(item[k], x) for (k, x) in spec.items() if (k in item)}
+
+        return item
+
+    @staticmethod
+    def index(uri: str) -> int:
+        return int(uri.rsplit(":", 1)[-1].lstrip("tarp")) # The IDs are the index behind the letter of their kind
+
+    #-------------------------------------------------------------- Making calls
+
+    def _call(self, endpoint: str):
+        with self._lock:
+            self.calls[endpoint] += 1
+            delay: float  = self.latency * self._random.uniform(0.5, 1.5)
+            limited: bool = self._random.random() < self.rate_limit
+
+        time.sleep(delay)
+
+        if (limited):
+            raise SpotifyException(429, -1, f"https://api.spotify.com/v1/{endpoint}:\n Too many requests", headers={"Retry-After": str(self.retry_after)})
+
+    def _progress(self) -> int:
+        playing: dict = self._playing
+        duration: int = self.track_object(playing["index"])["duration_ms"]
+        progress: int = playing["progress"] + (int((time.monotonic() - playing["started"]) * 1000) if (playing["is_playing"]) else 0)
+
+        if (progress >= duration): # The next track started in the meantime
+            playing["index"]   += 1
+            playing["progress"] = 0
+            playing["started"]  = time.monotonic()
+            return 0
+
+        return progress
+
+    def _move(self, index: int = None, progress: int = 0, **states):
+        with self._lock:
+            self._playing["progress"] = progress
+            self._playing["started"]  = time.monotonic()
+            self._playing["index"]    = index if (index is not None) else self._playing["index"]
+            self._playing.update(states)
+
+    #-------------------------------------------------------------- Reading
+
+    def current_user(self) -> dict:
+        self._call("me")
+        return {"display_name": "Fake user", "id": "fake", "uri": "spotify:user:fake"}
+
+    def devices(self) -> dict:
+        self._call("me/player/devices")
+        return {"devices": [dict(self.DEVICE)]}
+
+    def current_playback(self, market: str = None, additional_types: str = None) -> dict:
+        self._call("me/player")
+
+        with self._lock:
+            progress: int = self._progress()
+            playing: dict = dict(self._playing)
+
+        return {"device": dict(self.DEVICE), "shuffle_state": playing["shuffle_state"], "repeat_state": playing["repeat_state"],
+                "timestamp": int(time.time() * 1000), "context": {"uri": playing["context"], "type": "playlist"} if (playing["context"]) else None,
+                "progress_ms": progress, "item": self.track_object(playing["index"]), "currently_playing_type": "track",
+                "is_playing": playing["is_playing"]}
+
+    def current_user_playing_track(self) -> dict:
+        result: dict = self.current_playback()
+        del result["device"]
+        return result
+
+    def currently_playing(self, market: str = None, additional_types: str = None) -> dict:
+        return self.current_user_playing_track()
+
+    def queue(self) -> dict:
+        self._call("me/player/queue")
+
+        with self._lock:
+            index: int = self._playing["index"]
+
+        return {"currently_playing": self.track_object(index), "queue": [self.track_object(x) for x in range(index + 1, index + 21)]}
+
+    def album(self, album_id: str, market: str = None) -> dict:
+        self._call("albums")
+        i: int = self.index(album_id)
+
+        return {**self.album_object(i), "tracks": self.album_page(i, limit=50, offset=0)}
+
+    def album_tracks(self, album_id: str, limit: int = 50, offset: int = 0, market: str = None) -> dict:
+        self._call("albums/tracks")
+        return self.album_page(self.index(album_id), limit, offset)
+
+    def artist(self, artist_id: str) -> dict:
+        self._call("artists")
+        return {**self.artist_object(self.index(artist_id)), "images": self.images(), "followers": {"total": 1000 + self.index(artist_id)},
+                "genres": [], "popularity": 50}
+
+    def artist_top_tracks(self, artist_id: str, country: str = "US") -> dict:
+        self._call("artists/top-tracks")
+        i: int = self.index(artist_id)
+
+        return {"tracks": [self.track_object((i + self.ARTISTS * x) * self.ALBUM_SIZE) for x in range(10)]}
+
+    def artist_albums(self, artist_id: str, album_type: str = None, include_groups: str = None, country: str = None, limit: int = 20, offset: int = 0) -> dict:
+        self._call("artists/albums")
+        i: int = self.index(artist_id)
+
+        return self.page(lambda x: self.album_object(i + self.ARTISTS * x), self.TRACKS // self.ALBUM_SIZE // self.ARTISTS, limit, offset)
+
+    def search(self, q: str, limit: int = 10, offset: int = 0, type: str = "track", market: str = None) -> dict:
+        self._call("search")
+        start: int = sum(map(ord, q)) * 31
+
+        results: dict = {}
+        for kind in type.split(","):
+            match (kind):
+                case "track":
+                    results["tracks"] = self.page(lambda x: self.track_object(start + x), 1000, limit, offset)
+                case "album":
+                    results["albums"] = self.page(lambda x: self.album_object((start + x) % (self.TRACKS // self.ALBUM_SIZE)), 1000, limit, offset)
+                case "artist":
+                    results["artists"] = self.page(lambda x: {**self.artist_object((start + x) % self.ARTISTS), "images": self.images()}, 1000, limit, offset)
+                case "playlist":
+                    results["playlists"] = self.page(lambda x: self.playlist_object((start + x) % self.PLAYLISTS), 1000, limit, offset)
+
+        return results
+
+    def playlist(self, playlist_id: str, fields: str = None, market: str = None, additional_types: tuple = ("track",)) -> dict:
+        self._call("playlists")
+        i: int = self.index(playlist_id)
+
+        return self.select({**self.playlist_object(i), "tracks": self.playlist_page(i, limit=100, offset=0)}, fields)
+
+    def playlist_items(self, playlist_id: str, fields: str = None, limit: int = 100, offset: int = 0, market: str = None,
+                       additional_types: tuple = ("track", "episode")) -> dict:
+        self._call("playlists/tracks")
+        return self.select(self.playlist_page(self.index(playlist_id), limit, offset), fields)
+
+    def playlist_tracks(self, playlist_id: str, fields: str = None, limit: int = 100, offset: int = 0, market: str = None,
+                        additional_types: tuple = ("track",)) -> dict:
+        return self.playlist_items(playlist_id, fields=fields, limit=limit, offset=offset, market=market, additional_types=additional_types)
+
+    def current_user_playlists(self, limit: int = 50, offset: int = 0) -> dict:
+        self._call("me/playlists")
+        return self.page(self.playlist_object, self.PLAYLISTS, limit, offset)
+
+    def current_user_saved_tracks(self, limit: int = 20, offset: int = 0, market: str = None) -> dict:
+        self._call("me/tracks")
+        return self.page(lambda x: {"added_at": "2024-01-01T00:00:00Z", "track": self.track_object(x * 7)}, self.SAVED, limit, offset)
+
+    #-------------------------------------------------------------- Playback actions
+
+    def start_playback(self, device_id: str = None, context_uri: str = None, uris: list = None, offset: dict = None, position_ms: int = None):
+        self._call("me/player/play")
+
+        if (uris):
+            self._move(self.index(uris[0]), is_playing=True, context=None)
+        elif (context_uri):
+            index: int = self.index(offset["uri"]) if (offset and "uri" in offset) else self.index(context_uri) * 997
+            self._move(index, is_playing=True, context=context_uri)
+        else:
+            with self._lock:
+                progress: int = self._progress()
+            self._move(progress=progress, is_playing=True)
+
+    def pause_playback(self, device_id: str = None):
+        self._call("me/player/pause")
+
+        with self._lock:
+            progress: int = self._progress()
+        self._move(progress=progress, is_playing=False)
+
+    def next_track(self, device_id: str = None):
+        self._call("me/player/next")
+
+        with self._lock:
+            index: int = self._playing["index"]
+        self._move(index + 1)
+
+    def previous_track(self, device_id: str = None):
+        self._call("me/player/previous")
+
+        with self._lock:
+            index: int = self._playing["index"]
+        self._move(max(0, index - 1))
+
+    def seek_track(self, position_ms: int, device_id: str = None):
+        self._call("me/player/seek")
+        self._move(progress=position_ms)
+
+    def shuffle(self, state: bool, device_id: str = None):
+        self._call("me/player/shuffle")
+
+        with self._lock:
+            self._playing["shuffle_state"] = state
+
+    def repeat(self, state: str, device_id: str = None):
+        self._call("me/player/repeat")
+
+        with self._lock:
+            self._playing["repeat_state"] = state
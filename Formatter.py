@@ -0,0 +1,119 @@
+import threading
+
+DEFAULT_ICON: str = "https://developer.spotify.com/images/guidelines/design/icon3@2x.png" # Used when something doesn't have a picture
+
+class Formatter(object):
+    '''
+    A class for the serializer every APIClient view shares. Every record is formatted in one pass into a list that's joined once, and the
+    rows of tracks (and albums) are kept, since the same ones show up over and over in playlists, albums, searches, and the queue.
+    '''
+    _rows: dict           = None # (URI, if the item came with its album) -> the formatted row, set without the lock since that's atomic
+    _lock: threading.Lock = None
+    _max_rows: int        = 5000
+
+    image_size: int = None # The width of the pictures the client shows, the first (biggest) picture is used if it's `None`
+
+    def __init__(self, image_size: int = None, max_rows: int = 5000):
+        '''
+        A constructor for the Formatter class.
+
+        :param image_size:
+            The width in pixels of the pictures the client shows, the smallest picture that's at least as wide is picked
+        :param max_rows:
+            The maximum amount of formatted rows kept, the oldest ones get dropped first
+        '''
+        self._rows      = {}
+        self._lock      = threading.Lock()
+        self._max_rows  = max_rows
+        self.image_size = image_size
+
+    def artists(self, artists: list[dict]) -> str:
+        return ", ".join([x["name"] for x in artists])
+
+    def image(self, images: list[dict] | None) -> str:
+        '''
+        A function that returns the URL of the picture that fits the client best, or the default icon if there's no picture.
+
+        :param images:
+            The `images` of a Spotify object, which Spotify sorts from the biggest to the smallest
+        '''
+
+        if (not images):
+            return DEFAULT_ICON
+
+        if (self.image_size is None) or (any([x.get("width") is None for x in images])): # Some pictures (like playlist mosaics) have no size
+            return images[0]["url"]
+
+        fitting: list = [x for x in images if x["width"] >= self.image_size]
+        return min(fitting, key=lambda x: x["width"])["url"] if (fitting) else max(images, key=lambda x: x["width"])["url"]
+
+    def row(self, item: dict) -> str:
+        '''
+        A function that returns the row of a track or album, from the formatted rows if it was seen before.
+
+        :param item:
+            The track or album dictionary
+
+        :return row:
+            `\t{name}\t{artists}\t{uri}\t{icon}\n`, album names are underlined
+        '''
+
+        key: tuple = (item["uri"], "album" in item) # Tracks of an album's track list don't come with their album (and its cover)
+        row: str   = self._rows.get(key)
+
+        if (row is not None):
+            return row
+
+        name: str = item["name"]
+        album     = item.get("album")
+
+        if (album) and (album.get("images")): # A track
+            icon: str = album["images"][0]["url"] if (self.image_size is None) else self.image(album["images"])
+        elif (item.get("images")): # An album
+            icon: str = item["images"][0]["url"] if (self.image_size is None) else self.image(item["images"])
+            name      = f"<u>{name}</u>"
+        else:
+            icon: str = DEFAULT_ICON
+
+        row = f"\t{name}\t{', '.join([x['name'] for x in item['artists']])}\t{item['uri']}\t{icon}\n"
+
+        if (item["uri"]):
+            if (len(self._rows) >= self._max_rows):
+                self.evict()
+            self._rows[key] = row
+
+        return row
+
+    def rows(self, items: list[dict]) -> str:
+        '''
+        A function that returns the rows of the given tracks or albums (or playlist and saved track items, which have a `track`).
+        '''
+
+        return "".join([self.row(x["track"] if ("track" in x) else x) for x in items])
+
+    def playlist_rows(self, items: list[dict]) -> str:
+        '''
+        A function that returns the rows of the given saved playlists.
+
+        :return rows:
+            `\t{name}\t{count} Songs\t{uri}\t{icon}\n...`
+        '''
+
+        return "".join([f"\t{x['name']}\t{x['tracks']['total']} Songs\t{x['uri']}\t{self.image(x.get('images'))}\n" for x in items])
+
+    def artist_rows(self, items: list[dict]) -> str:
+        '''
+        A function that returns the rows of the given artists.
+
+        :return rows:
+            `\t{name}\t{followers} Followers\t{url}\t{icon}\n...`
+        '''
+
+        return "".join([f"\t{x['name']}\t{x['followers']['total']} Followers\t{x['external_urls']['spotify']}\t{self.image(x.get('images'))}\n"
+                        for x in items])
+
+    def evict(self):
+        with self._lock:
+            # Dicts keep their order, so the first keys are the oldest rows, a tenth is dropped so it doesn't have to happen on every row
+            for key in list(self._rows)[:max(1, self._max_rows // 10)]:
+                self._rows.pop(key, None)
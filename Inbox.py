@@ -0,0 +1,75 @@
+import asyncio as aio
+
+from collections import deque
+
+class Inbox(object):
+    '''
+    A class for the messages a websocket connection sent that weren't handled yet. They're read by the inbox's own task as soon as they
+    arrive, so while a command is being handled it can tell if the client already sent a newer one of the same kind.
+    '''
+    _websocket          = None
+    _messages: deque    = None # The waiting messages, `None` marks the end of the connection
+    _arrived: aio.Event = None
+    _task: aio.Task     = None
+
+    error: Exception = None # Why the connection ended, if it didn't close normally
+
+    def __init__(self, websocket):
+        '''
+        A constructor for the Inbox class, the reader task starts right away.
+
+        :param websocket:
+            The websocket to read the messages from
+        '''
+        self._websocket = websocket
+        self._messages  = deque()
+        self._arrived   = aio.Event()
+        self._task      = aio.create_task(self._run())
+
+    async def get(self) -> str | None:
+        '''
+        A coroutine that returns the oldest waiting message, or `None` once the connection ended.
+        '''
+
+        while (not self._messages):
+            await self.wait()
+
+        return self._messages.popleft()
+
+    async def wait(self, timeout: float = None):
+        '''
+        A coroutine that waits until a new message arrives, or until the given amount of seconds passed.
+        '''
+
+        self._arrived.clear()
+
+        try:
+            await aio.wait_for(self._arrived.wait(), timeout)
+        except aio.TimeoutError:
+            pass
+
+    def waiting(self, command: str) -> bool:
+        '''
+        A function that checks if a message with the given command is waiting to be handled.
+
+        :param command:
+            The first word of the message
+        '''
+
+        return any([(x is not None) and (x.split(" ", 1)[0] == command) for x in self._messages])
+
+    def close(self):
+        self._task.cancel()
+
+    async def _run(self):
+        try:
+            async for message in self._websocket:
+                self._messages.append(message)
+                self._arrived.set()
+        except aio.CancelledError:
+            raise
+        except Exception as e:
+            self.error = e
+        finally:
+            self._messages.append(None)
+            self._arrived.set()
@@ -0,0 +1,227 @@
+import bisect
+import re
+import threading
+
+from APIClient import APIClient
+from Scheduler import Scheduler
+
+class LibraryIndex(object):
+    '''
+    A class for the local, in-memory inverted index of the user's library (their Liked Songs and saved playlists).
+    It's filled by a background sync that only reloads the playlists whose `snapshot_id` changed, and it's searched by
+    token prefixes over the track, artist, and album names without any network call.
+    '''
+    _client: APIClient    = None
+    _rows: dict           = None # Track URI -> the formatted `[SEARCH]` row of the track
+    _names: dict          = None # Track URI -> the lowercase track name, used to sort the results
+    _owners: dict         = None # Track URI -> the sources (playlist URIs or `collection`) the track is in
+    _sources: dict        = None # Source -> (snapshot, set of track URIs)
+    _index: dict          = None # Token -> set of track URIs
+    _terms: dict          = None # Track URI -> the tokens it's indexed under, so dropping a track only touches its own tokens
+    _tokens: list         = None # The sorted tokens, for prefix lookups
+    _lock: threading.Lock = None
+    _debug: bool          = False
+    _log: callable        = None
+
+    _limit: int = 50 # The maximum amount of results of a search
+
+    def __init__(self, client: APIClient):
+        '''
+        A constructor for the LibraryIndex class.
+
+        :param client:
+            The APIClient of the account whose library gets indexed
+        '''
+        self._client  = client
+        self._rows    = {}
+        self._names   = {}
+        self._owners  = {}
+        self._sources = {}
+        self._index   = {}
+        self._terms   = {}
+        self._tokens  = []
+        self._lock    = threading.Lock()
+        self._debug   = client._debug
+        self._log     = client._log
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._rows)
+
+    @staticmethod
+    def tokenize(text: str) -> list[str]:
+        return re.findall(r"\w+", text.lower())
+
+    def search(self, query: str) -> str:
+        '''
+        A function that searches the indexed library. Every word of the query has to be the start of a word of the track's,
+        artists', or album's name.
+
+        :param query:
+            The search query
+
+        :return payload:
+            The results in the same format as a remote search:
+            `[SEARCH]\t{name}\t{artists}\t{uri}\t{icon}\n...`
+        '''
+
+        words: list[str] = self.tokenize(query)
+        if (not words):
+            return "[SEARCH]"
+
+        with self._lock:
+            matches: set | None = None
+
+            for word in words:
+                found: set = set()
+                i: int     = bisect.bisect_left(self._tokens, word)
+
+                while (i < len(self._tokens)) and (self._tokens[i].startswith(word)):
+                    found |= self._index[self._tokens[i]]
+                    i += 1
+
+                matches = found if (matches is None) else (matches & found)
+                if (not matches):
+                    return "[SEARCH]"
+
+            results: list = sorted(matches, key=lambda x: self._names[x])[:self._limit]
+
+            return "[SEARCH]" + "".join([self._rows[x] for x in results])
+
+    def sync(self) -> int:
+        '''
+        A function that brings the index up to date with the user's library. Only the playlists whose `snapshot_id` changed
+        (and the Liked Songs, if their count or latest addition changed) are reloaded, and removed playlists are dropped.
+        It's meant to run in the background, so its calls go through the scheduler's prefetch lane.
+
+        :return count:
+            The amount of reloaded sources
+        '''
+
+        client: APIClient = self._client
+        reloaded: int     = 0
+
+        with Scheduler.lane(Scheduler.PREFETCH):
+            first: dict     = client.fetch("current_user_playlists", limit=client.PAGE_SIZES["current_user_playlists"], offset=0)
+            playlists: list = list(first["items"])
+
+            for (_, page) in client.iter_pages("current_user_playlists", len(playlists), first["total"]):
+                playlists += page["items"]
+
+            client.remember_snapshots(playlists)
+
+            for source in [x for x in self._sources if (x != "collection") and (x not in [y["uri"] for y in playlists])]:
+                self.drop(source)
+
+            for playlist in playlists:
+                if (self._sources.get(playlist["uri"], (None,))[0] == playlist["snapshot_id"]):
+                    continue
+
+                try:
+                    items: list = list(playlist["tracks"]["items"]) if ("items" in playlist["tracks"]) else []
+                    for (_, page) in client.iter_pages("playlist_tracks", len(items), playlist["tracks"]["total"], playlist_id=playlist["uri"],
+                                                       fields=f"items(track({client.TRACK_FIELDS}))"):
+                        items += page["items"]
+
+                    self.replace(playlist["uri"], playlist["snapshot_id"], items)
+                    reloaded += 1
+                except Exception as e:
+                    self._log(f"[LIBRARY] Error indexing {playlist['name']}: {e}") if self._debug else None
+
+            # The Liked Songs don't have a snapshot, their count and latest addition tell if they changed
+            saved: dict   = client.fetch("current_user_saved_tracks", limit=1, offset=0)
+            snapshot: str = f"{saved['total']}:{saved['items'][0].get('added_at') if saved['items'] else ''}"
+
+            if (self._sources.get("collection", (None,))[0] != snapshot):
+                items: list = []
+                for (_, page) in client.iter_pages("current_user_saved_tracks", 0, saved["total"]):
+                    items += page["items"]
+
+                self.replace("collection", snapshot, items)
+                reloaded += 1
+
+        self._log(f"[LIBRARY] Synced, {reloaded} source(s) reloaded, {len(self)} tracks indexed") if self._debug else None
+
+        return reloaded
+
+    def replace(self, source: str, snapshot: str, items: list[dict]):
+        '''
+        A function that replaces the indexed tracks of the given source.
+
+        :param source:
+            The URI of the playlist, or `collection` for the Liked Songs
+        :param snapshot:
+            The snapshot of the source the items belong to
+        :param items:
+            The playlist (or saved track) items to index
+        '''
+
+        tracks: dict = {x["track"]["uri"]: x["track"] for x in items if (x.get("track") is not None) and (x["track"].get("uri") is not None)}
+
+        # Everything about the tracks is worked out before the lock is taken, so searches only wait for the index to be updated
+        with self._lock:
+            old: set = self._sources[source][1] if (source in self._sources) else set()
+        new: dict = {x: self._entry(y) for (x, y) in tracks.items() if (x not in old)} # URI -> (row, lowercase name, tokens)
+
+        # Only the tracks that left or joined the source are touched, not the ones it still has
+        with self._lock:
+            old = self._sources[source][1] if (source in self._sources) else set()
+
+            for uri in old - set(tracks):
+                self._forget(uri, source)
+
+            for uri in set(tracks) - old:
+                if (uri not in self._rows):
+                    (row, name, terms) = new[uri] if (uri in new) else self._entry(tracks[uri])
+                    self._rows[uri]    = row
+                    self._names[uri]   = name
+                    self._terms[uri]   = terms
+
+                    for token in terms:
+                        if (token not in self._index):
+                            self._index[token] = set()
+                            bisect.insort(self._tokens, token)
+                        self._index[token].add(uri)
+
+                self._owners.setdefault(uri, set()).add(source)
+
+            self._sources[source] = (snapshot, set(tracks))
+
+    def drop(self, source: str):
+        '''
+        A function that removes the indexed tracks of the given source (unless another source has them too).
+
+        :param source:
+            The URI of the playlist, or `collection` for the Liked Songs
+        '''
+
+        with self._lock:
+            self._drop(source)
+
+    def _drop(self, source: str):
+        if (source not in self._sources):
+            return None
+
+        for uri in self._sources.pop(source)[1]:
+            self._forget(uri, source)
+
+    # The row, lowercase name, and tokens of a track
+    def _entry(self, track: dict) -> tuple:
+        text: str = " ".join([track["name"], track.get("album", {}).get("name", "")] + [x["name"] for x in track["artists"]])
+        return (self._client._formatter.row(track), track["name"].lower(), set(self.tokenize(text)))
+
+    # Removes the given source from the owners of a track, and the track itself once no source has it anymore
+    def _forget(self, uri: str, source: str):
+        self._owners[uri].discard(source)
+        if (self._owners[uri]):
+            return None
+
+        del self._owners[uri]
+        del self._rows[uri]
+        del self._names[uri]
+
+        for token in self._terms.pop(uri):
+            self._index[token].discard(uri)
+            if (not self._index[token]):
+                del self._index[token]
+                self._tokens.pop(bisect.bisect_left(self._tokens, token))
@@ -0,0 +1,86 @@
+import asyncio as aio
+import sys
+import threading
+
+from collections import deque
+
+from datetime import datetime
+
+def current_time():
+    return f"{datetime.now():%d.%m.%y (%H:%M:%S)}"
+
+# Writes a line straight to the console (with the current time in front of it), for the classes that were given no Logger
+def console(*parts):
+    print(current_time(), *parts)
+
+class Logger(object):
+    '''
+    A class for a log that never makes the caller wait: lines are queued from any thread and written in batches by a task on the event
+    loop, at most `rate` lines per second. Lines that don't fit in the queue are dropped and counted, so logging can't slow down the
+    commands when the server is under load.
+    '''
+    _lines: deque         = None
+    _lock: threading.Lock = None
+    _rate: int            = 50
+    _interval: float      = 0.1
+
+    dropped: int = 0 # How many lines were dropped since the last write
+
+    def __init__(self, rate: int = 50, max_queued: int = 1000):
+        '''
+        A constructor for the Logger class.
+
+        :param rate:
+            How many lines per second are written at most
+        :param max_queued:
+            How many lines can wait to be written before new ones are dropped
+        '''
+        self._lines = deque(maxlen=max_queued)
+        self._lock  = threading.Lock()
+        self._rate  = rate
+
+    def log(self, *parts):
+        '''
+        A function that queues a line (with the current time in front of it) to be written, like `print` would.
+
+        :param parts:
+            The parts of the line, separated by spaces
+        '''
+
+        line: str = " ".join([current_time(), *[str(x) for x in parts]])
+
+        with self._lock:
+            if (len(self._lines) == self._lines.maxlen):
+                self.dropped += 1
+                return None
+
+            self._lines.append(line)
+
+    async def run(self):
+        '''
+        A coroutine that writes the queued lines until it's cancelled, the console is written to on its own thread since it can be slow.
+        '''
+
+        try:
+            while (True):
+                await aio.sleep(self._interval)
+
+                text: str = self.take(max(1, int(self._rate * self._interval)))
+                if (text):
+                    await aio.to_thread(self.write, text)
+        finally:
+            self.write(self.take(len(self._lines)))
+
+    def take(self, count: int) -> str:
+        with self._lock:
+            lines: list = [self._lines.popleft() for _ in range(min(count, len(self._lines)))]
+
+            if (self.dropped):
+                lines.append(f"{current_time()} [LOG] {self.dropped} line(s) dropped")
+                self.dropped = 0
+
+        return "".join([x + "\n" for x in lines])
+
+    def write(self, text: str):
+        sys.stdout.write(text)
+        sys.stdout.flush()
@@ -0,0 +1,137 @@
+import sqlite3
+import threading
+import time
+
+class MetadataStore(object):
+    '''
+    A class for the on-disk (SQLite) store of formatted payloads, keyed by Spotify URI, that survives restarts.
+    Playlists are validated with their `snapshot_id`, everything else (and playlist pages without a snapshot) with a maximum age per
+    kind, and the least recently used entries are evicted once the store is over its size cap.
+    '''
+    _connection: sqlite3.Connection = None
+    _lock: threading.Lock           = None
+    _max_entries: int               = 5000
+
+    # How many seconds the entries of each kind are trusted, playlist pages only use it when there's no snapshot to validate them with
+    MAX_AGES: dict = {
+        "album":    30 * 86400,
+        "artist":   86400,
+        "playlist": 86400,
+    }
+
+    def __init__(self, path: str, max_entries: int = 5000):
+        '''
+        A constructor for the MetadataStore class.
+
+        :param path:
+            The path of the SQLite database file, it's created if it doesn't exist
+        :param max_entries:
+            The maximum amount of entries kept, the least recently used ones get evicted first
+        '''
+        self._connection  = sqlite3.connect(path, check_same_thread=False)
+        self._lock        = threading.Lock()
+        self._max_entries = max_entries
+
+        with self._lock, self._connection:
+            self._connection.execute("""CREATE TABLE IF NOT EXISTS entries (
+                                            uri      TEXT NOT NULL,
+                                            kind     TEXT NOT NULL,
+                                            part     TEXT NOT NULL DEFAULT '',
+                                            snapshot TEXT,
+                                            payload  TEXT,
+                                            stored   REAL NOT NULL,
+                                            accessed REAL NOT NULL,
+                                            PRIMARY KEY (uri, kind, part))""")
+            self._connection.execute("CREATE INDEX IF NOT EXISTS entries_accessed ON entries (accessed)")
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._connection.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+
+    def get(self, kind: str, uri: str, part: str = "", snapshot: str = None) -> str | None:
+        '''
+        A function that returns the stored payload of the given entry, or `None` if there's no valid one.
+
+        :param kind:
+            The kind of the entry (`album`, `artist`, or `playlist`)
+        :param uri:
+            The Spotify URI of the entry
+        :param part:
+            Which part of the object the entry is, for example the offset of a playlist page
+        :param snapshot:
+            The current `snapshot_id` of the playlist, entries stored with a different one are removed
+        '''
+
+        now: float = time.time()
+
+        with self._lock, self._connection:
+            row: tuple | None = self._connection.execute("SELECT snapshot, payload, stored FROM entries WHERE uri = ? AND kind = ? AND part = ?",
+                                                         (uri, kind, part)).fetchone()
+            if (row is None):
+                return None
+
+            if (snapshot is not None) and (row[0] != snapshot): # The playlist changed, so every stored part of it is outdated
+                self._connection.execute("DELETE FROM entries WHERE uri = ? AND kind = ?", (uri, kind))
+                return None
+
+            # A playlist page that's checked against its snapshot can't go stale, one without a snapshot (on either side) can
+            max_age: float | None = self.MAX_AGES.get(kind) if (kind != "playlist") or (snapshot is None) or (row[0] is None) else None
+            if (max_age is not None) and (now - row[2] > max_age):
+                self._connection.execute("DELETE FROM entries WHERE uri = ? AND kind = ? AND part = ?", (uri, kind, part))
+                return None
+
+            self._connection.execute("UPDATE entries SET accessed = ? WHERE uri = ? AND kind = ? AND part = ?", (now, uri, kind, part))
+
+        return row[1]
+
+    def put(self, kind: str, uri: str, payload: str, part: str = "", snapshot: str = None):
+        '''
+        A function that stores the given entry, evicting the least recently used entries if the store is over its size cap.
+
+        :param kind:
+            The kind of the entry (`album`, `artist`, or `playlist`)
+        :param uri:
+            The Spotify URI of the entry
+        :param payload:
+            The formatted payload
+        :param part:
+            Which part of the object the entry is, for example the offset of a playlist page
+        :param snapshot:
+            The `snapshot_id` of the playlist the entry belongs to
+        '''
+
+        now: float = time.time()
+
+        with self._lock, self._connection:
+            # The columns are named, so stores made before the raw objects were dropped keep working
+            self._connection.execute("INSERT OR REPLACE INTO entries (uri, kind, part, snapshot, payload, stored, accessed) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                                     (uri, kind, part, snapshot, payload, now, now))
+
+            count: int = self._connection.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+            if (count > self._max_entries):
+                # Evicts a tenth more than needed, so it doesn't have to evict again on every single put
+                self._connection.execute("DELETE FROM entries WHERE rowid IN (SELECT rowid FROM entries ORDER BY accessed LIMIT ?)",
+                                         (count - self._max_entries + self._max_entries // 10,))
+
+    def invalidate(self, uri: str = None, kind: str = None) -> int:
+        '''
+        A function that removes stored entries.
+
+        :param uri:
+            The URI to remove the entries of, everything is removed if it's `None`
+        :param kind:
+            The kind of the entries to remove, entries of every kind are removed if it's `None`
+
+        :return count:
+            The amount of removed entries
+        '''
+
+        with self._lock, self._connection:
+            conditions: list = [x for x in ("uri = ?" if (uri is not None) else None, "kind = ?" if (kind is not None) else None) if (x)]
+            values: tuple    = tuple([x for x in (uri, kind) if (x is not None)])
+
+            return self._connection.execute("DELETE FROM entries" + (" WHERE " + " AND ".join(conditions) if (conditions) else ""), values).rowcount
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
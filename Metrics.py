@@ -0,0 +1,233 @@
+import bisect
+import threading
+
+class Histogram(object):
+    '''
+    A class for a latency histogram with fixed buckets, cheap enough to record every command and Spotify call into.
+    '''
+    BUCKETS: tuple = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0) # Upper bounds in seconds
+
+    counts: list = None # The count of every bucket, plus one for everything above the last one
+    total: float = 0    # The sum of every recorded value
+    count: int   = 0
+
+    def __init__(self):
+        self.counts = [0] * (len(self.BUCKETS) + 1)
+
+    def record(self, seconds: float):
+        self.counts[bisect.bisect_left(self.BUCKETS, seconds)] += 1
+        self.total += seconds
+        self.count += 1
+
+    def quantile(self, q: float) -> float:
+        '''
+        A function that returns the upper bound of the bucket the given quantile falls in (the last bound if it's above every bucket).
+
+        :param q:
+            The quantile, between 0 and 1
+        '''
+
+        if (self.count == 0):
+            return 0.0
+
+        rank: float = q * self.count
+        seen: int   = 0
+        for (i, count) in enumerate(self.counts):
+            seen += count
+            if (seen >= rank):
+                return self.BUCKETS[min(i, len(self.BUCKETS) - 1)]
+
+        return self.BUCKETS[-1]
+
+class Metrics(object):
+    '''
+    A class that collects the server's instrumentation: the latency, Spotify calls (and their response bytes), errors, and payload bytes
+    of every command, the latency, errors, and response bytes of every Spotify endpoint, and gauges (like the scheduler's queue depth) that are read when they're shown.
+    Everything is kept in memory and shown through the `stats` command and the Prometheus endpoint.
+    '''
+    _commands: dict       = None # Command -> {"latency": Histogram, "calls", "errors", "bytes", "spotify_bytes"}
+    _upstream: dict       = None # Spotify endpoint -> {"latency": Histogram, "errors", "bytes"}
+    _gauges: dict         = None # Name -> (a function that returns the value, help text)
+    _known: set           = None # The commands that get metrics of their own, everything else is recorded as `unknown`
+    _lock: threading.Lock = None
+
+    def __init__(self, commands: list[str] = None):
+        '''
+        A constructor for the Metrics class.
+
+        :param commands:
+            The commands clients can send, so made up ones don't each get their own metrics (every command does if it's `None`)
+        '''
+        self._commands = {}
+        self._upstream = {}
+        self._gauges   = {}
+        self._known    = set(commands) if (commands is not None) else None
+        self._lock     = threading.Lock()
+
+    def command(self, name: str, seconds: float, payload_bytes: int = 0, error: bool = False):
+        '''
+        A function that records a handled command.
+
+        :param name:
+            The command
+        :param seconds:
+            How long it took from receiving the command to sending the reply
+        :param payload_bytes:
+            The size of the reply
+        :param error:
+            If the reply was an error
+        '''
+
+        with self._lock:
+            entry: dict = self.entry(name)
+            entry["latency"].record(seconds)
+            entry["errors"] += error
+            entry["bytes"]  += payload_bytes
+
+    def calls(self, name: str, calls: int, response_bytes: int = 0):
+        '''
+        A function that records how many Spotify calls a command made.
+
+        :param name:
+            The command
+        :param calls:
+            The amount of Spotify calls it made
+        :param response_bytes:
+            How big the bodies of their responses were
+        '''
+
+        with self._lock:
+            entry: dict = self.entry(name)
+            entry["calls"]         += calls
+            entry["spotify_bytes"] += response_bytes
+
+    def new_command(self) -> dict:
+        return {"latency": Histogram(), "calls": 0, "errors": 0, "bytes": 0, "spotify_bytes": 0}
+
+    # The metrics of the given command, the ones of `unknown` if it isn't a command clients can send
+    def entry(self, name: str) -> dict:
+        name = name if (self._known is None) or (name in self._known) else "unknown"
+        return self._commands.get(name) or self._commands.setdefault(name, self.new_command())
+
+    @staticmethod
+    def label(value: str) -> str:
+        '''
+        A function that escapes a label value for the Prometheus text format.
+        '''
+
+        return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+    def upstream(self, endpoint: str, seconds: float, error: bool = False, response_bytes: int = 0):
+        '''
+        A function that records a Spotify call.
+
+        :param endpoint:
+            The name of the `spotipy.Spotify` function that was called
+        :param seconds:
+            How long the call took, including its wait in the scheduler
+        :param error:
+            If the call failed
+        :param response_bytes:
+            How big the body of its response was
+        '''
+
+        with self._lock:
+            entry: dict = self._upstream.get(endpoint) or self._upstream.setdefault(endpoint, {"latency": Histogram(), "errors": 0, "bytes": 0})
+            entry["latency"].record(seconds)
+            entry["errors"] += error
+            entry["bytes"]  += response_bytes
+
+    def gauge(self, name: str, read: callable, help: str = ""):
+        '''
+        A function that adds a value that's read whenever the metrics are shown.
+
+        :param name:
+            The name of the gauge
+        :param read:
+            A function that returns the current value
+        :param help:
+            What the gauge means
+        '''
+
+        self._gauges[name] = (read, help)
+
+    def read_gauges(self) -> dict:
+        values: dict = {}
+
+        for (name, (read, _)) in self._gauges.items():
+            try:
+                values[name] = read()
+            except Exception: # A gauge that can't be read right now is left out, rather than breaking the rest
+                pass
+
+        return values
+
+    def stats(self) -> str:
+        '''
+        A function that returns the metrics for the `stats` command.
+
+        :return payload:
+            The metrics in the following format:
+            `[STATS]\tcommand\t{name}\t{count}\t{errors}\t{p50 ms}\t{p99 ms}\t{calls}\t{bytes}\t{spotify bytes}\n...`
+            `\tupstream\t{endpoint}\t{count}\t{errors}\t{p50 ms}\t{p99 ms}\t{bytes}\n...\tgauge\t{name}\t{value}\n...`
+        '''
+
+        payload: str = "[STATS]"
+
+        with self._lock:
+            for (name, x) in sorted(self._commands.items()):
+                payload += (f"\tcommand\t{name}\t{x['latency'].count}\t{x['errors']}\t{x['latency'].quantile(0.5) * 1000:g}"
+                            f"\t{x['latency'].quantile(0.99) * 1000:g}\t{x['calls']}\t{x['bytes']}\t{x['spotify_bytes']}\n")
+
+            for (name, x) in sorted(self._upstream.items()):
+                payload += (f"\tupstream\t{name}\t{x['latency'].count}\t{x['errors']}\t{x['latency'].quantile(0.5) * 1000:g}"
+                            f"\t{x['latency'].quantile(0.99) * 1000:g}\t{x['bytes']}\n")
+
+        for (name, value) in self.read_gauges().items():
+            payload += f"\tgauge\t{name}\t{value:g}\n"
+
+        return payload
+
+    def prometheus(self) -> str:
+        '''
+        A function that returns the metrics in the Prometheus text format.
+        '''
+
+        lines: list = []
+
+        def histogram(metric: str, labels: str, latency: Histogram):
+            seen: int = 0
+            for (bound, count) in zip(Histogram.BUCKETS, latency.counts):
+                seen += count
+                lines.append(f'{metric}_bucket{{{labels},le="{bound:g}"}} {seen}')
+            lines.append(f'{metric}_bucket{{{labels},le="+Inf"}} {latency.count}')
+            lines.append(f"{metric}_sum{{{labels}}} {latency.total:.6f}")
+            lines.append(f"{metric}_count{{{labels}}} {latency.count}")
+
+        with self._lock:
+            lines += ["# HELP spotipy_command_seconds How long the commands took to answer", "# TYPE spotipy_command_seconds histogram"]
+            for (name, x) in sorted(self._commands.items()):
+                histogram("spotipy_command_seconds", f'command="{self.label(name)}"', x["latency"])
+
+            for (metric, key, help) in (("spotipy_command_spotify_calls_total", "calls", "How many Spotify calls the commands made"),
+                                        ("spotipy_command_errors_total", "errors", "How many commands were answered with an error"),
+                                        ("spotipy_command_bytes_total", "bytes", "How many bytes the replies of the commands had"),
+                                        ("spotipy_command_spotify_bytes_total", "spotify_bytes", "How many bytes the Spotify responses of the commands had")):
+                lines += [f"# HELP {metric} {help}", f"# TYPE {metric} counter"]
+                lines += [f'{metric}{{command="{self.label(name)}"}} {x[key]}' for (name, x) in sorted(self._commands.items())]
+
+            lines += ["# HELP spotipy_upstream_seconds How long the Spotify calls took, including their wait in the scheduler",
+                      "# TYPE spotipy_upstream_seconds histogram"]
+            for (name, x) in sorted(self._upstream.items()):
+                histogram("spotipy_upstream_seconds", f'endpoint="{self.label(name)}"', x["latency"])
+
+            lines += ["# HELP spotipy_upstream_errors_total How many Spotify calls failed", "# TYPE spotipy_upstream_errors_total counter"]
+            lines += [f'spotipy_upstream_errors_total{{endpoint="{self.label(name)}"}} {x["errors"]}' for (name, x) in sorted(self._upstream.items())]
+
+            lines += ["# HELP spotipy_upstream_bytes_total How many bytes the Spotify responses had", "# TYPE spotipy_upstream_bytes_total counter"]
+            lines += [f'spotipy_upstream_bytes_total{{endpoint="{self.label(name)}"}} {x["bytes"]}' for (name, x) in sorted(self._upstream.items())]
+
+        for (name, value) in self.read_gauges().items():
+            lines += [f"# HELP spotipy_{name} {self._gauges[name][1]}", f"# TYPE spotipy_{name} gauge", f"spotipy_{name} {value:g}"]
+
+        return "\n".join(lines) + "\n"
@@ -0,0 +1,175 @@
+import asyncio as aio
+import time
+
+from collections import deque
+
+from Logger import console
+
+class SlowClient(Exception):
+    '''
+    An exception that's raised when a frame is sent to an outbox whose client fell too far behind and is being disconnected.
+    '''
+
+class Outbox(object):
+    '''
+    A class for the outbound frames of one websocket connection. Frames are queued without waiting and written by the outbox's own
+    task, so a client on a bad connection only slows down its own frames, never its command loop or the pushes to other clients.
+    A newer `[Current]` or `[INIT]` frame replaces the one of the same kind that's still waiting, since the old state is of no use anymore
+    (unless `collapse` is off, like for a client that gets deltas, whose waiting deltas might be based on the frame that would be dropped).
+
+    A client that falls more than `max_lag` seconds behind is downgraded (`on_lag` is called once, which stops its pushes), and it's
+    disconnected if it falls twice as far behind or more than `max_frames` frames pile up.
+    '''
+    _websocket            = None
+    _frames: deque        = None  # (kind, frame, when it was queued), the kind is `None` for frames that can't be replaced
+    _ready: aio.Event     = None
+    _task: aio.Task       = None
+    _sending: float       = None  # When the frame that's being written right now was queued
+    _on_lag: callable     = None
+    _debug: bool          = False
+    _log: callable        = None
+
+    max_frames: int  = 64
+    max_lag: float   = 10.0
+    collapsed: int   = 0     # How many waiting frames were replaced by newer ones
+    collapse: bool   = True  # If a newer frame replaces the waiting one of the same kind
+    downgraded: bool = False
+    closed: bool     = False
+
+    COLLAPSIBLE: tuple = ("[Current]", "[INIT]") # The frames that only hold the latest state, so only the newest one is worth sending
+
+    def __init__(self, websocket, max_frames: int = 64, max_lag: float = 10.0, on_lag: callable = None, debug: bool = False,
+                 log: callable = None):
+        '''
+        A constructor for the Outbox class, the writer task starts right away.
+
+        :param websocket:
+            The websocket to write the frames to
+        :param max_frames:
+            How many frames can wait before the client is disconnected
+        :param max_lag:
+            How many seconds the oldest waiting frame can wait before the client is downgraded (0 never downgrades or disconnects it)
+        :param on_lag:
+            The function that's called once the client falls behind, to send it less
+        :param debug:
+            If it should print debug messages
+        :param log:
+            The function that writes the debug messages (like `Logger.log`), they're printed if it's `None`
+        '''
+        self._websocket = websocket
+        self._frames    = deque()
+        self._ready     = aio.Event()
+        self._on_lag    = on_lag
+        self._debug     = debug
+        self._log       = log or console
+        self.max_frames = max_frames
+        self.max_lag    = max_lag
+        self._task      = aio.create_task(self._run())
+
+    def __len__(self) -> int:
+        return len(self._frames) + (self._sending is not None)
+
+    async def send(self, frame: str):
+        '''
+        A coroutine that queues the given frame to be sent, it never waits for the client (so it can stand in for the websocket's `send`).
+
+        :param frame:
+            The frame to send
+        '''
+
+        if (self.closed):
+            raise SlowClient()
+
+        kind: str | None = self.kind(frame)
+        if (kind is not None) and (self.collapse):
+            for x in [x for x in self._frames if (x[0] == kind)]:
+                self._frames.remove(x)
+                self.collapsed += 1
+
+        self._frames.append((kind, frame, time.monotonic()))
+        self._ready.set()
+        self.check()
+
+    def kind(self, frame: str) -> str | None:
+        '''
+        A function that returns the kind of a frame that a newer one of the same kind replaces, the tags of its lines (a `current_info`
+        reply has both `[Current]` and `[INIT]`, so it only replaces another reply like it), or `None` for every other frame.
+        '''
+
+        if (not frame.startswith(self.COLLAPSIBLE)):
+            return None
+
+        tags: list = [x.split("\t", 1)[0] for x in frame.split("\n")]
+        return "".join(tags) if (all([x in self.COLLAPSIBLE for x in tags])) else None
+
+    def lag(self) -> float:
+        '''
+        A function that returns how many seconds the oldest frame that isn't written yet has been waiting.
+        '''
+
+        oldest: list = [x for x in (self._sending, self._frames[0][2] if (self._frames) else None) if (x is not None)]
+        return time.monotonic() - min(oldest) if (oldest) else 0.0
+
+    def check(self):
+        '''
+        A function that downgrades or disconnects the client if it fell too far behind.
+        '''
+
+        if (self.closed):
+            return None
+
+        lag: float = self.lag() if (self.max_lag) else 0.0
+
+        if (len(self) > self.max_frames) or ((self.max_lag) and (lag > self.max_lag * 2)):
+            self._log(f"Disconnecting a client that's {lag:.1f} seconds ({len(self)} frames) behind") if self._debug else None
+            aio.create_task(self.close(code=1008, reason="Too far behind"))
+        elif (self.max_lag) and (lag > self.max_lag) and (not self.downgraded):
+            self._log(f"Downgrading a client that's {lag:.1f} seconds behind") if self._debug else None
+            self.downgraded = True
+            self._on_lag() if (self._on_lag is not None) else None
+
+    async def close(self, code: int = 1000, reason: str = ""):
+        '''
+        A coroutine that drops the waiting frames, stops the writer task, and closes the websocket (if it isn't closed already).
+        '''
+
+        if (self.closed):
+            return None
+
+        self.closed   = True
+        self._sending = None
+        self._frames.clear()
+        self._task.cancel()
+
+        if (code != 1000):
+            await self._websocket.close(code=code, reason=reason)
+
+    async def _run(self):
+        try:
+            while (True):
+                await self._ready.wait()
+
+                while (self._frames):
+                    (_, frame, queued) = self._frames.popleft()
+
+                    self._sending = queued
+                    sending: aio.Task = aio.create_task(self._websocket.send(frame))
+
+                    # A client that stops reading makes the write hang, so how far behind it is gets checked while waiting for it
+                    try:
+                        while (not sending.done()):
+                            await aio.wait([sending], timeout=self.max_lag / 2 if (self.max_lag) else None)
+                            self.check()
+                    except aio.CancelledError:
+                        sending.cancel()
+                        raise
+
+                    sending.result()
+                    self._sending = None
+
+                self._ready.clear()
+        except aio.CancelledError:
+            raise
+        except Exception: # The connection is gone, the socket's loop notices it on its own
+            self.closed = True
+            self._frames.clear()
@@ -0,0 +1,164 @@
+import asyncio as aio
+
+from concurrent.futures import Executor
+
+from APIClient import APIClient
+
+class PlaybackPoller(object):
+    '''
+    A class that polls the playback state of one Spotify account in the background and pushes the `[Current]` and `[INIT]` payloads
+    to every subscribed websocket, but only when they changed since the last poll.
+    '''
+    _client: APIClient     = None
+    _executor: Executor    = None
+    _subscribers: set      = None
+    _task: aio.Task        = None
+    _wake: aio.Event       = None
+    _last_track: str       = None
+    _last_states: str      = None
+    _on_track: callable    = None
+    _debug: bool           = False
+    _log: callable         = None
+
+    _fast: float   = 1.0  # Seconds between polls while a track is about to end
+    _normal: float = 3.0  # Seconds between polls while a track is playing
+    _slow: float   = 10.0 # Seconds between polls while the playback is paused or inactive
+    _ending: int   = 5000 # How many milliseconds before the end of a track the fast interval kicks in
+
+    def __init__(self, client: APIClient, executor: Executor, fast: float = 1.0, normal: float = 3.0, slow: float = 10.0, on_track: callable = None):
+        '''
+        A constructor for the PlaybackPoller class.
+
+        :param client:
+            The APIClient of the account to poll
+        :param executor:
+            The executor that runs the (blocking) Spotify API calls
+        :param fast:
+            Seconds between polls while a track is about to end
+        :param normal:
+            Seconds between polls while a track is playing
+        :param slow:
+            Seconds between polls while the playback is paused or inactive
+        :param on_track:
+            An optional function that gets called with the `current_playback` dictionary whenever the track changes
+        '''
+        self._client      = client
+        self._executor    = executor
+        self._subscribers = set()
+        self._fast        = fast
+        self._normal      = normal
+        self._slow        = slow
+        self._on_track    = on_track
+        self._debug       = client._debug
+        self._log         = client._log
+
+    async def subscribe(self, websocket):
+        '''
+        A function that subscribes the given websocket to the playback state pushes.
+        The poller starts with the first subscriber, and the new subscriber gets the last known state straight away.
+
+        :param websocket:
+            The websocket (or the Outbox of its connection) to push the payloads to
+        '''
+
+        self._subscribers.add(websocket)
+
+        if (self._task is None) or (self._task.done()):
+            self._wake = aio.Event()
+            self._task = aio.create_task(self._run())
+        else:
+            for payload in (self._last_track, self._last_states):
+                if (payload is not None):
+                    await websocket.send(payload)
+
+    def unsubscribe(self, websocket):
+        '''
+        A function that unsubscribes the given websocket from the playback state pushes.
+        The poller stops once the last subscriber is gone, so an account nobody listens to doesn't get polled.
+
+        :param websocket:
+            The websocket to stop pushing to
+        '''
+
+        self._subscribers.discard(websocket)
+
+        if (not self._subscribers) and (self._task is not None):
+            self._task.cancel()
+            self._task        = None
+            self._last_track  = None
+            self._last_states = None
+
+    def poke(self):
+        '''
+        A function that makes the poller poll right away, used after a command changed the playback (skipping, pausing, etc.)
+        '''
+
+        if (self._wake is not None):
+            self._wake.set()
+
+    def get_interval(self, result: dict) -> float:
+        '''
+        A function that returns how long to wait until the next poll, based on the given playback state.
+
+        :param result:
+            The `current_playback` dictionary of the last poll (`None` if there's no active playback)
+
+        :return interval:
+            The amount of seconds to wait
+        '''
+
+        if (result is None) or (not result["is_playing"]) or (result["item"] is None):
+            return self._slow
+
+        remaining: int = result["item"]["duration_ms"] - (result["progress_ms"] or 0)
+
+        if (remaining <= self._ending):
+            return self._fast
+
+        # Waking up right as the track ends catches the track change without polling fast for the whole track
+        return min(self._normal, max(self._fast, (remaining - self._ending) / 1000))
+
+    async def _run(self):
+        loop = aio.get_running_loop()
+
+        while (self._subscribers):
+            result: dict | None = None
+
+            try:
+                result = await loop.run_in_executor(self._executor, self._client.fetch, "current_playback")
+
+                if (result is not None) and (result["item"] is not None):
+                    track: str = self._client.get_track_data(result, ws_call="current")
+                else:
+                    track: str = "[ERROR] No current song active"
+                states: str = self._client.format_playback_states(result)
+
+                if (track != self._last_track):
+                    self._last_track = track
+                    self._client.invalidate("queue") # The queue moves along with the current track
+                    self._on_track(result) if (self._on_track is not None) and (result is not None) else None
+                    await self._push(track)
+
+                if (states != self._last_states):
+                    self._last_states = states
+                    await self._push(states)
+            except aio.CancelledError:
+                raise
+            except Exception as e:
+                self._log(f"[ERROR] Error polling playback state: {e}") if self._debug else None
+
+            try:
+                await aio.wait_for(self._wake.wait(), timeout=self.get_interval(result))
+            except aio.TimeoutError:
+                pass
+            self._wake.clear()
+
+    async def _push(self, payload: str):
+        subscribers: list = list(self._subscribers)
+        results: list     = await aio.gather(*[x.send(payload) for x in subscribers], return_exceptions=True)
+
+        for websocket, result in zip(subscribers, results):
+            if (isinstance(result, Exception)):
+                self._subscribers.discard(websocket)
+
+        self._log(f"Pushed to {len(subscribers)} client(s): {payload}") if self._debug else None
@@ -0,0 +1,110 @@
+import threading
+import time
+
+class PlaybackState(object):
+    '''
+    A class for the local model of an account's playback (track, progress, shuffle, repeat, playing, and device).
+    Actions update it right away (optimistically), reads of `current_playback` reconcile it, and the progress is interpolated from
+    the last sync, so most commands can answer from it without reading the playback from Spotify first.
+    '''
+    _result: dict         = None  # The last `current_playback` result the model was synced with
+    _synced_at: float     = 0     # The `time.monotonic()` of the last sync (or optimistic update of the progress)
+    _active: bool         = False # If there was an active playback at the last sync
+    _stale: bool          = True  # Set when an action made the model unreliable (skipping tracks, etc.) until the next sync
+    _max_age: float       = 5.0
+    _lock: threading.Lock = None
+
+    def __init__(self, max_age: float = 5.0):
+        '''
+        A constructor for the PlaybackState class.
+
+        :param max_age:
+            How many seconds the model is trusted after a sync before a read has to refresh it
+        '''
+        self._max_age = max_age
+        self._lock    = threading.Lock()
+
+    def sync(self, result: dict | None):
+        '''
+        A function that reconciles the model with a `current_playback` result fetched from Spotify.
+
+        :param result:
+            The `current_playback` dictionary (`None` if there's no active playback)
+        '''
+
+        with self._lock:
+            self._result    = dict(result) if (result is not None) else None
+            self._active    = result is not None
+            self._synced_at = time.monotonic()
+            self._stale     = False
+
+    def expire(self):
+        '''
+        A function that marks the model as unreliable, so the next read refreshes it from Spotify.
+        '''
+
+        with self._lock:
+            self._stale = True
+
+    def fresh(self) -> bool:
+        '''
+        A function that checks if the model can be trusted: it was synced recently, nothing made it unreliable since, and the
+        interpolated progress hasn't reached the end of the track (which means a different track is playing by now).
+        '''
+
+        with self._lock:
+            if (self._stale) or (time.monotonic() - self._synced_at > self._max_age):
+                return False
+
+            if (not self._active) or (self._result.get("item") is None):
+                return True
+
+            return self._progress() < self._result["item"]["duration_ms"]
+
+    def progress(self) -> int:
+        '''
+        A function that returns the progress of the current track in milliseconds, interpolated from the last sync.
+        '''
+
+        with self._lock:
+            return self._progress() if (self._active) else 0
+
+    def update(self, **changes):
+        '''
+        A function that optimistically applies the changes of an action that went through, until the next sync confirms them.
+
+        :param changes:
+            The `current_playback` keys to change (`is_playing`, `shuffle_state`, `repeat_state`, or `progress_ms`)
+        '''
+
+        with self._lock:
+            if (not self._active):
+                return None
+
+            # The progress keeps moving while playing, so it's pinned down before the playing state (or the progress itself) changes
+            self._result["progress_ms"] = changes.pop("progress_ms", self._progress())
+            self._synced_at             = time.monotonic()
+            self._result.update(changes)
+
+    def as_result(self) -> dict | None:
+        '''
+        A function that returns the model in the same shape as a `current_playback` result (with the interpolated progress),
+        so the APIClient's formatting functions can be used on it.
+        '''
+
+        with self._lock:
+            if (not self._active):
+                return None
+
+            return {**self._result, "progress_ms": self._progress()}
+
+    def _progress(self) -> int:
+        progress: int = self._result.get("progress_ms") or 0
+
+        if (self._result.get("is_playing")):
+            progress += int((time.monotonic() - self._synced_at) * 1000)
+
+        if (self._result.get("item") is not None):
+            progress = min(progress, self._result["item"]["duration_ms"])
+
+        return progress
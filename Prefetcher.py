@@ -0,0 +1,123 @@
+import threading
+import time
+
+from concurrent.futures import ThreadPoolExecutor
+
+from APIClient import APIClient
+from Scheduler import Scheduler
+
+class Prefetcher(object):
+    '''
+    A class that warms the views a user is likely to open next into the APIClient's response cache, in the background.
+    Prefetches run one at a time on their own thread, in the scheduler's lowest lane, and wait for the user commands to finish and the
+    rate limit budget to recover (or get dropped if they don't), so they only use what the users aren't using and never make them wait.
+    '''
+    _client: APIClient           = None
+    _executor: ThreadPoolExecutor = None
+    _busy: callable              = None
+    _pending: set                = None
+    _lock: threading.Lock        = None
+    _last_track: str             = None
+    _debug: bool                 = False
+    _log: callable               = None
+
+    _window: int     = 20  # How many tracks one page of `display_playlist` shows
+    _patience: float = 2.0 # How many seconds a prefetch waits for the users to be idle before it's dropped
+
+    def __init__(self, client: APIClient, busy: callable):
+        '''
+        A constructor for the Prefetcher class.
+
+        :param client:
+            The APIClient whose cache gets warmed
+        :param busy:
+            A function that returns `True` while a user command is running
+        '''
+        self._client   = client
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="spotify-prefetch")
+        self._busy     = busy
+        self._pending  = set()
+        self._lock     = threading.Lock()
+        self._debug    = client._debug
+        self._log      = client._log
+
+    def after_playlist(self, uri: str, offset: int, total: int):
+        '''
+        A function that prefetches the pages before and after the playlist page that was just shown.
+
+        :param uri:
+            The URI of the playlist
+        :param offset:
+            The offset of the page that was shown
+        :param total:
+            The total amount of tracks in the playlist
+        '''
+
+        for x in (offset + self._window, offset - self._window):
+            if (0 <= x < total):
+                self.submit(*self._client.playlist_key(uri, x), self._client.playlist_view, uri, x)
+
+    def after_track(self, result: dict):
+        '''
+        A function that prefetches the album and artist views of the given currently playing track, once per track.
+
+        :param result:
+            The `current_playback` (or `current_user_playing_track`) dictionary of the currently playing track
+        '''
+
+        try:
+            track: dict = result["item"]
+            if (track["uri"] == self._last_track):
+                return None
+
+            self._last_track = track["uri"]
+            album: str       = track["album"]["uri"]
+            artist: str      = track["artists"][0]["uri"]
+        except (KeyError, IndexError, TypeError):
+            return None
+
+        self.submit("album", album, self._client.album_view, album)
+        self.submit("artist", artist, self._client.artist_view, artist)
+
+    def submit(self, endpoint: str, key, build: callable, *args):
+        '''
+        A function that queues a view to be prefetched, unless it's already cached or queued.
+
+        :param endpoint:
+            The cache endpoint of the view
+        :param key:
+            The cache key of the view
+        :param build:
+            The APIClient view function that fetches (and caches) the view
+        :param args:
+            The arguments to pass to the view function
+        '''
+
+        with self._lock:
+            if ((endpoint, key) in self._pending) or (self._client._cache.contains(endpoint, key)):
+                return None
+            self._pending.add((endpoint, key))
+
+        self._executor.submit(self._run, endpoint, key, build, *args)
+
+    def _run(self, endpoint: str, key, build: callable, *args):
+        with self._lock:
+            self._pending.discard((endpoint, key))
+
+        # Prefetches are usually queued by the command that's still running, so they give it (and any other command) a moment to finish
+        deadline: float = time.monotonic() + self._patience
+        while (self._busy()) or (not self._client._scheduler.idle()):
+            if (time.monotonic() > deadline):
+                self._log(f"Prefetch of {endpoint} {key} dropped, users are busy") if self._debug else None
+                return None
+            time.sleep(0.05)
+
+        if (self._client._cache.contains(endpoint, key)):
+            return None
+
+        try:
+            with Scheduler.lane(Scheduler.PREFETCH):
+                build(*args)
+            self._log(f"Prefetched {endpoint} {key}") if self._debug else None
+        except Exception as e:
+            self._log(f"Prefetch of {endpoint} {key} failed: {e}") if self._debug else None
@@ -1,61 +1,138 @@
 import asyncio as aio
 import websockets as ws
 import spotipy as sp
+import os
+import re
+import threading
+import time
 
-from APIClient import APIClient # The class that handles the Spotify API and custom functions
+from concurrent.futures import ThreadPoolExecutor
 
-from datetime import datetime
-def current_time():
-    return f"{datetime.now():%d.%m.%y (%H:%M:%S)}"
+from APIClient import APIClient, RequestScope # The class that handles the Spotify API and custom functions
+from Scheduler import Scheduler, RateLimited, RequestExpired # The class that rate limits and prioritizes the Spotify calls
+from MetadataStore import MetadataStore # The class for the on-disk store of catalog payloads
+from Account import Account # The class for one hosted Spotify account (its client, poller, prefetcher, and library index)
+from FakeSpotify import FakeSpotify # The made up Spotify backend for running the server without an account (benchmarks)
+from Metrics import Metrics # The class that collects the latency, Spotify calls, and sizes of the commands
+from Logger import Logger # The class for the log that's written in the background, so commands never wait for the console
+from Session import Session # The class for the state of one websocket connection
+from Outbox import Outbox # The class for the queue of frames sent to one websocket connection
+from Inbox import Inbox # The class for the messages of one websocket connection that weren't handled yet
 
 import argparse as arg
 parser = arg.ArgumentParser(description="The websocket server for the Resonite Spotipy project")
 parser.add_argument("-d", "--debug", dest="debug", action="store_true", help="Prints debug messages", default=False)
+parser.add_argument("-w", "--workers", dest="workers", type=int, help="How many commands can talk to Spotify at the same time", default=4)
+parser.add_argument("--control-workers", dest="control_workers", type=int, help="How many playback controls can talk to Spotify at the same time, on workers of their own", default=2)
+parser.add_argument("--spotify-timeout", dest="spotify_timeout", type=float, help="How many seconds a Spotify call can wait for an answer before it fails", default=5.0)
+parser.add_argument("--rate", dest="rate", type=float, help="How many Spotify calls per second are made on average", default=10.0)
+parser.add_argument("--burst", dest="burst", type=int, help="How many Spotify calls can be made at once after being idle", default=20)
+parser.add_argument("--store", dest="store", help="The file of the on-disk metadata store (an empty string disables it)", default="ResoniteSpotipy.db")
+parser.add_argument("--store-size", dest="store_size", type=int, help="How many entries the on-disk metadata store keeps", default=5000)
+parser.add_argument("--library-sync", dest="library_sync", type=int, help="How many seconds pass between syncs of the local library index (0 disables it)", default=600)
+parser.add_argument("--account", dest="accounts", action="append", help="An extra Spotify account to host, it's logged into on startup and picked by connections with 'account <key>' (can be given more than once)", default=[])
+parser.add_argument("--device", dest="devices", action="append", help="The name or ID of a device to play from, the first one that's there is used (can be given more than once, the active device is used if none of them is there)", default=[])
+parser.add_argument("--device-ttl", dest="device_ttl", type=float, help="How many seconds the device list is trusted before it's looked up again", default=30.0)
+parser.add_argument("--port", dest="port", type=int, help="The port of the websocket, instead of the one in IDs.txt", default=None)
+parser.add_argument("--fake", dest="fake", action="store_true", help="Uses a made up Spotify backend instead of a real account (for benchmarks)", default=False)
+parser.add_argument("--fake-latency", dest="fake_latency", type=float, help="How many milliseconds the calls to the made up Spotify backend take on average", default=50.0)
+parser.add_argument("--fake-429", dest="fake_429", type=float, help="The chance (0 to 1) of the made up Spotify backend answering with a 429", default=0.0)
+parser.add_argument("--metrics-port", dest="metrics_port", type=int, help="The local port of the Prometheus metrics endpoint (0 disables it)", default=0)
+parser.add_argument("--log-rate", dest="log_rate", type=int, help="How many log lines per second are written at most", default=50)
+parser.add_argument("--image-size", dest="image_size", type=int, help="The width in pixels of the pictures the client shows, the best fitting picture is sent instead of the biggest one", default=None)
+parser.add_argument("--send-queue", dest="send_queue", type=int, help="How many frames can wait to be sent to a client before it's disconnected", default=64)
+parser.add_argument("--send-lag", dest="send_lag", type=float, help="How many seconds a client can fall behind before its pushes stop, it's disconnected at twice that (0 disables it)", default=10.0)
+parser.add_argument("--search-debounce", dest="search_debounce", type=int, help="How many milliseconds a search waits for the user to keep typing before it's made", default=0)
+parser.add_argument("--no-supersede", dest="supersede", action="store_false", help="Answers every search and display command, even the ones the client already sent a newer one of", default=True)
+parser.add_argument("--no-compression", dest="compression", action="store_false", help="Disables compressing the frames (permessage-deflate) of the clients that support it", default=True)
+parser.add_argument("--no-prefetch", dest="prefetch", action="store_false", help="Disables prefetching the views users are likely to open next", default=True)
 args = parser.parse_args()
 
-DEBUG: bool = args.debug # A variable for the program to know if it should print debug messages into the console
+DEBUG: bool        = args.debug        # A variable for the program to know if it should print debug messages into the console
+WORKERS: int       = args.workers      # The size of the worker pool that runs the (blocking) Spotify API calls
+PREFETCH: bool     = args.prefetch     # If the views users are likely to open next should be prefetched
+RATE: float        = args.rate         # The average amount of Spotify calls per second the scheduler lets through
+BURST: int         = args.burst        # The amount of Spotify calls the scheduler lets through at once after being idle
+STORE_PATH: str    = args.store        # The file of the on-disk metadata store
+STORE_SIZE: int    = args.store_size   # The maximum amount of entries in the on-disk metadata store
+LIBRARY_SYNC: int  = args.library_sync # The amount of seconds between syncs of the local library index
+ACCOUNT_KEYS: list = args.accounts     # The keys of the extra accounts to log into on startup
+FAKE: bool         = args.fake         # If the made up Spotify backend is used instead of real accounts
+METRICS_PORT: int  = args.metrics_port # The port of the Prometheus metrics endpoint
+COMPRESSION: bool  = args.compression  # If permessage-deflate is offered to the clients (the ones that don't ask for it get plain frames)
+SEND_QUEUE: int    = args.send_queue   # How many frames can wait to be sent to a client
+SEND_LAG: float    = args.send_lag     # How many seconds a client can fall behind before it's downgraded
+SUPERSEDE: bool    = args.supersede    # If a newer search or display command of a client replaces the older one it's waiting for
+DEBOUNCE: int      = args.search_debounce # How many milliseconds a search waits for a newer one
+
+EXECUTOR: ThreadPoolExecutor = ThreadPoolExecutor(max_workers=max(1, WORKERS), thread_name_prefix="spotify")
+CONTROLS: ThreadPoolExecutor = ThreadPoolExecutor(max_workers=max(1, args.control_workers), thread_name_prefix="spotify-control") # So a pause never waits for a worker that browsing holds
+IN_FLIGHT: int               = 0 # How many user commands are running on the worker pool right now
+METRICS: Metrics             = Metrics(commands=[
+    "current_info", "current_track", "current_song", "current_states", "next", "previous", "play", "pause", "resume", "shuffle", "repeat",
+    "list_playlists", "search", "search_library", "list_queue", "display_album", "display_playlist", "display_artist", "cache_stats",
+    "clear_cache", "stats", "subscribe", "unsubscribe", "account", "delta", "stream_playlist", "stream_playlists",
+]) # Whatever else a client sends is recorded as `unknown`
+LOG: Logger                  = Logger(rate=args.log_rate)
+
+# Runs a blocking function on the worker pool so the event loop can keep serving the other clients, playback controls run on their own
+async def run_blocking(func: callable, *args, control: bool = False):
+    global IN_FLIGHT
+    
+    IN_FLIGHT += 1
+    try:
+        return await aio.get_running_loop().run_in_executor(CONTROLS if (control) else EXECUTOR, func, *args)
+    finally:
+        IN_FLIGHT -= 1
 
 #--------------------------------------------------------------
 
-DISPLAY: str = "" # A variable for the websocket to know what is displayed in the Spotify menu
+SESSIONS: dict[str, Session] = {} # The state of every connected websocket, by connection ID
+TASKS: set[aio.Task]         = set() # The background tasks of the server (the log writer and the token refresher)
 
 # Displays current information about the currently playing track and/or the playback states
-def display_current_info(received: str) -> str:
+def display_current_info(session: Session, received: str) -> str:
+    client: APIClient = session.account.client
     payload: str = ""
     
     match (received):
         case "current_info": # Used for getting the currently playing track and the playback states
             try:
-                _ = API.current_user_playing_track()['item'] # Throws an error if there's no currently playing track
+                result: dict = client.playback() # Has both the currently playing track and the playback states
+                _ = result['item']['uri'] # Throws an error if there's no currently playing track
                 
-                payload = CLIENT.get_track_data(API.current_user_playing_track(), ws_call="current") + "\n" + CLIENT.get_playback_states()
+                session.account.prefetcher.after_track(result) if session.account.prefetcher else None
+                payload = client.get_track_data(result, ws_call="current") + "\n" + client.format_playback_states(result)
             except:
                 payload = "[ERROR] No current song active"
         
-        case "current_track":
+        case "current_track" | "current_song":
             try:
-                _ = API.current_user_playing_track()['item'] # Throws an error if there's no currently playing track
+                result: dict = client.fetch("current_user_playing_track")
+                _ = result['item']['uri'] # Throws an error if there's no currently playing track
                 
-                payload = CLIENT.get_track_data(API.current_user_playing_track(), ws_call="current")
+                payload = client.get_track_data(result, ws_call="current")
             except:
                 payload = "[ERROR] No current song active"
         
         case "current_states":
             try:
-                payload = CLIENT.get_playback_states()
+                payload = client.get_playback_states()
             except:
                 payload = "[ERROR] Error getting playback states"
     
     return payload
 
 # Modifies the currently playing track, like going to the next or previous song, or playing a new song
-def modify_current_track(received: str, data: str) -> str:
+def modify_current_track(session: Session, received: str, data: str) -> str:
+    client: APIClient = session.account.client
     payload: str = ""
     
     match (received):
         case "next":
             try:
-                CLIENT.run_action(API.next_track)
+                client.run_action(client._api.next_track)
+                client._state.expire() # The model doesn't know the next track
                 
                 payload = "[NEXT SONG]"
             except:
@@ -63,10 +140,14 @@ def modify_current_track(received: str, data: str) -> str:
         
         case "previous":
             try:
-                if (API.current_playback()["progress_ms"] > 4000):
-                    CLIENT.run_action(API.seek_track, 0)
+                _ = client.playback()["progress_ms"] # Throws an error if there's no active playback
+                
+                if (client._state.progress() > 4000): # Restarts the track instead, like Spotify itself does
+                    client.run_action(client._api.seek_track, 0)
+                    client._state.update(progress_ms=0)
                 else:
-                    CLIENT.run_action(API.previous_track)
+                    client.run_action(client._api.previous_track)
+                    client._state.expire()
                 
                 payload = "[PREVIOUS SONG]"
             except:
@@ -79,247 +160,577 @@ def modify_current_track(received: str, data: str) -> str:
                 # Format for playing from queue: "<offset uri>"
                 play_data: list[str] = data.split(" ")
                 try:
-                    match (DISPLAY):
+                    match (session.view):
                         case "search":
                             if (play_data[0] == "track"):
-                                API.start_playback(uris=[play_data[1]]) # Plays just the selected song
+                                client.run_action(client._api.start_playback, uris=[play_data[1]]) # Plays just the selected song
                                 payload = "[PLAY] Played selected searched song"
                         
                         case "queue":
-                            API.start_playback(context_uri=API.currently_playing()["context"]["uri"], offset={"uri": play_data[1]}) # Plays song in the queue that was clicked on
+                            # The context is remembered from when the queue was listed, the playback model only has to be asked if it wasn't known then
+                            context: str | None = session.context or ((client.playback() or {}).get("context") or {}).get("uri")
+                            
+                            if (context is not None):
+                                client.run_action(client._api.start_playback, context_uri=context, offset={"uri": play_data[1]}) # Plays song in the queue that was clicked on
+                            else: # Without a context, the listed queue is played from the song that was clicked on
+                                client.run_action(client._api.start_playback, uris=session.following(play_data[1]))
                             payload = "[PLAY] Played selected song in queue"
                         
                         case "playlist" | "album":
                             if (len(play_data) == 3):
-                                API.start_playback(context_uri=play_data[1], offset={"uri": play_data[2]}) # Plays song in the playlist/album that was clicked on
+                                client.run_action(client._api.start_playback, context_uri=play_data[1], offset={"uri": play_data[2]}) # Plays song in the playlist/album that was clicked on
                                 payload = "[PLAY] Played selected song in playlist/album"
                             else:
-                                API.start_playback(context_uri=play_data[1]) # Plays the playlist/album that was clicked on
+                                client.run_action(client._api.start_playback, context_uri=play_data[1]) # Plays the playlist/album that was clicked on
                                 payload = "[PLAY] Played selected playlist/album"
                         
                 except:
                     payload = "[ERROR] Error playing song"
+                
+                client._state.expire() # The model doesn't know what's playing now
 
     return payload
 
 # Modifies the playback states, like pausing, resuming, or changing the shuffle state
-def modify_playback_states(received: str) -> str:
+def modify_playback_states(session: Session, received: str) -> str:
+    client: APIClient = session.account.client
     payload: str = ""
     
+    # The states come from the local playback model (only read from Spotify if it's out of date), and the change is applied to it
+    # optimistically, so the reply doesn't need to read the states again
+    try:
+        result: dict | None = client.playback()
+    except:
+        result: dict | None = None
+    
     if (received == "pause" or received == "resume"):
-        try:
-            _ = API.current_user_playing_track()['is_playing']
-        except:
-            _ = False
+        _ = result['is_playing'] if result else False
         
         playing = "False" if _ else "True"
         
         try:
-            CLIENT.run_action(API.pause_playback) if _ else CLIENT.run_action(API.start_playback)
+            client.run_action(client._api.pause_playback) if _ else client.run_action(client._api.start_playback)
+            client._state.update(is_playing=not _)
             
-            payload = CLIENT.get_playback_states(playing=playing)
+            payload = client.format_playback_states(result, playing=playing) if result else client.get_playback_states(playing=playing)
         except:
             payload = "[ERROR] Error pausing/resuming playback"
              
     match (received):       
         case "shuffle":
             try:
-                shuffle: bool = API.current_playback()["shuffle_state"]
-                CLIENT.run_action(API.shuffle, not shuffle) # Throws an error if it can't change the shuffle state
+                shuffle: bool = result["shuffle_state"]
+                client.run_action(client._api.shuffle, not shuffle) # Throws an error if it can't change the shuffle state
+                client._state.update(shuffle_state=not shuffle)
                 
-                payload = CLIENT.get_playback_states(shuffle=str(not shuffle))
+                payload = client.format_playback_states(result, shuffle=str(not shuffle))
             except:
                 payload = "[ERROR] Error changing shuffle state"
         
         case "repeat":
             try:
                 states: list[str] = ["track", "context", "off"]
-                repeat: str       = API.current_playback()["repeat_state"]
+                repeat: str       = result["repeat_state"]
                 change: str       = states[(states.index(repeat) + 1) if (repeat != "off") else 0]
-                CLIENT.run_action(API.repeat, change) # Throws an error if it can't change the repeat state
+                client.run_action(client._api.repeat, change) # Throws an error if it can't change the repeat state
+                client._state.update(repeat_state=change)
 
-                payload = CLIENT.get_playback_states(repeat=change.capitalize())
+                payload = client.format_playback_states(result, repeat=change.capitalize())
             except:
                 payload = "[ERROR] Error changing repeat state"
     
     return payload
 
 # Lists results stuff, such as playlists, currently playing queue, or search results
-def list_stuff(received: str, data: str) -> str:
-    global DISPLAY
+def list_stuff(session: Session, received: str, data: str, cancelled: threading.Event = None) -> str:
+    client: APIClient = session.account.client
     payload: str = ""
     
     match (received):
         case "list_playlists":
-            DISPLAY = "playlists"
-            payload = CLIENT.get_playlists()
+            try:
+                payload = client.playlists_view()
+                session.show("playlists", payload)
+            except:
+                payload = "[ERROR] Error loading playlists"
 
         case "search":
             try:
-                DISPLAY = "search"
                 search_data: list[str] = data.split(" ") # Format: "<type> <search query>"
                 
                 if (len(search_data) > 1):
-                    search_results = API.search(" ".join(search_data[1:]), type=search_data[0], market="US") # Valid arguments for type: "track", "album", "track,album"
-                    
-                    search_split = search_data[0].split(",")
-                    if (len(search_split) > 1): # If the search is for more than one type
-                        payload = ""
-                        for type in search_split:
-                            res = search_results[f"{type}s"]
-                            payload += CLIENT.get_results(res, ws_call="search") if type != "artist" else CLIENT.get_artists(res)
-                    elif (search_data[0] == "artist"):
-                        payload = CLIENT.get_artists(search_results["artists"])
-                    else:
-                        payload = CLIENT.get_results(search_results[f"{search_data[0]}s"], ws_call="search")
+                    payload = client.search_view(search_data[0], " ".join(search_data[1:])) # Valid arguments for type: "track", "album", "track,album"
+                    session.show("search", payload, cancelled=cancelled)
             except:
                 payload = "[ERROR] Error searching"
+        
+        case "search_library": # Searches the local index of the user's Liked Songs and playlists, without calling Spotify
+            try:
+                payload = session.account.library.search(data or "")
+                session.show("search", payload, cancelled=cancelled)
+            except:
+                payload = "[ERROR] Error searching library"
             
         case "list_queue":
             try:
-                _ = API.queue()["queue"][0] # Throws an error if there's no queue available
+                payload = client.queue_view() # Throws an error if there's no queue available
                 
-                DISPLAY = "queue"
-                payload = CLIENT.get_results(API.queue(), ws_call="queue", keyword="queue")
+                # What's playing is only taken from the playback model if it's up to date, otherwise it's looked up when something is played
+                playback: dict | None = client._state.as_result() if (client._state.fresh()) else None
+                session.show("queue", payload, context=((playback or {}).get("context") or {}).get("uri"))
             except:
                 payload = "[ERROR] No queue found"
     
     return payload
 
 # Displays tracks in an album or playlist
-def display_info(received: str, data: str) -> str:
-    global DISPLAY
+def display_info(session: Session, received: str, data: str, cancelled: threading.Event = None) -> str:
+    client: APIClient = session.account.client
     payload: str = ""
     
     match (received):
         case "display_album":
             # Data format: <album uri>
             try:
-                DISPLAY = "album"
-                _ = API.album_tracks(data)["items"][0] # Throws an error if there are no tracks in the album
-            
-                payload = CLIENT.display_album(API.album(data))
+                payload = client.album_view(data)
+                session.show("album", payload, context=data, cancelled=cancelled)
             except:
                 payload = "[ERROR] Error loading album tracks"
 
         case "display_playlist":
-            # Data format: <playlist uri> <offset>
-            DISPLAY = "playlist"
+            # Data format: <playlist uri> [offset], the offset of the last page the connection saw is used if there's none
             spl = data.split(" ")
             try:
-                if ("collection" in spl[0]):
-                    _ = API.current_user_saved_tracks()["items"][0] # Throws an error if there are no tracks in their Liked Songs
-                    
-                    payload = CLIENT.display_playlist(API.current_user_saved_tracks(), offset=int(spl[1]), uri=spl[0])
-                else:
-                    _ = API.playlist(playlist_id=spl[0])["tracks"]["items"] # Throws an error if there are no tracks in the playlist
+                offset: int = session.cursor(spl[0], int(spl[1]) if (len(spl) > 1) else None, cancelled=cancelled)
+                payload     = client.playlist_view(spl[0], offset)
+                session.show("playlist", payload, context=spl[0], cancelled=cancelled)
                 
-                    payload = CLIENT.display_playlist(API.playlist(playlist_id=spl[0]), offset=int(spl[1]))
+                session.account.prefetcher.after_playlist(spl[0], offset, total=int(payload.split("\t")[3])) if session.account.prefetcher else None
             except:
                 payload = "[ERROR] Error loading playlist tracks"
         
         case "display_artist":
             # Data format: <artist uri>
-            DISPLAY = "artist"
             try:
-                _ = API.artist_top_tracks(data)["tracks"][0] # Throws an error if the artist has no tracks
-                
-                payload = CLIENT.display_artist(API.artist(data), API.artist_top_tracks(data), API.artist_albums(data))
+                payload = client.artist_view(data)
+                session.show("artist", payload, context=data, cancelled=cancelled)
             except:
                 payload = "[ERROR] Error loading artist"
     
     return payload
 
-async def socket(websocket: ws.WebSocketClientProtocol):
-    global DISPLAY
+# Streams every page of a playlist (or of the saved playlists) as its own frame, as soon as that page arrives
+async def stream_info(send: callable, session: Session, received: str, data: str) -> int:
+    client: APIClient = session.account.client
+    frames = None
+    sent: int = 0 # How many bytes were streamed
+    
+    match (received):
+        case "stream_playlist":
+            # Data format: <playlist uri>
+            frames = client.stream_playlist(data)
+        
+        case "stream_playlists":
+            frames = client.stream_playlists()
+    
+    # Every step of the stream counts towards the same scope, so its Spotify calls are recorded like the ones of any other command
+    scope: RequestScope = RequestScope()
+    def step() -> str | None:
+        with client.request_scope(scope=scope), Scheduler.lane(Scheduler.BROWSE):
+            return next(frames, None)
+    
+    try:
+        # The generator blocks while waiting for the next page, so it's advanced on the worker pool
+        while ((frame := await run_blocking(step)) is not None):
+            await send(frame)
+            sent += len(frame.encode())
+    except:
+        await send(f"[ERROR] Error streaming {'playlists' if received == 'stream_playlists' else 'playlist tracks'}")
+        sent = -1
+    finally:
+        frames.close()
+        METRICS.calls(received, scope.calls, scope.response_bytes)
+    
+    return sent
+
+# Shows or clears the response cache
+def manage_cache(session: Session, received: str, data: str) -> str:
+    client: APIClient = session.account.client
+    payload: str = ""
+    
+    match (received):
+        case "cache_stats":
+            stats: dict = client._cache.stats()
+            payload = f"[CACHE]\t{stats['hits']}\t{stats['misses']}\t{stats['size']}\t{client.coalesced}"
+        
+        case "clear_cache":
+            # Data format: [endpoint], everything is cleared if there's no endpoint
+            payload = f"[CACHE CLEARED]\t{client.invalidate(data)}"
+    
+    return payload
+
+CONTROL_COMMANDS: list[str] = ["next", "previous", "play", "pause", "resume", "shuffle", "repeat"] # Go ahead of browsing in the scheduler
+
+# The browsing commands of which only the newest one is worth answering, like the searches made while typing or quickly flipped pages
+SUPERSEDABLE: list[str] = ["search", "search_library", "display_album", "display_playlist", "display_artist"]
+SUPERSEDED: int         = 0 # How many commands were dropped since the client sent a newer one of the same kind
+PIPELINE: int           = 8 # How many commands of an envelope (or of several of them) one connection can run at the same time
+
+# Sends the received command to the function that handles it, its Spotify calls stop once `cancelled` is set
+def handle_command(session: Session, received: str, data: str, cancelled: threading.Event = None) -> str:
+    client: APIClient = session.account.client
+    lane: int = Scheduler.CONTROL if (received in CONTROL_COMMANDS) else Scheduler.BROWSE
+    
+    with client.request_scope(cancelled) as scope, Scheduler.lane(lane): # Every read in here is only made once, and every Spotify call is counted
+        payload: str = dispatch_command(session, received, data, cancelled)
+    
+    METRICS.calls(received, scope.calls, scope.response_bytes)
+    LOG.log(f"'{received}' made {scope.calls} Spotify call(s), {scope.response_bytes} bytes") if DEBUG else None
+    
+    # The handlers only know that something went wrong, the scope knows if it was the rate limit
+    if (payload.startswith("[ERROR]")):
+        if (isinstance(scope.error, RateLimited)):
+            payload = f"[ERROR] Rate limited by Spotify, try again in {scope.error.retry_after:.0f} seconds"
+        elif (isinstance(scope.error, RequestExpired)):
+            payload = "[ERROR] Spotify is busy, try again in a moment"
+    
+    return payload
+
+# Handles a command that a newer one of the same kind replaces, it returns `None` if the client sent one before this one was answered
+async def handle_latest(session: Session, inbox: Inbox, received: str, data: str) -> str | None:
+    global SUPERSEDED
+    
+    if (received == "search") and (DEBOUNCE): # Gives the user a moment to keep typing before searching
+        deadline: float = time.monotonic() + DEBOUNCE / 1000
+        while (not inbox.waiting(received)) and (time.monotonic() < deadline):
+            await inbox.wait(deadline - time.monotonic())
+    
+    cancelled: threading.Event = threading.Event()
+    task: aio.Future           = None if (inbox.waiting(received)) else aio.ensure_future(run_blocking(handle_command, session, received, data, cancelled))
+    
+    while (task is not None) and (not task.done()) and (not inbox.waiting(received)):
+        arrived: aio.Task = aio.create_task(inbox.wait())
+        await aio.wait([task, arrived], return_when=aio.FIRST_COMPLETED)
+        arrived.cancel()
+    
+    if (task is not None) and (task.done()) and (not inbox.waiting(received)):
+        return task.result()
+    
+    # The rest of its Spotify calls aren't made, the thread stops at the next one (or finishes if it was already past the last one)
+    cancelled.set()
+    task.add_done_callback(lambda x: x.exception()) if (task is not None) else None
+    SUPERSEDED += 1
+    LOG.log(f"'{received}' dropped, a newer one came in") if DEBUG else None
+    
+    return None
+
+# The commands that can be replaced by newer ones are given their `cancelled` event, so they only change the session while they're current
+def dispatch_command(session: Session, received: str, data: str, cancelled: threading.Event = None) -> str:
+    client: APIClient = session.account.client
+    payload: str      = ""
+    
+    if (received in ["current_info", "current_track", "current_song", "current_states"]):
+        payload = display_current_info(session, received)
+        
+    elif (received in ["next", "previous", "play"]):
+        payload = modify_current_track(session, received, data)
+        client.invalidate("queue") # The queue moves along with the current track
+
+    elif (received in ["pause", "resume", "shuffle", "repeat"]):
+        payload = modify_playback_states(session, received)
+        
+    elif (received in ["list_playlists", "search", "search_library", "list_queue"]):
+        payload = list_stuff(session, received, data, cancelled)
+    
+    elif (received in ["display_album", "display_playlist", "display_artist"]):
+        payload = display_info(session, received, data, cancelled)
+    
+    elif (received in ["cache_stats", "clear_cache"]):
+        payload = manage_cache(session, received, data)
+    
+    elif (received == "stats"):
+        payload = METRICS.stats()
     
+    else:
+        payload = "[ERROR] Unknown command"
+    
+    return payload
+
+async def socket(websocket: ws.WebSocketClientProtocol):
     # Initializing the websocket
     ID = str(websocket.id)
-    print(f"{current_time()} Client {ID[:8]} connected!")
+    session: Session = Session(ID, ACCOUNTS["default"]) # Connections use the default account until they pick another one
     
-    await websocket.send(CLIENT.get_playback_states())
+    # Every frame goes through the connection's own queue, a client that falls behind stops getting the playback pushes
+    def downgrade():
+        session.account.poller.unsubscribe(outbox)
+        LOG.log(f"[{ID[:8]}] Fell behind, playback pushes stopped")
     
-    try:
-        async for message in websocket:
-            # Message format: "command" "extra data"
-            parsed: list[str] = message.removesuffix(" ").split(" ")
-            received: str     = ""
-            data: str | None  = None
-            
-            if (len(parsed) < 2):
-                received = message
-                print(f"[{ID[:8]}] {current_time()} Command received: {received}")
-            else:
-                received = parsed[0]
-                data     = " ".join(parsed[1:])
-                print(f"[{ID[:8]}] {current_time()} Command received: {received} | {data}")
+    outbox: Outbox = Outbox(websocket, max_frames=SEND_QUEUE, max_lag=SEND_LAG, on_lag=downgrade, debug=DEBUG, log=LOG.log)
+    session.outbox = outbox
+    
+    # The messages are read as they arrive (once the first state is sent), so a command that's being handled can tell if the client already sent a newer one
+    inbox: Inbox | None     = None
+    envelopes: set          = set() # The envelopes whose commands are still running
+    pipeline: aio.Semaphore = aio.Semaphore(PIPELINE)
+    
+    # Handles one command, every frame of its reply starts with the given tag (the request ID of an envelope, or nothing)
+    async def answer(message: str, tag: str = ""):
+        nonlocal session
+        
+        async def send(frame: str):
+            await outbox.send(tag + frame)
+        
+        # Message format: "command" "extra data"
+        parsed: list[str] = message.removesuffix(" ").split(" ")
+        received: str     = ""
+        data: str | None  = None
+        
+        if (len(parsed) < 2):
+            received = message
+            LOG.log(f"[{ID[:8]}] Command received: {tag}{received}")
+        else:
+            received = parsed[0]
+            data     = " ".join(parsed[1:])
+            LOG.log(f"[{ID[:8]}] Command received: {tag}{received} | {data}")
 
-            payload: str = ""
+        payload: str   = ""
+        started: float = time.perf_counter()
+        
+        if (received == "subscribe"): # Pushes the current track and playback states whenever they change, instead of the client polling them
+            await send("[SUBSCRIBED]")
+            await session.account.poller.subscribe(outbox) if (not outbox.downgraded) else None
+            METRICS.command(received, time.perf_counter() - started)
+            return None
+        
+        elif (received == "account"): # Picks the Spotify account the connection uses, format: "account <key>"
+            account: Account | None = get_account(data or "")
             
-            if (received in ["current_info", "current_song", "current_states"]):
-                payload = display_current_info(received)
-                
-            elif (received in ["next", "previous", "play"]):
-                payload = modify_current_track(received, data)
-
-            elif (received in ["pause", "resume", "shuffle", "repeat"]):
-                payload = modify_playback_states(received)
+            if (account is None):
+                payload = "[ERROR] Unknown account"
+            else:
+                # Whatever the connection had open belongs to the other account, so it starts over
+                session.account.detach(ID, outbox)
+                deltas: bool = session.deltas
+                session = SESSIONS[ID] = Session(ID, account)
+                session.deltas = deltas
+                session.outbox = outbox
+                account.attach(ID)
                 
-            elif (received in ["list_playlists", "search", "list_queue"]):
-                payload = list_stuff(received, data)
+                await send(f"[ACCOUNT]\t{account.key}")
+                payload = await run_blocking(account.client.get_playback_states)
+        
+        elif (received in ["stream_playlist", "stream_playlists"]):
+            session.show("playlist", context=data) if (received == "stream_playlist") else session.show("playlists")
+            sent: int = await stream_info(send, session, received, data)
+            METRICS.command(received, time.perf_counter() - started, max(0, sent), error=sent < 0)
+            return None
+        
+        elif (received == "delta"): # Turns the row level deltas of the listings on or off, format: "delta on" / "delta off"
+            session.deltas = (data == "on")
+            session.sent.clear()
+            outbox.collapse = not session.deltas # A delta that's waiting might be based on the frame a newer one would replace
+            payload = f"[DELTA {'ON' if session.deltas else 'OFF'}]"
+        
+        elif (received == "unsubscribe"):
+            session.account.poller.unsubscribe(outbox)
+            payload = "[UNSUBSCRIBED]"
+        
+        elif (SUPERSEDE) and (not tag) and (received in SUPERSEDABLE): # A client that tags its commands tells the replies apart itself
+            payload = await handle_latest(session, inbox, received, data)
             
-            elif (received in ["display_album", "display_playlist", "display_artist"]):
-                payload = display_info(received, data)
+            if (payload is None): # Nobody is waiting for it anymore, the newer one gets answered instead
+                return None
+            payload = session.frame(received, payload)
+        
+        else:
+            # The commands of different connections (and of one envelope) run side by side on the worker pool
+            payload = session.frame(received, await run_blocking(handle_command, session, received, data, control=received in CONTROL_COMMANDS))
             
+            if (received in CONTROL_COMMANDS):
+                session.account.poller.poke()
+    
+        LOG.log(f"[{ID[:8]}] Response sent: {tag}{payload[:200]}") if DEBUG and payload != "" else None # The start is enough to tell what it was
+        await send(payload)
+        METRICS.command(received, time.perf_counter() - started, len(payload.encode()), error=payload.startswith("[ERROR]"))
+    
+    # Runs the commands of an envelope at the same time, at most `PIPELINE` of the connection's tagged commands run at once
+    async def answer_tagged(line: str):
+        (tag, _, message) = line.partition(" ")
+        
+        async with pipeline:
+            await answer(message, tag=tag + "\t")
+    
+    async def answer_envelope(message: str):
+        await aio.gather(*[answer_tagged(x) for x in message.split("\n") if (x.strip())], return_exceptions=True) # A failed command doesn't stop the others
+    
+    try:
+        # Registered inside of the try, so a connection that drops while its first state is read is still cleaned up
+        session = SESSIONS.setdefault(ID, session)
+        session.account.attach(ID)
+        LOG.log(f"Client {ID[:8]} connected!")
+        
+        await outbox.send(await run_blocking(session.account.client.get_playback_states))
+        inbox = Inbox(websocket)
+        
+        while ((message := await inbox.get()) is not None):
+            if (message.startswith("#")): # An envelope, format: "#<id> command [extra data]" on every line, its replies start with "#<id>\t"
+                envelope: aio.Task = aio.create_task(answer_envelope(message))
+                envelopes.add(envelope)
+                envelope.add_done_callback(envelopes.discard)
             else:
-                payload = "[ERROR] Unknown command"
+                # A plain command is answered before the next message is handled, so the replies of plain commands stay in order
+                await answer(message)
         
-            print(f"[{ID[:8]}] {current_time()} Response sent: {payload}") if DEBUG and payload != "" else None
-            await websocket.send(payload)
-            
+        LOG.log("Connection error with client.") if (inbox.error is not None) else None
     except:
-        print(current_time(), "Connection error with client.")
+        LOG.log("Connection error with client.")
+    finally:
+        inbox.close() if (inbox is not None) else None
+        for envelope in list(envelopes):
+            envelope.cancel()
+        session.account.detach(ID, outbox)
+        SESSIONS.pop(ID, None)
+        await outbox.close()
         
 #--------------------------------------------------------------
 
-API: sp.Spotify = None
-CLIENT: APIClient = None
+ACCOUNTS: dict[str, Account] = {} # Every hosted account that was used since startup, by key
+CREDENTIALS: list[str]       = [] # The client ID, client secret, and redirect URI of the Spotify application
+STORE: MetadataStore         = None
 PORT: int = 0000
 
+SCOPE: str = """user-library-modify,user-library-read,user-read-currently-playing,user-read-playback-position,
+            user-read-playback-state,user-modify-playback-state,app-remote-control,streaming,playlist-read-private,
+            playlist-modify-private,playlist-modify-public,playlist-read-collaborative"""
+
 # Reads data from the IDs.txt file and parses them to be used in the API
 def connect_to_spotify():
-    global API, CLIENT, PORT
+    global CREDENTIALS, STORE, PORT
     
-    results: list[str | int] = ["", "", "", 0]
+    results: list[str | int] = ["", "", "", args.port or 8765]
     indices: list[int]       = [1, 2, 5, 9]
     
-    with open("IDs.txt") as file:
-        lines: list[str] = file.readlines()
-    
-    for i in range(0, 4):
-        results[i] = lines[indices[i]].split(" ")[2].removesuffix("\n").replace("<", "").replace(">", "")
-        i += 1
-    PORT = int(results[3])
+    if (not FAKE): # The made up backend doesn't need the Spotify application
+        with open("IDs.txt") as file:
+            lines: list[str] = file.readlines()
+        
+        for i in range(0, 4):
+            results[i] = lines[indices[i]].split(" ")[2].removesuffix("\n").replace("<", "").replace(">", "")
+            i += 1
+    PORT = args.port or int(results[3])
     
-    if (str(results[3]) in results[2]):
+    if (str(PORT) in results[2]):
         raise Exception(f"Invalid port! ({PORT = }). Use a different port than the one used by the callback URI.")
     
-    print(results) if DEBUG else None
+    LOG.log(results) if DEBUG else None
     
-    _ = """user-library-modify,user-library-read,user-read-currently-playing,user-read-playback-position,
-            user-read-playback-state,user-modify-playback-state,app-remote-control,streaming,playlist-read-private,
-            playlist-modify-private,playlist-modify-public,playlist-read-collaborative"""
-    CLIENT = APIClient(results[0], results[1], results[2], _)
-    API = CLIENT._api
-    CLIENT._debug = DEBUG
+    CREDENTIALS = results[:3]
+    STORE       = MetadataStore(STORE_PATH, max_entries=STORE_SIZE) if STORE_PATH else None
+    LOG.log(f"Loaded the metadata store ({len(STORE)} entries)") if STORE else None
+    
+    ACCOUNTS["default"] = create_account("default")
+    if (ACCOUNTS["default"].client.find_device() is None): # The devices are looked up again before every action, so one can still show up later
+        LOG.log("No active devices found")
+    
+    # The extra accounts are logged into now (which might need the console), and their clients are created right away so their tokens
+    # get refreshed in the background before the first connection picks them
+    for key in ACCOUNT_KEYS if (not FAKE) else []:
+        if (not re.fullmatch(r"\w+", key)):
+            raise Exception(f"Invalid account key! ({key = }). Use only letters, digits, and underscores.")
+        
+        sp.SpotifyOAuth(client_id=CREDENTIALS[0], client_secret=CREDENTIALS[1], redirect_uri=CREDENTIALS[2], scope=SCOPE,
+                        cache_path=f".cache-{key}").get_access_token(as_dict=False)
+        ACCOUNTS[key] = create_account(key)
+        LOG.log(f"Logged into account '{key}'")
+
+# Creates the client (with its own token cache, device, and rate limit budget) of the given account, the catalog store is shared by all of them
+def create_account(key: str) -> Account:
+    api: FakeSpotify | None = FakeSpotify(latency=args.fake_latency / 1000, rate_limit=args.fake_429) if FAKE else None
+    
+    client: APIClient = APIClient(*CREDENTIALS, SCOPE, rate=RATE, burst=BURST, store=STORE, cache_path=None if (key == "default") else f".cache-{key}",
+                                  api=api, metrics=METRICS, image_size=args.image_size, workers=WORKERS + args.control_workers, timeout=args.spotify_timeout,
+                                  devices=args.devices, device_ttl=args.device_ttl, log=LOG.log)
+    client._debug            = DEBUG
+    client._scheduler._debug = DEBUG
     
-    CLIENT.find_device()
+    return Account(key, client, EXECUTOR, busy=lambda: IN_FLIGHT > 0, prefetch=PREFETCH, sync_interval=LIBRARY_SYNC)
+
+# Returns the account with the given key, creating it on first use if it was logged into
+def get_account(key: str) -> Account | None:
+    if (key not in ACCOUNTS):
+        if (not re.fullmatch(r"\w+", key)) or ((not FAKE) and (not os.path.exists(f".cache-{key}"))):
+            return None
+        
+        ACCOUNTS[key] = create_account(key)
+        LOG.log(f"Connected account '{key}'")
+    
+    return ACCOUNTS[key]
+
+# Refreshes the token of every account before it expires, so the command that would've found it expired doesn't wait for the refresh
+async def refresh_tokens():
+    while (True):
+        wait: float = 60.0 # Accounts that are created in the meantime get checked within a minute
+        
+        for account in list(ACCOUNTS.values()):
+            try:
+                left: float | None = await aio.to_thread(account.client.refresh_token)
+                wait = min(wait, left) if (left is not None) else wait
+            except Exception as e:
+                LOG.log(f"[{account.key}] Error refreshing the token: {e}")
+        
+        await aio.sleep(wait)
+
+# Answers the Prometheus scrapes of the metrics endpoint
+async def serve_metrics(reader: aio.StreamReader, writer: aio.StreamWriter):
+    try:
+        request: list[str] = (await reader.readline()).decode().split(" ")
+        while ((await reader.readline()) not in (b"\r\n", b"\n", b"")): # Skips the headers
+            pass
+        
+        if (len(request) > 1) and (request[1].split("?")[0] == "/metrics"):
+            body: bytes = METRICS.prometheus().encode()
+            writer.write(b"HTTP/1.1 200 OK\r\nContent-Type: text/plain; version=0.0.4\r\n")
+        else:
+            body: bytes = b"Not found\n"
+            writer.write(b"HTTP/1.1 404 Not Found\r\nContent-Type: text/plain\r\n")
+        
+        writer.write(f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode() + body)
+        await writer.drain()
+    finally:
+        writer.close()
+
+# The values that are read whenever the metrics are shown
+def add_gauges():
+    METRICS.gauge("in_flight", lambda: IN_FLIGHT, "How many commands are waiting for or running on the worker pool")
+    METRICS.gauge("scheduler_queue_depth", lambda: sum([x.client._scheduler.depth() for x in ACCOUNTS.values()]), "How many Spotify calls are waiting for their turn")
+    METRICS.gauge("cache_hits", lambda: sum([x.client._cache.hits for x in ACCOUNTS.values()]), "How many views were answered from the response cache")
+    METRICS.gauge("cache_misses", lambda: sum([x.client._cache.misses for x in ACCOUNTS.values()]), "How many views had to be built")
+    METRICS.gauge("coalesced_reads", lambda: sum([x.client.coalesced for x in ACCOUNTS.values()]), "How many reads shared an identical read in flight")
+    METRICS.gauge("rate_limited", lambda: sum([x.client._scheduler.rate_limited for x in ACCOUNTS.values()]), "How many 429s Spotify answered with")
+    METRICS.gauge("sessions", lambda: len(SESSIONS), "How many websockets are connected")
+    METRICS.gauge("send_queue_depth", lambda: sum([len(x.outbox) for x in SESSIONS.values() if (x.outbox)]), "How many frames are waiting to be sent to the clients")
+    METRICS.gauge("send_queue_lag", lambda: max([x.outbox.lag() for x in SESSIONS.values() if (x.outbox)], default=0), "How many seconds the client that's furthest behind is behind")
+    METRICS.gauge("superseded_commands", lambda: SUPERSEDED, "How many commands were dropped since the client sent a newer one of the same kind")
+    METRICS.gauge("collapsed_frames", lambda: sum([x.outbox.collapsed for x in SESSIONS.values() if (x.outbox)]), "How many waiting frames of the connected clients were replaced by newer ones")
+    METRICS.gauge("device_failovers", lambda: sum([x.client._devices.failovers for x in ACCOUNTS.values()]), "How many actions moved on to the next device since theirs was gone")
+    METRICS.gauge("token_refreshes", lambda: sum([x.client.token_refreshes for x in ACCOUNTS.values()]), "How many tokens were refreshed ahead of time")
+    METRICS.gauge("accounts", lambda: len(ACCOUNTS), "How many accounts are hosted (the made up backend adds them as they're picked)")
 
 async def main():
     connect_to_spotify()
-    print(current_time(), "Booted up. Awaiting interaction...")
+    add_gauges()
+    
+    # The event loop only keeps weak references to its tasks, so the ones that run for as long as the server are kept here
+    TASKS.add(aio.create_task(LOG.run()))
+    TASKS.add(aio.create_task(refresh_tokens()))
+    
+    if (METRICS_PORT):
+        await aio.start_server(serve_metrics, 'localhost', METRICS_PORT)
+        LOG.log(f"Serving metrics on http://localhost:{METRICS_PORT}/metrics")
+    LOG.log("Booted up. Awaiting interaction...")
     
-    async with ws.serve(socket, 'localhost', PORT):
+    async with ws.serve(socket, 'localhost', PORT, compression="deflate" if (COMPRESSION) else None):
         await aio.Future()
 
 if __name__ == '__main__':
@@ -0,0 +1,123 @@
+import threading
+import time
+
+from collections import OrderedDict
+
+class ResponseCache(object):
+    '''
+    A class for an in-memory, size-bounded LRU cache where every endpoint has its own time to live.
+    It's used by the APIClient to keep the already formatted payloads of views that were recently opened.
+    '''
+    _entries: OrderedDict = None
+    _ttls: dict           = None
+    _max_size: int        = 256
+    _lock: threading.Lock = None
+
+    hits: int   = 0
+    misses: int = 0
+
+    MISSING = object() # Returned by `get` when there's no (fresh) entry, since `None` can be a valid cached value
+
+    def __init__(self, ttls: dict, max_size: int = 256):
+        '''
+        A constructor for the ResponseCache class.
+
+        :param ttls:
+            How many seconds the entries of each endpoint stay fresh, for example `{"album": 86400, "queue": 5}`
+        :param max_size:
+            The maximum amount of entries kept, the least recently used ones get evicted first
+        '''
+        self._entries  = OrderedDict()
+        self._ttls     = ttls
+        self._max_size = max_size
+        self._lock     = threading.Lock()
+
+    def get(self, endpoint: str, key):
+        '''
+        A function that returns the cached value of the given endpoint and key, or `ResponseCache.MISSING` if there's no fresh one.
+
+        :param endpoint:
+            The endpoint the value was cached for
+        :param key:
+            The key of the value, usually the URI and arguments of the request
+        '''
+
+        with self._lock:
+            entry: tuple | None = self._entries.get((endpoint, key))
+
+            if (entry is None) or (entry[0] < time.monotonic()):
+                if (entry is not None):
+                    del self._entries[(endpoint, key)]
+                self.misses += 1
+                return self.MISSING
+
+            self._entries.move_to_end((endpoint, key))
+            self.hits += 1
+            return entry[1]
+
+    def contains(self, endpoint: str, key) -> bool:
+        '''
+        A function that checks if there's a fresh entry for the given endpoint and key, without counting it as a hit or miss.
+
+        :param endpoint:
+            The endpoint the value was cached for
+        :param key:
+            The key of the value
+        '''
+
+        with self._lock:
+            entry: tuple | None = self._entries.get((endpoint, key))
+
+            return (entry is not None) and (entry[0] >= time.monotonic())
+
+    def set(self, endpoint: str, key, value):
+        '''
+        A function that caches the given value for the given endpoint and key, evicting the least recently used entries if the cache is full.
+
+        :param endpoint:
+            The endpoint to cache the value for
+        :param key:
+            The key of the value
+        :param value:
+            The value to cache
+        '''
+
+        with self._lock:
+            self._entries[(endpoint, key)] = (time.monotonic() + self._ttls.get(endpoint, 60), value)
+            self._entries.move_to_end((endpoint, key))
+
+            while (len(self._entries) > self._max_size):
+                self._entries.popitem(last=False)
+
+    def invalidate(self, endpoint: str = None, key = None) -> int:
+        '''
+        A function that removes cached entries.
+
+        :param endpoint:
+            The endpoint to remove the entries of, every entry is removed if it's `None`
+        :param key:
+            The key to remove, every entry of the endpoint is removed if it's `None`
+
+        :return count:
+            The amount of removed entries
+        '''
+
+        with self._lock:
+            if (endpoint is None):
+                count: int = len(self._entries)
+                self._entries.clear()
+                return count
+
+            keys: list = [x for x in self._entries if x[0] == endpoint and (key is None or x[1] == key)]
+            for x in keys:
+                del self._entries[x]
+
+            return len(keys)
+
+    def stats(self) -> dict:
+        '''
+        A function that returns the hit and miss counters of the cache, as well as its current size.
+        '''
+
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "size": len(self._entries)}
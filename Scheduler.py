@@ -0,0 +1,220 @@
+import heapq
+import itertools
+import threading
+import time
+
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from spotipy.exceptions import SpotifyException
+
+from Logger import console
+
+class RequestExpired(Exception):
+    '''
+    Raised when a request waited in the scheduler's queue for longer than its deadline, so it's dropped instead of being answered late.
+    '''
+
+class RateLimited(Exception):
+    '''
+    Raised when Spotify answered with a 429 and the request couldn't be retried before its deadline.
+    '''
+    retry_after: float = 0
+
+    def __init__(self, retry_after: float):
+        super().__init__(f"Rate limited by Spotify for {retry_after:.0f} seconds")
+        self.retry_after = retry_after
+
+_lane: ContextVar = ContextVar("scheduler_lane", default=None) # The lane of the command that's currently being handled
+
+class Scheduler(object):
+    '''
+    A class that every Spotify call of an account goes through. It spends a token bucket, waits out the `Retry-After` of a 429 for
+    everyone at once, and lets the waiting calls through by lane: playback controls first, then browsing, then prefetching.
+    '''
+    CONTROL: int  = 0 # Playback controls (next, pause, play, shuffle, etc.)
+    BROWSE: int   = 1 # Everything users open and list, and the playback state poller
+    PREFETCH: int = 2 # Background prefetches
+
+    # How many seconds a call of each lane may wait in the queue before it's dropped
+    DEADLINES: dict = {
+        CONTROL:  5.0,
+        BROWSE:   10.0,
+        PREFETCH: 2.0,
+    }
+
+    _rate: float                    = 10.0
+    _burst: float                   = 20.0
+    _tokens: float                  = 20.0
+    _refilled: float                = 0
+    _blocked_until: float           = 0
+    _waiting: list                  = None
+    _counter: itertools.count       = None
+    _condition: threading.Condition = None
+    _debug: bool                    = False
+    _log: callable                  = None
+
+    rate_limited: int = 0 # How many 429s Spotify answered with
+    expired: int      = 0 # How many calls were dropped because they waited past their deadline
+
+    def __init__(self, rate: float = 10.0, burst: int = 20, debug: bool = False, log: callable = None):
+        '''
+        A constructor for the Scheduler class.
+
+        :param rate:
+            How many calls per second are let through on average
+        :param burst:
+            How many calls can be let through at once after being idle
+        :param debug:
+            If it should print debug messages
+        :param log:
+            The function that writes the debug messages (like `Logger.log`), they're printed if it's `None`
+        '''
+        self._rate      = rate
+        self._burst     = float(burst)
+        self._tokens    = float(burst)
+        self._refilled  = time.monotonic()
+        self._waiting   = []
+        self._counter   = itertools.count()
+        self._condition = threading.Condition()
+        self._debug     = debug
+        self._log       = log or console
+
+    @staticmethod
+    @contextmanager
+    def lane(lane: int):
+        '''
+        A context manager that makes every Spotify call inside of it go through the given lane.
+
+        :param lane:
+            `Scheduler.CONTROL`, `Scheduler.BROWSE`, or `Scheduler.PREFETCH`
+        '''
+
+        token = _lane.set(lane)
+        try:
+            yield lane
+        finally:
+            _lane.reset(token)
+
+    @staticmethod
+    def current() -> int:
+        '''
+        A function that returns the lane the Spotify calls made right now go through (browsing if none was given).
+        '''
+
+        return _lane.get() if (_lane.get() is not None) else Scheduler.BROWSE
+
+    def idle(self) -> bool:
+        '''
+        A function that checks if nobody is waiting and there's budget to spare, used to decide whether background work should run.
+        '''
+
+        with self._condition:
+            self._refill()
+            return (not self._waiting) and (self._tokens >= self._burst / 2) and (time.monotonic() >= self._blocked_until)
+
+    def depth(self) -> int:
+        '''
+        A function that returns how many calls are waiting in the queue.
+        '''
+
+        with self._condition:
+            return len(self._waiting)
+
+    def run(self, func: callable, *args, **kwargs):
+        '''
+        A function that waits for the call's turn, makes the call, and retries it once if Spotify rate limited it.
+
+        :param func:
+            The `spotipy.Spotify` function to call
+        :param args:
+            The arguments to pass to the function
+        :param kwargs:
+            The keyword arguments to pass to the function
+        '''
+
+        lane: int       = self.current()
+        deadline: float = time.monotonic() + self.DEADLINES[lane]
+
+        for attempt in range(2):
+            self.acquire(lane, deadline)
+
+            try:
+                return func(*args, **kwargs)
+            except SpotifyException as e:
+                if (e.http_status != 429):
+                    raise
+
+                retry_after: float = self.back_off(e.headers)
+                if (attempt == 1) or (time.monotonic() + retry_after > deadline):
+                    raise RateLimited(retry_after) from e
+
+    def acquire(self, lane: int, deadline: float):
+        '''
+        A function that blocks until the call can be made. Calls are let through by lane first, then in the order they came in.
+
+        :param lane:
+            The lane of the call
+        :param deadline:
+            The `time.monotonic()` after which the call is dropped by raising `RequestExpired`
+        '''
+
+        ticket: tuple = (lane, next(self._counter))
+
+        with self._condition:
+            heapq.heappush(self._waiting, ticket)
+
+            try:
+                while (True):
+                    now: float = time.monotonic()
+                    self._refill()
+
+                    if (self._waiting[0] == ticket) and (self._tokens >= 1) and (now >= self._blocked_until):
+                        self._tokens -= 1
+                        return None
+
+                    if (now >= deadline):
+                        self.expired += 1
+                        self._log(f"[SCHEDULER] Dropped a call of lane {lane} after its deadline") if self._debug else None
+                        raise RequestExpired("The request waited too long for its turn")
+
+                    # The first in line sleeps until it could go, everyone else until someone leaves the line
+                    if (self._waiting[0] == ticket):
+                        ready: float = max(self._blocked_until, now + max(0, 1 - self._tokens) / self._rate)
+                        self._condition.wait(timeout=max(0.001, min(deadline, ready) - now))
+                    else:
+                        self._condition.wait(timeout=deadline - now)
+            finally:
+                self._waiting.remove(ticket)
+                heapq.heapify(self._waiting)
+                self._condition.notify_all()
+
+    def back_off(self, headers: dict | None) -> float:
+        '''
+        A function that stops every call of this account until the `Retry-After` of a 429 has passed.
+
+        :param headers:
+            The headers of the 429 response
+
+        :return retry_after:
+            The amount of seconds to wait
+        '''
+
+        try:
+            retry_after: float = float(headers["Retry-After"])
+        except (TypeError, KeyError, ValueError):
+            retry_after: float = 1.0
+
+        with self._condition:
+            self.rate_limited  += 1
+            self._blocked_until = max(self._blocked_until, time.monotonic() + retry_after)
+            self._condition.notify_all()
+
+        self._log(f"[SCHEDULER] Rate limited by Spotify, waiting {retry_after:.0f} seconds") if self._debug else None
+
+        return retry_after
+
+    def _refill(self):
+        now: float     = time.monotonic()
+        self._tokens   = min(self._burst, self._tokens + (now - self._refilled) * self._rate)
+        self._refilled = now
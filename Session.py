@@ -0,0 +1,121 @@
+import threading
+
+import Delta
+
+from Account import Account
+from Outbox import Outbox
+
+class Session(object):
+    '''
+    A class for the state of one websocket connection: what its Spotify menu shows, the last listing it got, and how far it paged
+    through each playlist. Every connection has its own, so the commands of one user never get routed by what another user opened.
+    '''
+    id: str          = ""
+    account: Account = None  # The Spotify account the connection uses
+    view: str        = ""    # What the connection's Spotify menu shows (`search`, `queue`, `playlist`, `album`, `artist`, or `playlists`)
+    context: str     = None  # The URI of the playlist or album the listing belongs to (for the queue, of what was playing when it was listed)
+    listing: list    = None  # The URIs of the last listing, in the order they were shown
+    cursors: dict    = None  # Playlist URI -> the offset of the last page that was shown
+    deltas: bool     = False # If the client asked for row level deltas of the commands in `DELTA_COMMANDS`
+    sent: dict       = None  # Command -> the lines of the last payload that was sent for it, what the next delta is made against
+    outbox: Outbox   = None  # The queue of the frames sent to the connection
+
+    _lock: threading.Lock = None # Held while what the connection is shown changes, so a replaced command can't change it after the newer one
+
+    DELTA_COMMANDS: tuple = ("current_info", "list_queue", "list_playlists", "display_playlist", "display_album") # The ones that get refreshed
+
+    _uri = Delta.URI
+
+    def __init__(self, id: str, account: Account):
+        '''
+        A constructor for the Session class.
+
+        :param id:
+            The ID of the websocket connection
+        :param account:
+            The Spotify account the connection uses
+        '''
+        self.id      = id
+        self.account = account
+        self.listing = []
+        self.cursors = {}
+        self.sent    = {}
+        self._lock   = threading.Lock()
+
+    def show(self, view: str, payload: str = "", context: str = None, cancelled: threading.Event = None):
+        '''
+        A function that remembers what the connection is shown now.
+
+        :param view:
+            What the connection's Spotify menu shows
+        :param payload:
+            The payload that was sent, its URIs become the listing
+        :param context:
+            The URI of the playlist or album the listing belongs to
+        :param cancelled:
+            The event of a command that can be replaced by a newer one, nothing changes once it's set since its payload isn't sent
+        '''
+
+        listing: list = self._uri.findall(payload)
+
+        with self._lock:
+            if (cancelled is not None) and (cancelled.is_set()):
+                return None
+
+            self.view    = view
+            self.context = context
+            self.listing = listing
+
+    def cursor(self, uri: str, offset: int = None, cancelled: threading.Event = None) -> int:
+        '''
+        A function that returns the offset of the last shown page of the given playlist, or remembers a new one.
+
+        :param uri:
+            The URI of the playlist
+        :param offset:
+            The offset of the page that's shown now, if there is one
+        :param cancelled:
+            The event of a command that can be replaced by a newer one, the offset isn't remembered once it's set
+        '''
+
+        with self._lock:
+            if (offset is not None) and ((cancelled is None) or (not cancelled.is_set())):
+                self.cursors[uri] = offset
+
+            return offset if (offset is not None) else self.cursors.get(uri, 0)
+
+    def following(self, uri: str) -> list[str]:
+        '''
+        A function that returns the given URI and every URI listed after it, or just the given URI if it isn't in the listing.
+
+        :param uri:
+            The URI that was clicked on
+        '''
+
+        if (uri not in self.listing):
+            return [uri]
+
+        return self.listing[self.listing.index(uri):]
+
+    def frame(self, command: str, payload: str) -> str:
+        '''
+        A function that returns what's sent for the payload of a command: a delta against the last payload of the same command if the
+        client asked for them and it's shorter, otherwise the payload itself (which the client keeps as the new base of the command).
+
+        :param command:
+            The command the payload answers
+        :param payload:
+            The whole payload
+        '''
+
+        if (not self.deltas) or (command not in self.DELTA_COMMANDS):
+            return payload
+
+        if (payload.startswith("[ERROR]")): # The client shows the error instead of the last payload, so the next one is sent whole
+            self.sent.pop(command, None)
+            return payload
+
+        delta: str | None = Delta.diff(command, self.sent[command], payload) if (command in self.sent) else None
+        self.sent[command] = payload.split("\n")
+
+        return delta or payload
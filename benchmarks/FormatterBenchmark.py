@@ -0,0 +1,256 @@
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")) # The server's modules are one folder up
+from APIClient import APIClient
+from FakeSpotify import FakeSpotify
+from Formatter import Formatter
+
+import argparse as arg
+parser = arg.ArgumentParser(description="Compares the shared Formatter with the string concatenation the views used before it, output and speed")
+parser.add_argument("-n", "--number", dest="number", type=int, help="How many times every view is formatted", default=2000)
+parser.add_argument("--image-size", dest="image_size", type=int, help="Also measures picking the best fitting picture for this width", default=None)
+
+# The views exactly as they were formatted before the Formatter, to check the output against and to measure
+class LegacyClient(APIClient):
+    def get_track_data(self, track_dict: dict, ws_call: str) -> str:
+        data: str  = ""
+        info: dict = track_dict['item']
+        
+        try:    
+            header: str = f"[{ws_call.capitalize()}]"
+            
+            for idx, artist in enumerate(info['artists']):
+                data += artist['name']
+                data += ", " if (idx + 1 != len(info['artists'])) else ""
+            artists: str = data
+            
+            track_name: str = info['name']
+            album_name: str = info['album']['name']
+            uri: str        = info['uri'] if ws_call != "current" else info["external_urls"]["spotify"]
+            
+            try:
+                album_cover: str = info['album']['images'][0]['url']
+            except IndexError:
+                album_cover: str = "https://developer.spotify.com/images/guidelines/design/icon3@2x.png"
+            
+            payload: str = (header + "\t" + artists + "\t" + track_name + "\t" + album_name + "\t" + album_cover + "\t" + uri)
+        except:
+            payload: str = "[ERROR] Error getting song data"
+        
+        return payload
+    
+    def get_results(self, results: dict, ws_call: str, keyword = "items") -> str:
+        data: str    = ""
+        payload: str = f"[{ws_call.upper()}]"
+        
+        iterate: dict = results[keyword] if keyword != "" else results
+        
+        for i in range(len(iterate)):
+            try:
+                item: dict = iterate[i]['track']
+            except:
+                item: dict = iterate[i]
+            
+            data = ""
+            for idx, artist in enumerate(item['artists']):
+                data += artist['name']
+                data += ", " if (idx + 1 != len(item['artists'])) else ""
+            artists: str = data
+            
+            name: str = item['name']
+            uri: str  = item['uri']
+            
+            try:
+                icon: str = item['album']['images'][0]['url']
+            except:
+                try:
+                    icon: str = item['images'][0]['url']
+                    name = f"<u>{name}</u>"
+                except:
+                    icon: str = "https://developer.spotify.com/images/guidelines/design/icon3@2x.png"
+            
+            payload += ("\t" + name + "\t" + artists + "\t" + uri + "\t" + icon + "\n")
+        
+        return payload
+    
+    def get_artists(self, results: dict) -> str:
+        payload: str = "[SEARCH]"
+        
+        for artist in results["items"]:
+            name:       str = artist["name"]
+            uri:        str = artist["external_urls"]["spotify"]
+            try:
+                icon:       str = artist["images"][0]["url"]
+            except:
+                icon:       str = "https://developer.spotify.com/images/guidelines/design/icon3@2x.png"
+            followers:  str = str(artist["followers"]["total"]) + " Followers"
+            
+            payload += ("\t" + name + "\t" + followers + "\t" + uri + "\t" + icon + "\n")
+        
+        return payload
+    
+    def get_playlist_rows(self, items: list[dict]) -> str:
+        payload: str = ""
+        
+        for i in range(len(items)):
+            item: dict = items[i]
+            
+            name: str  = item['name']
+            count: str = item['tracks']['total']
+            uri: str   = item['uri']
+            
+            try:
+                icon: str = item['images'][0]['url']
+            except:
+                icon: str = "https://developer.spotify.com/images/guidelines/design/icon3@2x.png"
+
+            payload += "\t" + name + "\t" + f"{str(count)} Songs" + "\t" + uri + "\t" + icon + "\n"
+        
+        return payload
+    
+    def display_album(self, album: dict) -> str:
+        data: str    = ""
+        payload: str = "[ALBUM]"
+        
+        for idx, artist in enumerate(album["artists"]):
+            data += artist["name"]
+            data += ", " if (idx + 1 != len(album["artists"])) else ""
+        artists: str = data
+        
+        name: str  = album["name"]
+        count: str = str(album["total_tracks"])
+        uri: str   = album["uri"]
+        icon: str  = album["images"][0]["url"]
+        
+        disc1_dict: list[dict] = []
+        disc2_dict: list[dict] = []
+        
+        for idx, item in enumerate(album["tracks"]["items"]):
+            if (item["disc_number"] == 1):
+                disc1_dict.append(item)
+            elif (item["disc_number"] == 2):
+                disc2_dict.append(item)
+                
+        payload += ("\t" + name + "\t" + artists + "\t" + count + "\t" + uri + "\t" + icon + "\n")
+        
+        disc1: str = self.get_results(disc1_dict, ws_call="none", keyword="")
+        payload += disc1.removeprefix("[NONE]\t")
+        
+        if (len(disc2_dict) > 0):
+            disc2: str = self.get_results(disc2_dict, ws_call="none", keyword="")
+            payload += ("\t" + "[DISC2]\t" + disc2.removeprefix("[NONE]\t"))
+        
+        return payload
+    
+    def display_playlist(self, playlist: dict, offset: int, uri: str = "") -> str:
+        payload: str = "[PLAYLIST]"
+        
+        try:
+            name: str  = playlist["name"]
+            owner: str = playlist["owner"]["display_name"]
+            count: str = str(playlist["tracks"]["total"])
+            uri: str   = playlist["uri"]
+            
+            track_dict: dict = self.fetch("playlist_tracks", playlist_id=playlist["uri"], offset=int(count)-offset-20, limit=20)
+            track_dict: dict = {"items": track_dict["items"][::-1]}
+        except:
+            name: str  = "Liked Songs"
+            owner: str = " "
+            count: str =str(playlist["total"])
+            
+            track_dict: dict = self.fetch("current_user_saved_tracks", offset=offset, limit=20)
+
+        try:
+            icon: str  = playlist["images"][0]["url"]
+        except:
+            icon: str = "https://developer.spotify.com/images/guidelines/design/icon3@2x.png"
+        
+        tracks: str         = self.get_results(track_dict, ws_call="none")
+        
+        payload += ("\t" + name + "\t" + owner + "\t" + count + "\t" + uri + "\t" + icon + "\n" + tracks.removeprefix("[NONE]\t") + "\t")
+        
+        return payload
+
+    def display_artist(self, artist: dict, artist_top_tracks: dict, aritst_albums: dict) -> str:
+        payload: str = "[ARTIST]"
+        
+        name:       str = artist["name"]
+        url:        str = artist["uri"]
+        try:
+            icon:       str = artist["images"][0]["url"]
+        except:
+            icon:       str = "https://developer.spotify.com/images/guidelines/design/icon3@2x.png"
+        followers:  str = str(artist["followers"]["total"])
+        
+        top_tracks: str = self.get_results(artist_top_tracks, ws_call="TOP", keyword="tracks")
+        albums:     str = self.get_results(aritst_albums, ws_call="ALBUMS", keyword="items")
+        
+        payload += ("\t" + name + "\t" + url + "\t" + icon + "\t" + followers + "\t\t\t" + top_tracks.removeprefix("[NONE]\t") + "\t\t\t" + albums.removeprefix("[NONE]\t"))
+        
+        return payload
+
+def make_client(kind: type, image_size: int = None) -> APIClient:
+    # No latency and no rate limit, so only the formatting is measured (the playlist pages come from the RequestScope after the first read)
+    return kind("", "", "", "", rate=1e9, burst=10**9, api=FakeSpotify(latency=0), image_size=image_size)
+
+# Every view with the made up data it's formatted from, as (name, function of a client)
+def make_views(api: FakeSpotify) -> list[tuple]:
+    playback: dict  = api.current_playback()
+    search: dict    = api.search("benchmark", limit=50, type="track,album,artist")
+    album: dict     = {**api.album("spotify:album:a7"), "tracks": api.page(lambda x: api.track_object(84 + x % 12), 24, 50, 0)}
+    playlist: dict  = api.playlist("spotify:playlist:p3")
+    artist: dict    = api.artist("spotify:artist:r5")
+    top: dict       = api.artist_top_tracks("spotify:artist:r5")
+    albums: dict    = api.artist_albums("spotify:artist:r5", limit=20)
+    playlists: list = [api.playlist_object(x) for x in range(50)]
+    queue: dict     = api.queue()
+    page: dict      = api.playlist_items("spotify:playlist:p3", limit=100)
+
+    return [
+        ("current track",     lambda c: c.get_track_data(playback, ws_call="current")),
+        ("search tracks",     lambda c: c.get_results(search["tracks"], ws_call="search")),
+        ("search albums",     lambda c: c.get_results(search["albums"], ws_call="search")),
+        ("search artists",    lambda c: c.get_artists({"items": [{**x, "followers": {"total": 10}} for x in search["artists"]["items"]]})),
+        ("queue",             lambda c: c.get_results(queue, ws_call="queue", keyword="queue")),
+        ("playlist page 100", lambda c: c.get_results(page, ws_call="none")),
+        ("saved playlists",   lambda c: c.get_playlist_rows(playlists)),
+        ("album",             lambda c: c.display_album(album)),
+        ("playlist",          lambda c: c.display_playlist(playlist, offset=40)),
+        ("artist",            lambda c: c.display_artist(artist, top, albums)),
+    ]
+
+def main():
+    options: arg.Namespace = parser.parse_args()
+    legacy: APIClient      = make_client(LegacyClient)
+    client: APIClient      = make_client(APIClient)
+    views: list            = make_views(FakeSpotify(latency=0))
+
+    print(f"\n{'View':<18} {'Legacy (us)':>12} {'Cold (us)':>10} {'Warm (us)':>10} {'Speedup':>8}")
+
+    with legacy.request_scope(), client.request_scope():
+        for (name, view) in views:
+            if (view(legacy) != view(client)):
+                raise Exception(f"The output of '{name}' isn't the same as before!")
+
+            before: float = min(timeit.repeat(lambda: view(legacy), number=options.number, repeat=3)) / options.number * 1e6
+            warm: float   = min(timeit.repeat(lambda: view(client), number=options.number, repeat=3)) / options.number * 1e6
+
+            def cold(): # Without the formatted rows of earlier runs
+                client._formatter = Formatter()
+                view(client)
+            empty: float = min(timeit.repeat(cold, number=options.number, repeat=3)) / options.number * 1e6
+
+            print(f"{name:<18} {before:>12.1f} {empty:>10.1f} {warm:>10.1f} {before / warm:>7.1f}x")
+
+        if (options.image_size):
+            fitting: APIClient = make_client(APIClient, image_size=options.image_size)
+            fitting.fetch = client.fetch
+            seconds: float     = min(timeit.repeat(lambda: [x[1](fitting) for x in views], number=options.number // 10, repeat=3))
+            print(f"\nEvery view with the best fitting picture for {options.image_size}px: {seconds / (options.number // 10) * 1e6:.1f} us")
+
+    print("\nThe output of every view is the same as before")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,226 @@
+import asyncio as aio
+import websockets as ws
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")) # The server's modules are one folder up
+from FakeSpotify import FakeSpotify # Knows which URIs exist in the made up catalog
+
+import argparse as arg
+parser = arg.ArgumentParser(description="Opens many websocket clients against the Resonite Spotipy server and measures how fast it answers them")
+parser.add_argument("--url", dest="url", help="The websocket server to measure, a server with the made up Spotify backend is started if there's none", default=None)
+parser.add_argument("-c", "--clients", dest="clients", type=int, help="How many websocket clients run at the same time", default=20)
+parser.add_argument("-n", "--commands", dest="commands", type=int, help="How many commands every client sends", default=100)
+parser.add_argument("-m", "--mix", dest="mix", help="The command mix to send (browse, control, or mixed), or custom weights like 'search:3,next:1'", default="mixed")
+parser.add_argument("-k", "--keys", dest="keys", type=int, help="How many different albums, artists, playlists, and searches the clients pick from", default=50)
+parser.add_argument("-a", "--accounts", dest="accounts", type=int, help="How many accounts the clients are spread over (0 uses the default account)", default=0)
+parser.add_argument("--think", dest="think", type=float, help="How many milliseconds every client waits between its commands", default=0.0)
+parser.add_argument("--seed", dest="seed", type=int, help="The seed of the command picks", default=0)
+parser.add_argument("--burst-gap", dest="burst_gap", type=float, help="How many milliseconds pass between the messages of 'typing' and 'flipping'", default=50.0)
+parser.add_argument("--pipeline", dest="pipeline", type=int, help="How many commands every client sends at once in an envelope (1 sends them one at a time)", default=1)
+parser.add_argument("--delta", dest="delta", action="store_true", help="Asks the server for row level deltas of the listings", default=False)
+parser.add_argument("--json", dest="json", help="A file to write the results to as JSON", default=None)
+parser.add_argument("--port", dest="port", type=int, help="The port of the started server", default=8799)
+parser.add_argument("--server-args", dest="server_args", help="Extra arguments for the started server, like '--fake-latency 100 -w 8'", default="")
+
+CATALOG: FakeSpotify = FakeSpotify(latency=0)
+
+# Every command the clients can send, and how the extra data of it is picked
+COMMANDS: dict = {
+    "current_info":     lambda r, k: "current_info",
+    "current_states":   lambda r, k: "current_states",
+    "list_queue":       lambda r, k: "list_queue",
+    "list_playlists":   lambda r, k: "list_playlists",
+    "search":           lambda r, k: f"search track song {r.randrange(k)}",
+    "search_library":   lambda r, k: f"search_library track {r.randrange(k)}",
+    "display_album":    lambda r, k: f"display_album spotify:album:a{r.randrange(k)}",
+    "display_artist":   lambda r, k: f"display_artist spotify:artist:r{r.randrange(min(k, CATALOG.ARTISTS))}",
+    "display_playlist": lambda r, k: (lambda i: f"display_playlist spotify:playlist:p{i} {r.randrange(0, CATALOG.playlist_size(i), 20)}")(r.randrange(min(k, CATALOG.PLAYLISTS))),
+    "stream_playlist":  lambda r, k: f"stream_playlist spotify:playlist:p{r.randrange(min(k, CATALOG.PLAYLISTS))}",
+    "typing":           lambda r, k: (lambda q: [f"search track {q[:x]}" for x in range(3, len(q) + 1)])(f"song {r.randrange(k)}"),
+    "flipping":         lambda r, k: (lambda i: [f"display_playlist spotify:playlist:p{i} {x}" for x in range(0, 100, 20)])(r.randrange(min(k, CATALOG.PLAYLISTS))),
+    "next":             lambda r, k: "next",
+    "pause":            lambda r, k: "pause",
+    "shuffle":          lambda r, k: "shuffle",
+    "repeat":           lambda r, k: "repeat",
+}
+
+# The frames that end the reply of the commands that answer with more than one frame
+LAST_FRAMES: dict = {
+    "stream_playlist": ("[PLAYLIST END]", "[ERROR]"),
+    "typing":          ("[INIT]",),
+    "flipping":        ("[INIT]",),
+}
+
+# The message sent after the messages of a burst (like 'typing'), since the server might only answer the last of them
+FENCE: str = "current_states"
+
+MIXES: dict = {
+    "browse":  {"display_playlist": 4, "display_album": 3, "display_artist": 2, "search": 3, "list_playlists": 1, "list_queue": 1},
+    "control": {"current_info": 4, "current_states": 2, "next": 1, "pause": 2, "shuffle": 1, "repeat": 1},
+    "mixed":   {"current_info": 4, "display_playlist": 3, "display_album": 2, "display_artist": 2, "search": 2, "list_queue": 1,
+                "list_playlists": 1, "next": 1, "pause": 1, "shuffle": 1},
+}
+
+def parse_mix(mix: str) -> dict:
+    if (mix in MIXES):
+        return MIXES[mix]
+
+    weights: dict = {x.split(":")[0]: float(x.split(":")[1]) if (":" in x) else 1.0 for x in mix.split(",")}
+    for command in weights:
+        if (command not in COMMANDS):
+            raise Exception(f"Unknown command in the mix! ({command = })")
+
+    return weights
+
+def percentile(values: list[float], percent: float) -> float:
+    ordered: list = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, round(percent / 100 * len(ordered) + 0.5) - 1))] # Nearest rank
+
+# One websocket client, sends its commands one after another and times every reply
+async def run_client(url: str, index: int, options: arg.Namespace, mix: dict, results: list):
+    r: random.Random = random.Random(options.seed * 1000 + index)
+    names: list      = list(mix)
+    weights: list    = [mix[x] for x in names]
+
+    async with ws.connect(url, max_size=None) as websocket:
+        await websocket.recv() # The playback states every connection starts with
+
+        if (options.accounts > 0):
+            await websocket.send(f"account bench{index % options.accounts}")
+            await websocket.recv()
+            await websocket.recv()
+
+        if (options.delta):
+            await websocket.send("delta on")
+            await websocket.recv()
+
+        if (options.pipeline > 1):
+            for sent in range(0, options.commands, options.pipeline):
+                commands: list = [(x, COMMANDS[x](r, options.keys)) for x in r.choices(names, weights, k=min(options.pipeline, options.commands - sent))]
+                await run_envelope(websocket, commands, results)
+                await aio.sleep(options.think / 1000) if options.think else None
+            return None
+
+        for _ in range(options.commands):
+            command: str = r.choices(names, weights)[0]
+            message: str = COMMANDS[command](r, options.keys)
+
+            start: float = time.perf_counter()
+            if (isinstance(message, list)): # A burst, the user typing into the search box or flipping through pages
+                for x in message:
+                    await websocket.send(x)
+                    await aio.sleep(options.burst_gap / 1000)
+                message = FENCE
+            await websocket.send(message)
+
+            reply: str = await websocket.recv()
+            size: int  = len(reply.encode())
+            while (command in LAST_FRAMES) and (not reply.startswith(LAST_FRAMES[command])):
+                reply = await websocket.recv()
+                size += len(reply.encode())
+
+            results.append((command, time.perf_counter() - start, reply.startswith("[ERROR]"), size))
+            await aio.sleep(options.think / 1000) if options.think else None
+
+# Sends the given commands in one envelope and times the reply of each of them, a burst only sends its last message (since commands
+# in an envelope are never dropped for a newer one)
+async def run_envelope(websocket, commands: list[tuple], results: list):
+    last: dict   = {str(i): LAST_FRAMES.get(x) if (not isinstance(y, list)) else None for (i, (x, y)) in enumerate(commands)}
+    sizes: dict  = {x: 0 for x in last}
+    start: float = time.perf_counter()
+
+    await websocket.send("\n".join([f"#{i} {y[-1] if (isinstance(y, list)) else y}" for (i, (_, y)) in enumerate(commands)]))
+
+    while (sizes):
+        reply: str        = await websocket.recv()
+        (tag, _, payload) = reply.partition("\t")
+        tag               = tag.removeprefix("#")
+
+        if (tag not in sizes): # A playback push, it isn't part of any reply
+            continue
+
+        sizes[tag] += len(reply.encode())
+        if (last[tag] is None) or (payload.startswith(last[tag])):
+            results.append((commands[int(tag)][0], time.perf_counter() - start, payload.startswith("[ERROR]"), sizes.pop(tag)))
+
+# Waits for the started server to accept connections
+async def wait_for_server(url: str, timeout: float = 30.0):
+    deadline: float = time.monotonic() + timeout
+
+    while (True):
+        try:
+            async with ws.connect(url) as websocket:
+                await websocket.recv()
+                return None
+        except (OSError, ws.exceptions.InvalidMessage):
+            if (time.monotonic() > deadline):
+                raise Exception("The server didn't start in time")
+            await aio.sleep(0.2)
+
+# Asks the server how many Spotify calls it made so far
+async def count_calls(url: str) -> int:
+    async with ws.connect(url, max_size=None) as websocket:
+        await websocket.recv()
+        await websocket.send("stats")
+
+        lines: list = [x.split("\t") for x in (await websocket.recv()).split("\n")]
+        return sum([int(x[x.index("upstream") + 2]) for x in lines if ("upstream" in x)])
+
+def report(results: list, elapsed: float) -> dict:
+    summary: dict = {}
+
+    for command in sorted(set([x[0] for x in results])) + ["all"]:
+        latencies: list = [x[1] * 1000 for x in results if (command == "all") or (x[0] == command)]
+        errors: int     = len([x for x in results if ((command == "all") or (x[0] == command)) and (x[2])])
+
+        sizes: list     = [x[3] for x in results if (command == "all") or (x[0] == command)]
+
+        summary[command] = {"count": len(latencies), "errors": errors, "p50": percentile(latencies, 50), "p99": percentile(latencies, 99),
+                            "per_second": len(latencies) / elapsed, "bytes": sum(sizes)}
+
+    print(f"\n{'Command':<18} {'Count':>7} {'Errors':>7} {'p50 (ms)':>10} {'p99 (ms)':>10} {'Per second':>11} {'KB':>9}")
+    for command, x in summary.items():
+        print(f"{command:<18} {x['count']:>7} {x['errors']:>7} {x['p50']:>10.1f} {x['p99']:>10.1f} {x['per_second']:>11.1f} {x['bytes'] / 1000:>9.1f}")
+    print(f"\n{len(results)} commands in {elapsed:.2f} seconds")
+
+    return summary
+
+async def main():
+    options: arg.Namespace = parser.parse_args()
+    mix: dict              = parse_mix(options.mix)
+    url: str               = options.url or f"ws://localhost:{options.port}"
+    server                 = None
+
+    if (options.url is None):
+        root: str = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+        server    = subprocess.Popen([sys.executable, os.path.join(root, "ResoniteSpotipy.py"), "--fake", "--port", str(options.port), "--store", "",
+                                      *options.server_args.split()], cwd=root, stdout=subprocess.DEVNULL)
+
+    try:
+        await wait_for_server(url)
+
+        results: list = []
+        before: int   = await count_calls(url)
+        start: float  = time.perf_counter()
+        await aio.gather(*[run_client(url, x, options, mix, results) for x in range(options.clients)])
+        elapsed: float = time.perf_counter() - start
+        calls: int     = await count_calls(url) - before
+
+        summary: dict = report(results, elapsed)
+        print(f"{calls} Spotify calls ({calls / max(1, len(results)):.2f} per command)")
+
+        if (options.json):
+            with open(options.json, "w") as file:
+                json.dump({"options": vars(options), "elapsed": elapsed, "spotify_calls": calls, "commands": summary}, file, indent=4)
+    finally:
+        if (server is not None):
+            server.terminate()
+            server.wait()
+
+if __name__ == '__main__':
+    aio.run(main())
@@ -0,0 +1,102 @@
+import os
+import sys
+import time
+import zlib
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")) # The server's modules are one folder up
+import Delta
+
+from APIClient import APIClient
+from FakeSpotify import FakeSpotify
+
+import argparse as arg
+parser = arg.ArgumentParser(description="Measures the bytes and encode time of the listings sent whole, compressed, as deltas, and as compressed deltas")
+parser.add_argument("-n", "--refreshes", dest="refreshes", type=int, help="How many times every listing is refreshed", default=20)
+
+class Deflate(object):
+    '''
+    A class that compresses frames the way permessage-deflate does on the server side: a raw deflate stream that's kept between frames
+    (context takeover), with every frame flushed and the trailing empty block cut off.
+    '''
+    def __init__(self):
+        self._stream = zlib.compressobj(6, zlib.DEFLATED, -12, 5) # The window bits and memory level the websockets server picks
+
+    def compress(self, frame: str) -> bytes:
+        return (self._stream.compress(frame.encode()) + self._stream.flush(zlib.Z_SYNC_FLUSH))[:-4]
+
+def make_client(api: FakeSpotify) -> APIClient:
+    return APIClient("", "", "", "", rate=1e9, burst=10**9, api=api)
+
+def current_info(client: APIClient, api: FakeSpotify) -> str:
+    result: dict = api.current_playback()
+    return client.get_track_data(result, ws_call="current") + "\n" + client.format_playback_states(result)
+
+# What changes between the refreshes of every listing, as (name, command, the listing, what happens before every refresh)
+def make_scenarios(client: APIClient, api: FakeSpotify) -> list[tuple]:
+    def skip():
+        api.next_track()
+        client.invalidate("queue")
+
+    def toggle():
+        api.pause_playback() if (api.current_playback()["is_playing"]) else api.start_playback()
+
+    pages: list = [0, 0] # The offset of the playlist page and the album that are shown
+    def turn():
+        pages[0] = (pages[0] + 100) % api.playlist_size(3)
+
+    def other():
+        pages[1] += 1
+
+    return [
+        ("current_info, paused", "current_info", lambda: current_info(client, api), toggle),
+        ("current_info, skipped", "current_info", lambda: current_info(client, api), api.next_track),
+        ("list_queue, skipped", "list_queue", client.queue_view, skip),
+        ("list_playlists, same", "list_playlists", client.playlists_view, lambda: None),
+        ("display_playlist, same", "display_playlist", lambda: client.playlist_view("spotify:playlist:p3", 0), lambda: None),
+        ("display_playlist, paged", "display_playlist", lambda: client.playlist_view("spotify:playlist:p3", pages[0]), turn),
+        ("display_album, others", "display_album", lambda: client.album_view(f"spotify:album:a{pages[1]}"), other),
+    ]
+
+def main():
+    options: arg.Namespace = parser.parse_args()
+    api: FakeSpotify       = FakeSpotify(latency=0)
+    client: APIClient      = make_client(api)
+    totals: list           = [0, 0, 0, 0]
+
+    print(f"\n{'Listing':<24} {'Whole (B)':>10} {'Deflate (B)':>12} {'Delta (B)':>10} {'Both (B)':>9} {'Delta (us)':>11} {'Deflate (us)':>13}")
+
+    for (name, command, listing, change) in make_scenarios(client, api):
+        payloads: list = []
+        for _ in range(options.refreshes):
+            payloads.append(listing())
+            change()
+
+        whole: Deflate = Deflate()
+        both: Deflate  = Deflate()
+        sizes: list    = [0, 0, 0, 0]
+        timings: list  = [0.0, 0.0]
+        last: list     = None
+
+        for payload in payloads:
+            start: float = time.perf_counter()
+            delta: str   = (Delta.diff(command, last, payload) if (last is not None) else None) or payload
+            timings[0]  += time.perf_counter() - start
+
+            if (delta.startswith("[DELTA]")) and (Delta.patch(last, delta) != payload):
+                raise Exception(f"The delta of '{name}' doesn't put the payload back together!")
+            last = payload.split("\n")
+
+            start = time.perf_counter()
+            compressed: bytes = whole.compress(payload)
+            timings[1] += time.perf_counter() - start
+
+            sizes = [sizes[0] + len(payload.encode()), sizes[1] + len(compressed), sizes[2] + len(delta.encode()), sizes[3] + len(both.compress(delta))]
+
+        totals = [x + y for (x, y) in zip(totals, sizes)]
+        print(f"{name:<24} {sizes[0]:>10} {sizes[1]:>12} {sizes[2]:>10} {sizes[3]:>9} {timings[0] / len(payloads) * 1e6:>11.1f} {timings[1] / len(payloads) * 1e6:>13.1f}")
+
+    print(f"{'all':<24} {totals[0]:>10} {totals[1]:>12} {totals[2]:>10} {totals[3]:>9}")
+    print(f"\nDeflate sends {totals[1] / totals[0]:.1%} of the bytes, deltas {totals[2] / totals[0]:.1%}, and both {totals[3] / totals[0]:.1%}")
+
+if __name__ == '__main__':
+    main()
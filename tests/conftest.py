@@ -0,0 +1,35 @@
+import asyncio as aio
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")) # The server's modules are one folder up
+
+class FakeWebSocket(object):
+    '''
+    A websocket for the tests of the connection's inbox and outbox. It yields the given messages (then ends normally, or with the
+    given error), and its writes hang until `open` is set, like a client that stopped reading.
+    '''
+    def __init__(self, messages: list[str] = None, error: Exception = None):
+        self.messages = messages or []
+        self.error    = error
+        self.sent     = []
+        self.closed   = None
+        self.open     = aio.Event()
+
+    def __aiter__(self):
+        return self.read()
+
+    async def read(self):
+        for message in self.messages:
+            await aio.sleep(0)
+            yield message
+
+        if (self.error is not None):
+            raise self.error
+
+    async def send(self, frame: str):
+        await self.open.wait()
+        self.sent.append(frame)
+
+    async def close(self, code: int = 1000, reason: str = ""):
+        self.closed = (code, reason)
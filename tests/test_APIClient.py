@@ -0,0 +1,162 @@
+import threading
+import time
+
+import pytest
+
+from APIClient import APIClient, Superseded
+from ResponseCache import ResponseCache
+from Scheduler import Scheduler, RateLimited, RequestExpired
+
+class SlowSpotify(object):
+    '''
+    A Spotify client whose reads wait until `go` is set, so several reads can be in flight at once. The first reads fail with the
+    given errors.
+    '''
+    auth_manager = None
+
+    def __init__(self, errors: list[Exception] = None):
+        self.calls  = 0
+        self.go     = threading.Event()
+        self.errors = errors or []
+
+    def track(self, uri: str) -> dict:
+        self.calls += 1
+        self.go.wait(5)
+        if (self.errors):
+            raise self.errors.pop(0)
+        return {"uri": uri, "calls": self.calls}
+
+def client(api: SlowSpotify) -> APIClient:
+    return APIClient("", "", "", "", rate=1e9, burst=10**9, api=api)
+
+def read(api: APIClient, results: list, lane: int = Scheduler.BROWSE, cancelled: threading.Event = None) -> threading.Thread:
+    def run():
+        with Scheduler.lane(lane), api.request_scope(cancelled):
+            try:
+                results.append(api.fetch_once(("track", "t1"), "track", "t1"))
+            except Exception as e:
+                results.append(e)
+
+    thread: threading.Thread = threading.Thread(target=run)
+    thread.start()
+    time.sleep(0.05)
+    return thread
+
+def test_identical_reads_share_one_call():
+    spotify: SlowSpotify = SlowSpotify()
+    api: APIClient       = client(spotify)
+    results: list        = []
+
+    threads: list = [read(api, results) for _ in range(3)]
+    spotify.go.set()
+    for thread in threads:
+        thread.join()
+
+    assert spotify.calls == 1
+    assert api.coalesced == 2
+    assert results == [{"uri": "t1", "calls": 1}] * 3
+
+def test_read_of_a_superseded_command_is_made_again():
+    spotify: SlowSpotify = SlowSpotify(errors=[Superseded()]) # The command of the first read is replaced while it's in flight
+    api: APIClient       = client(spotify)
+    (leading, following) = ([], [])
+
+    leader: threading.Thread   = read(api, leading)
+    follower: threading.Thread = read(api, following)
+    spotify.go.set()
+    leader.join()
+    follower.join()
+
+    assert isinstance(leading[0], Superseded)
+    assert following == [{"uri": "t1", "calls": 2}]
+
+def test_read_is_made_again_when_a_more_urgent_lane_gives_up():
+    spotify: SlowSpotify = SlowSpotify(errors=[RequestExpired("The request waited too long for its turn")])
+    api: APIClient       = client(spotify)
+    (played, browsed)    = ([], [])
+
+    control: threading.Thread = read(api, played, lane=Scheduler.CONTROL)
+    browse: threading.Thread  = read(api, browsed, lane=Scheduler.BROWSE)
+    spotify.go.set()
+    control.join()
+    browse.join()
+
+    assert isinstance(played[0], RequestExpired)
+    assert browsed == [{"uri": "t1", "calls": 2}]
+
+def test_read_of_the_same_lane_keeps_the_error_in_its_scope():
+    spotify: SlowSpotify = SlowSpotify(errors=[RateLimited(60)])
+    api: APIClient       = client(spotify)
+    scopes: list         = []
+
+    def run():
+        with api.request_scope() as scope:
+            scopes.append(scope)
+            with pytest.raises(RateLimited):
+                api.fetch_once(("track", "t1"), "track", "t1")
+
+    threads: list = [threading.Thread(target=run) for _ in range(2)]
+    for thread in threads:
+        thread.start()
+        time.sleep(0.05)
+    spotify.go.set()
+    for thread in threads:
+        thread.join()
+
+    assert spotify.calls == 1
+    assert [isinstance(scope.error, RateLimited) for scope in scopes] == [True, True]
+
+def test_urgent_read_does_not_wait_behind_a_prefetch():
+    spotify: SlowSpotify = SlowSpotify()
+    api: APIClient       = client(spotify)
+    (prefetched, played) = ([], [])
+
+    prefetch: threading.Thread = read(api, prefetched, lane=Scheduler.PREFETCH)
+    control: threading.Thread  = read(api, played, lane=Scheduler.CONTROL)
+
+    assert spotify.calls == 2
+    assert api.coalesced == 0
+
+    spotify.go.set()
+    prefetch.join()
+    control.join()
+
+def test_prefetch_joins_an_urgent_read():
+    spotify: SlowSpotify = SlowSpotify()
+    api: APIClient       = client(spotify)
+    results: list        = []
+
+    control: threading.Thread  = read(api, results, lane=Scheduler.CONTROL)
+    prefetch: threading.Thread = read(api, results, lane=Scheduler.PREFETCH)
+
+    spotify.go.set()
+    control.join()
+    prefetch.join()
+
+    assert spotify.calls == 1
+    assert api.coalesced == 1
+
+def test_only_the_latest_snapshots_are_kept():
+    api: APIClient = client(SlowSpotify())
+    api._snapshots = ResponseCache({"playlist": 60}, max_size=2)
+
+    api.remember_snapshots([{"uri": f"spotify:playlist:p{x}", "snapshot_id": f"s{x}"} for x in range(3)] + [{"uri": "spotify:playlist:p9"}])
+
+    assert api.last_seen("spotify:playlist:p0") is None
+    assert api.last_seen("spotify:playlist:p9") is None # Playlists without a snapshot aren't kept
+    assert api.playlist_key("spotify:playlist:p2", 20) == ("playlist", ("spotify:playlist:p2", "s2", 20))
+    assert api.playlist_key("spotify:playlist:p0", 20) == ("playlist", ("spotify:playlist:p0", None, 20))
+
+def test_prefetch_parts_run_on_the_background_pool():
+    api: APIClient = client(SlowSpotify())
+    names: list    = []
+
+    def part():
+        names.append(threading.current_thread().name)
+
+    api.fetch_all(part)
+    with Scheduler.lane(Scheduler.PREFETCH):
+        api.fetch_all(part, part, part)
+
+    assert names[0].startswith("spotify-fanout")
+    assert all([x.startswith("spotify-background") for x in names[1:]])
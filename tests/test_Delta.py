@@ -0,0 +1,46 @@
+import pytest
+
+import Delta
+
+def rows(*numbers: int) -> list[str]:
+    return [f"[QUEUE]\tTrack {x}\tArtist {x % 7}\tspotify:track:t{x}\thttps://i.scdn.co/image/{x:040d}" for x in numbers]
+
+CASES: dict = {
+    "same":      (rows(*range(20)), rows(*range(20))),
+    "skipped":   (rows(*range(20)), rows(*range(1, 21))),
+    "inserted":  (rows(*range(20)), rows(*range(10)) + rows(99) + rows(*range(10, 20))),
+    "removed":   (rows(*range(20)), rows(*range(5)) + rows(*range(6, 20))),
+    "reordered": (rows(*range(20)), rows(*range(10, 20)) + rows(*range(10))),
+    "changed":   (rows(*range(20)), rows(*range(9)) + [rows(9)[0].replace("Track 9", "Track nine")] + rows(*range(10, 20))),
+}
+
+@pytest.mark.parametrize("name", CASES)
+def test_patch_puts_the_payload_back_together(name: str):
+    (old, new) = CASES[name]
+    payload: str = "\n".join(new)
+
+    delta: str | None = Delta.diff("list_queue", old, payload)
+
+    assert delta is not None
+    assert delta.startswith("[DELTA]\tlist_queue\n")
+    assert len(delta) < len(payload)
+    assert Delta.patch(old, delta) == payload
+
+def test_unrelated_payload_is_sent_whole():
+    assert Delta.diff("list_queue", rows(*range(20)), "\n".join(rows(*range(100, 120)))) is None
+
+def test_kept_rows_become_one_run():
+    delta: str = Delta.diff("list_queue", rows(*range(20)), "\n".join(rows(*range(1, 21))))
+
+    assert delta.split("\n")[1:] == ["=1\t19", "+" + rows(20)[0]]
+
+def test_header_sharing_a_line_is_matched_by_its_row():
+    old: list[str] = ["[ALBUM]\tAlbum\tspotify:album:a1\t" + rows(0)[0]] + rows(1, 2)
+    new: str       = "\n".join(["[ALBUM]\tAlbum\tspotify:album:a1\t" + rows(0)[0]] + rows(1, 2, 3))
+
+    assert Delta.key(old[0]) == "spotify:track:t0"
+    assert Delta.patch(old, Delta.diff("display_album", old, new)) == new
+
+def test_line_without_uri_is_its_own_key():
+    assert Delta.key("[INIT]\tFalse\tOff\tTrue") == "[INIT]\tFalse\tOff\tTrue"
+    assert Delta.key("[PLAYLIST]\tspotify:user:someone:collection") == "spotify:user:someone:collection"
@@ -0,0 +1,125 @@
+import pytest
+
+from spotipy.exceptions import SpotifyException
+
+import DeviceRegistry as module
+
+from APIClient import APIClient
+from DeviceRegistry import DeviceRegistry
+from FakeSpotify import FakeSpotify
+
+@pytest.fixture
+def clock(monkeypatch) -> list:
+    now: list = [1000.0]
+    monkeypatch.setattr(module.time, "monotonic", lambda: now[0])
+    return now
+
+def device(id: str, name: str = None, active: bool = False, restricted: bool = False) -> dict:
+    return {"id": id, "name": name or id.capitalize(), "is_active": active, "is_restricted": restricted}
+
+class Devices(object):
+    '''
+    The device list of an account, counting how many times it was looked up.
+    '''
+    def __init__(self, *devices: dict):
+        self.devices = list(devices)
+        self.lookups = 0
+
+    def __call__(self) -> list[dict]:
+        self.lookups += 1
+        return list(self.devices)
+
+def test_preferred_then_active_then_first(clock: list):
+    devices: Devices = Devices(device("phone"), device("laptop", active=True), device("speaker", "Kitchen"))
+
+    assert DeviceRegistry(devices).current() == "laptop"
+    assert DeviceRegistry(devices, preferred=["KITCHEN", "laptop"]).current() == "speaker"
+    assert DeviceRegistry(devices, preferred=["tv"]).current() == "laptop"
+
+    devices.devices = [device("phone"), device("tablet")]
+    assert DeviceRegistry(devices).current() == "phone"
+
+    devices.devices = [device("web", restricted=True)]
+    assert DeviceRegistry(devices).current() is None
+
+def test_devices_are_looked_up_once_per_ttl(clock: list):
+    devices: Devices         = Devices(device("laptop", active=True))
+    registry: DeviceRegistry = DeviceRegistry(devices, ttl=30)
+
+    registry.current()
+    clock[0] += 30
+    registry.current()
+    assert devices.lookups == 1
+
+    clock[0] += 1
+    registry.current()
+    registry.current(refresh=True)
+    assert devices.lookups == 3
+
+def test_device_stays_until_it_is_gone(clock: list):
+    devices: Devices         = Devices(device("laptop", active=True), device("phone"))
+    registry: DeviceRegistry = DeviceRegistry(devices)
+    assert registry.current() == "laptop"
+
+    devices.devices = [device("laptop"), device("phone", active=True)] # Another app started playing on the phone
+    assert registry.current(refresh=True) == "laptop"
+
+    devices.devices = [device("phone", active=True)]
+    assert registry.current(refresh=True) == "phone"
+
+def test_fail_moves_on_to_the_next_device(clock: list):
+    devices: Devices         = Devices(device("laptop", active=True), device("phone"))
+    registry: DeviceRegistry = DeviceRegistry(devices, preferred=["laptop"])
+    registry.current()
+
+    assert registry.fail("laptop") == "phone" # Still listed, but the action just failed on it
+    assert registry.failovers == 1
+
+    devices.devices = [device("laptop")]
+    assert registry.fail("laptop") is None
+    assert registry.failovers == 1
+
+def test_gone_is_only_a_missing_device():
+    assert DeviceRegistry.gone(SpotifyException(404, -1, "Device not found"))
+    assert DeviceRegistry.gone(SpotifyException(403, -1, "Player command failed", reason="NO_ACTIVE_DEVICE"))
+    assert not DeviceRegistry.gone(SpotifyException(403, -1, "Restricted", reason="RESTRICTED_DEVICE"))
+    assert not DeviceRegistry.gone(ValueError("Not a Spotify error"))
+
+class Speakers(FakeSpotify):
+    '''
+    A FakeSpotify backend with two devices, where the actions sent to the `dead` ones fail like a device that went offline.
+    '''
+    def __init__(self):
+        super().__init__(latency=0)
+        self.dead   = set()
+        self.paused = []
+
+    def devices(self) -> dict:
+        return {"devices": [device("laptop", active=True), device("phone")]}
+
+    def pause_playback(self, device_id: str = None):
+        if (device_id in self.dead):
+            raise SpotifyException(404, -1, "Device not found")
+        self.paused.append(device_id)
+
+def test_action_is_retried_on_the_next_device():
+    spotify: Speakers = Speakers()
+    client: APIClient = APIClient("", "", "", "", rate=1e9, burst=10**9, api=spotify)
+    spotify.dead.add("laptop")
+
+    client.run_action(spotify.pause_playback)
+
+    assert spotify.paused == ["phone"]
+    assert client._devices.failovers == 1
+    assert client.find_device() == "phone"
+
+def test_action_fails_when_every_device_is_gone():
+    spotify: Speakers = Speakers()
+    client: APIClient = APIClient("", "", "", "", rate=1e9, burst=10**9, api=spotify)
+    spotify.dead.update(["laptop", "phone"])
+
+    with pytest.raises(SpotifyException):
+        client.run_action(spotify.pause_playback)
+
+    assert spotify.paused == []
+    assert client._devices.failovers == 1 # Only retried once
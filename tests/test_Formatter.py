@@ -0,0 +1,73 @@
+import pytest
+
+from APIClient import APIClient
+from FakeSpotify import FakeSpotify
+from Formatter import Formatter, DEFAULT_ICON
+
+from benchmarks.FormatterBenchmark import LegacyClient, make_client, make_views
+
+VIEWS: list = make_views(FakeSpotify(latency=0))
+
+def track(index: int, images: list = None) -> dict:
+    return {"uri": f"spotify:track:t{index}", "name": f"Track {index}", "artists": [{"name": "A"}, {"name": "B"}],
+            "album": {"name": "Album", "images": images if (images is not None) else [{"url": "cover", "width": 640}]}}
+
+@pytest.mark.parametrize("name", [x[0] for x in VIEWS])
+def test_view_is_the_same_as_before_cold_and_warm(name: str):
+    view: callable       = dict(VIEWS)[name]
+    legacy: APIClient    = make_client(LegacyClient)
+    client: APIClient    = make_client(APIClient)
+    evicting: APIClient  = make_client(APIClient)
+    evicting._formatter  = Formatter(max_rows=8) # Rows get evicted while the view is formatted
+
+    with legacy.request_scope(), client.request_scope(), evicting.request_scope():
+        expected: str = view(legacy)
+
+        assert view(client) == expected # Cold
+        assert view(client) == expected # Warm, from the kept rows
+        assert view(evicting) == expected
+        assert view(evicting) == expected
+
+def test_kept_row_is_the_same_as_a_new_one():
+    formatter: Formatter = Formatter()
+    first: str           = formatter.row(track(1))
+
+    assert formatter.row(track(1)) is first
+    assert first == Formatter().row(track(1)) == "\tTrack 1\tA, B\tspotify:track:t1\tcover\n"
+
+def test_track_without_its_album_is_kept_apart():
+    formatter: Formatter = Formatter()
+    formatter.row(track(1))
+
+    bare: dict = {key: value for (key, value) in track(1).items() if (key != "album")} # Like the tracks of an album's track list
+    assert formatter.row(bare) == f"\tTrack 1\tA, B\tspotify:track:t1\t{DEFAULT_ICON}\n"
+
+def test_album_is_underlined():
+    album: dict = {"uri": "spotify:album:a1", "name": "Album", "artists": [{"name": "A"}], "images": [{"url": "cover", "width": 640}]}
+
+    assert Formatter().row(album) == "\t<u>Album</u>\tA\tspotify:album:a1\tcover\n"
+
+def test_item_without_uri_is_not_kept():
+    formatter: Formatter = Formatter()
+    local: dict          = {**track(1), "uri": ""} # Like a local file
+
+    formatter.row(local)
+    assert formatter._rows == {}
+
+def test_oldest_tenth_is_evicted_when_full():
+    formatter: Formatter = Formatter(max_rows=20)
+    for x in range(21):
+        formatter.row(track(x))
+
+    assert len(formatter._rows) == 19
+    assert ("spotify:track:t0", True) not in formatter._rows
+    assert ("spotify:track:t1", True) not in formatter._rows
+    assert formatter.row(track(0)) == Formatter().row(track(0))
+
+def test_smallest_fitting_picture_is_picked():
+    images: list = [{"url": "640", "width": 640}, {"url": "300", "width": 300}, {"url": "64", "width": 64}]
+
+    assert Formatter(image_size=200).row(track(1, images)).endswith("\t300\n")
+    assert Formatter(image_size=1000).row(track(1, images)).endswith("\t640\n")
+    assert Formatter().row(track(1, images)).endswith("\t640\n")
+    assert Formatter(image_size=200).image([{"url": "mosaic", "width": None}]) == "mosaic"
@@ -0,0 +1,50 @@
+import asyncio as aio
+
+from Inbox import Inbox
+
+from conftest import FakeWebSocket
+
+def test_messages_arrive_in_order_then_none():
+    async def main():
+        inbox: Inbox = Inbox(FakeWebSocket(["search track a", "next"]))
+        messages: list = [await inbox.get() for _ in range(3)]
+        inbox.close()
+        return (messages, inbox.error)
+
+    assert aio.run(main()) == (["search track a", "next", None], None)
+
+def test_waiting_sees_newer_commands():
+    async def main():
+        inbox: Inbox = Inbox(FakeWebSocket(["search track a", "search track ab", "next"]))
+        await aio.sleep(0.01)
+
+        first: str = await inbox.get()
+        result: tuple = (first, inbox.waiting("search"), inbox.waiting("next"), inbox.waiting("pause"))
+        inbox.close()
+        return result
+
+    assert aio.run(main()) == ("search track a", True, True, False)
+
+def test_error_is_kept():
+    async def main():
+        inbox: Inbox = Inbox(FakeWebSocket(["next"], error=ConnectionError("gone")))
+        messages: list = [await inbox.get(), await inbox.get()]
+        inbox.close()
+        return (messages, inbox.error)
+
+    (messages, error) = aio.run(main())
+
+    assert messages == ["next", None]
+    assert isinstance(error, ConnectionError)
+
+def test_wait_gives_up_after_the_timeout():
+    async def main():
+        inbox: Inbox = Inbox(FakeWebSocket([]))
+        await inbox.get() # The end of the connection
+        inbox.close()
+
+        start: float = aio.get_running_loop().time()
+        await inbox.wait(0.05)
+        return aio.get_running_loop().time() - start
+
+    assert aio.run(main()) >= 0.05
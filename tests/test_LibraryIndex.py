@@ -0,0 +1,69 @@
+import pytest
+
+from APIClient import APIClient
+from FakeSpotify import FakeSpotify
+from LibraryIndex import LibraryIndex
+
+def item(index: int, name: str, artist: str = "Artist", album: str = "Album") -> dict:
+    return {"track": {"uri": f"spotify:track:t{index}", "name": name, "artists": [{"name": artist}],
+                      "album": {"name": album, "images": [{"url": "icon", "width": 64}]}}}
+
+def uris(payload: str) -> list[str]:
+    return [x.split("\t")[3] for x in payload.split("\n")[:-1]]
+
+@pytest.fixture
+def spotify() -> FakeSpotify:
+    return FakeSpotify(latency=0)
+
+@pytest.fixture
+def library(spotify: FakeSpotify) -> LibraryIndex:
+    return LibraryIndex(APIClient("", "", "", "", rate=1e9, burst=10**9, api=spotify))
+
+def test_every_word_has_to_start_a_word_of_the_track(library: LibraryIndex):
+    library.replace("spotify:playlist:p1", "s1", [item(1, "Blue Monday", "New Order"), item(2, "Blue Velvet", "Bobby Vinton"),
+                                                  item(3, "Monday Morning", album="Rumours")])
+
+    assert uris(library.search("blue")) == ["spotify:track:t1", "spotify:track:t2"] # Sorted by name
+    assert uris(library.search("mon")) == ["spotify:track:t1", "spotify:track:t3"]
+    assert uris(library.search("blue mon")) == ["spotify:track:t1"]
+    assert uris(library.search("RUMOUR")) == ["spotify:track:t3"]
+    assert uris(library.search("order blue")) == ["spotify:track:t1"]
+    assert library.search("onday") == "[SEARCH]"
+    assert library.search("blue velvet morning") == "[SEARCH]"
+    assert library.search("  ") == "[SEARCH]"
+
+def test_results_are_rows_of_the_formatter(library: LibraryIndex):
+    library.replace("spotify:playlist:p1", "s1", [item(1, "Blue Monday", "New Order")])
+
+    assert library.search("blue") == "[SEARCH]\tBlue Monday\tNew Order\tspotify:track:t1\ticon\n"
+
+def test_replace_only_keeps_the_new_tracks(library: LibraryIndex):
+    library.replace("spotify:playlist:p1", "s1", [item(1, "Blue Monday"), item(2, "Blue Velvet")])
+    library.replace("spotify:playlist:p1", "s2", [item(2, "Blue Velvet"), item(3, "Blue Train"), {"track": None}])
+
+    assert uris(library.search("blue")) == ["spotify:track:t3", "spotify:track:t2"]
+    assert library.search("monday") == "[SEARCH]"
+    assert "monday" not in library._tokens
+    assert len(library) == 2
+
+def test_track_of_two_sources_stays_until_both_drop_it(library: LibraryIndex):
+    library.replace("spotify:playlist:p1", "s1", [item(1, "Blue Monday")])
+    library.replace("collection", "1:", [item(1, "Blue Monday")])
+
+    library.drop("spotify:playlist:p1")
+    assert uris(library.search("blue")) == ["spotify:track:t1"]
+
+    library.drop("collection")
+    assert library.search("blue") == "[SEARCH]"
+    assert (len(library), library._tokens) == (0, [])
+
+def test_sync_only_reloads_what_changed(library: LibraryIndex, spotify: FakeSpotify):
+    first: int = library.sync()
+    assert first == FakeSpotify.PLAYLISTS + 1 # Every playlist and the Liked Songs
+
+    calls: int = sum(spotify.calls.values())
+    assert library.sync() == 0
+    assert sum(spotify.calls.values()) - calls < 10 # Only the playlist pages and the count of the Liked Songs
+
+    assert len(library) > 0
+    assert library.search("track 1").startswith("[SEARCH]\t")
@@ -0,0 +1,87 @@
+import sqlite3
+
+import pytest
+
+import MetadataStore as module
+
+from MetadataStore import MetadataStore
+
+@pytest.fixture
+def clock(monkeypatch) -> list:
+    now: list = [1000.0]
+    monkeypatch.setattr(module.time, "time", lambda: now[0])
+    return now
+
+@pytest.fixture
+def store(tmp_path) -> MetadataStore:
+    store: MetadataStore = MetadataStore(str(tmp_path / "store.db"), max_entries=10)
+    yield store
+    store.close()
+
+def test_entry_expires_after_its_kind_max_age(clock: list, store: MetadataStore):
+    store.put("artist", "spotify:artist:r1", "artist")
+    store.put("album", "spotify:album:a1", "album")
+
+    clock[0] += MetadataStore.MAX_AGES["artist"] + 1
+    assert store.get("artist", "spotify:artist:r1") is None
+    assert store.get("album", "spotify:album:a1") == "album"
+    assert len(store) == 1
+
+def test_playlist_page_is_validated_by_its_snapshot(clock: list, store: MetadataStore):
+    store.put("playlist", "spotify:playlist:p1", "page 0", part="0", snapshot="s1")
+    store.put("playlist", "spotify:playlist:p1", "page 100", part="100", snapshot="s1")
+
+    clock[0] += MetadataStore.MAX_AGES["playlist"] * 10 # A page with a matching snapshot never goes stale
+    assert store.get("playlist", "spotify:playlist:p1", part="0", snapshot="s1") == "page 0"
+
+    # The playlist changed, so every page of it is removed
+    assert store.get("playlist", "spotify:playlist:p1", part="0", snapshot="s2") is None
+    assert len(store) == 0
+
+def test_playlist_page_without_a_snapshot_expires(clock: list, store: MetadataStore):
+    store.put("playlist", "spotify:playlist:p1", "stored without", part="0")
+    store.put("playlist", "spotify:playlist:p2", "read without", part="0", snapshot="s1")
+
+    clock[0] += MetadataStore.MAX_AGES["playlist"] - 1
+    assert store.get("playlist", "spotify:playlist:p1", part="0") == "stored without"
+    assert store.get("playlist", "spotify:playlist:p2", part="0") == "read without"
+
+    clock[0] += 2
+    assert store.get("playlist", "spotify:playlist:p1", part="0") is None
+    assert store.get("playlist", "spotify:playlist:p2", part="0") is None
+
+def test_least_recently_used_are_evicted(clock: list, store: MetadataStore):
+    for x in range(10):
+        clock[0] += 1
+        store.put("album", f"spotify:album:a{x}", str(x))
+
+    clock[0] += 1
+    store.get("album", "spotify:album:a0") # a1 is now the least recently used
+    store.put("album", "spotify:album:a10", "10")
+
+    assert store.get("album", "spotify:album:a0") == "0"
+    assert store.get("album", "spotify:album:a1") is None
+    assert store.get("album", "spotify:album:a2") is None # A tenth more than needed is evicted
+    assert len(store) == 9
+
+def test_invalidate_by_uri_and_kind(clock: list, store: MetadataStore):
+    store.put("album", "spotify:album:a1", "album")
+    store.put("playlist", "spotify:playlist:p1", "page 0", part="0", snapshot="s1")
+    store.put("playlist", "spotify:playlist:p1", "page 100", part="100", snapshot="s1")
+
+    assert store.invalidate("spotify:playlist:p1", kind="playlist") == 2
+    assert store.invalidate(kind="artist") == 0
+    assert store.invalidate() == 1
+
+def test_store_with_raw_objects_still_works(clock: list, tmp_path):
+    path: str = str(tmp_path / "old.db")
+    with sqlite3.connect(path) as connection: # The table of the stores that kept the raw objects too
+        connection.execute("""CREATE TABLE entries (uri TEXT NOT NULL, kind TEXT NOT NULL, part TEXT NOT NULL DEFAULT '', snapshot TEXT,
+                              payload TEXT, raw TEXT, stored REAL NOT NULL, accessed REAL NOT NULL, PRIMARY KEY (uri, kind, part))""")
+    connection.close()
+
+    store: MetadataStore = MetadataStore(path)
+    store.put("album", "spotify:album:a1", "album")
+
+    assert store.get("album", "spotify:album:a1") == "album"
+    store.close()
@@ -0,0 +1,22 @@
+from Metrics import Metrics
+
+def test_made_up_commands_share_one_entry():
+    metrics: Metrics = Metrics(commands=["next", "pause"])
+
+    metrics.command("next", 0.01)
+    for name in ("bogus", "other", 'bogus"cmd'):
+        metrics.command(name, 0.01)
+    metrics.calls("junk", 2)
+
+    assert sorted(metrics._commands) == ["next", "unknown"]
+    assert metrics._commands["unknown"]["latency"].count == 3
+    assert metrics._commands["unknown"]["calls"] == 2
+
+def test_label_values_are_escaped():
+    assert Metrics.label('a"b\\c\nd') == 'a\\"b\\\\c\\nd'
+
+def test_every_command_is_kept_without_a_list():
+    metrics: Metrics = Metrics()
+    metrics.command('odd"name', 0.01)
+
+    assert 'command="odd\\"name"' in metrics.prometheus()
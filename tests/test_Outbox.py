@@ -0,0 +1,117 @@
+import asyncio as aio
+
+import pytest
+
+from Outbox import Outbox, SlowClient
+
+from conftest import FakeWebSocket
+
+CURRENT: str = "[Current]\tTrack {}\tArtist\tspotify:track:t{}"
+INFO: str    = "[Current]\tTrack {}\tArtist\tspotify:track:t{}\n[INIT]\tFalse\tOff\tTrue"
+
+async def stuck(outbox: Outbox):
+    await outbox.send("first") # Hangs in the writer, so the next frames wait in the queue
+    await aio.sleep(0)
+
+def test_newer_state_replaces_the_waiting_one():
+    async def main():
+        websocket: FakeWebSocket = FakeWebSocket()
+        outbox: Outbox           = Outbox(websocket)
+        await stuck(outbox)
+
+        for x in range(3):
+            await outbox.send(CURRENT.format(x, x))
+        await outbox.send("[QUEUE]\trows")
+        await outbox.send(INFO.format(7, 7))
+        await outbox.send(INFO.format(8, 8))
+
+        websocket.open.set()
+        await aio.sleep(0.05)
+        await outbox.close()
+        return (websocket.sent, outbox.collapsed)
+
+    (sent, collapsed) = aio.run(main())
+
+    assert sent == ["first", CURRENT.format(2, 2), "[QUEUE]\trows", INFO.format(8, 8)]
+    assert collapsed == 3
+
+def test_nothing_is_collapsed_when_collapse_is_off():
+    async def main():
+        websocket: FakeWebSocket = FakeWebSocket()
+        outbox: Outbox           = Outbox(websocket)
+        outbox.collapse          = False
+        await stuck(outbox)
+
+        await outbox.send(INFO.format(1, 1))
+        await outbox.send("[DELTA]\tcurrent_info\n=0\t2")
+        await outbox.send(INFO.format(2, 2))
+
+        websocket.open.set()
+        await aio.sleep(0.05)
+        await outbox.close()
+        return (websocket.sent, outbox.collapsed)
+
+    (sent, collapsed) = aio.run(main())
+
+    assert sent == ["first", INFO.format(1, 1), "[DELTA]\tcurrent_info\n=0\t2", INFO.format(2, 2)]
+    assert collapsed == 0
+
+def test_kind_only_covers_frames_made_of_states():
+    outbox: Outbox = Outbox.__new__(Outbox)
+
+    assert outbox.kind(CURRENT.format(1, 1)) == "[Current]"
+    assert outbox.kind(INFO.format(1, 1)) == "[Current][INIT]"
+    assert outbox.kind("[INIT]\tFalse\tOff\tTrue") == "[INIT]"
+    assert outbox.kind("[Current]\tTrack\n[QUEUE]\trows") is None
+    assert outbox.kind("#1\t[INIT]\tFalse\tOff\tTrue") is None
+
+def test_lagging_client_is_downgraded_once_then_disconnected():
+    async def main():
+        websocket: FakeWebSocket = FakeWebSocket()
+        lagged: list             = []
+        outbox: Outbox           = Outbox(websocket, max_lag=0.1, on_lag=lambda: lagged.append(None))
+        await stuck(outbox)
+
+        await aio.sleep(0.15)
+        downgraded: bool = outbox.downgraded
+        await aio.sleep(0.2)
+
+        return (downgraded, len(lagged), websocket.closed, outbox.closed)
+
+    (downgraded, lagged, closed, outbox_closed) = aio.run(main())
+
+    assert downgraded
+    assert lagged == 1
+    assert closed == (1008, "Too far behind")
+    assert outbox_closed
+
+def test_too_many_waiting_frames_disconnect_the_client():
+    async def main():
+        websocket: FakeWebSocket = FakeWebSocket()
+        outbox: Outbox           = Outbox(websocket, max_frames=3, max_lag=0)
+        await stuck(outbox)
+
+        for x in range(3):
+            await outbox.send(f"[QUEUE]\t{x}")
+        await aio.sleep(0)
+
+        with pytest.raises(SlowClient):
+            await outbox.send("[QUEUE]\tlate")
+
+        return websocket.closed
+
+    assert aio.run(main()) == (1008, "Too far behind")
+
+def test_close_empties_the_queue():
+    async def main():
+        websocket: FakeWebSocket = FakeWebSocket()
+        outbox: Outbox           = Outbox(websocket)
+        await stuck(outbox)
+        await outbox.send("[QUEUE]\trows")
+
+        depth: int = len(outbox)
+        await outbox.close()
+
+        return (depth, len(outbox), outbox.lag(), websocket.closed)
+
+    assert aio.run(main()) == (2, 0, 0.0, None)
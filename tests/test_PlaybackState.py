@@ -0,0 +1,90 @@
+import pytest
+
+import PlaybackState as module
+
+from PlaybackState import PlaybackState
+
+@pytest.fixture
+def clock(monkeypatch) -> list:
+    now: list = [1000.0]
+    monkeypatch.setattr(module.time, "monotonic", lambda: now[0])
+    return now
+
+def playback(progress: int = 1000, playing: bool = True, duration: int = 200000) -> dict:
+    return {"is_playing": playing, "progress_ms": progress, "shuffle_state": False, "repeat_state": "off", "item": {"duration_ms": duration}}
+
+def test_fresh_after_a_sync(clock: list):
+    state: PlaybackState = PlaybackState(max_age=5)
+    assert not state.fresh()
+
+    state.sync(playback())
+    assert state.fresh()
+
+def test_stale_after_max_age(clock: list):
+    state: PlaybackState = PlaybackState(max_age=5)
+    state.sync(playback())
+
+    clock[0] += 4.9
+    assert state.fresh()
+
+    clock[0] += 0.2
+    assert not state.fresh()
+
+def test_stale_after_expire_until_the_next_sync(clock: list):
+    state: PlaybackState = PlaybackState()
+    state.sync(playback())
+
+    state.expire()
+    assert not state.fresh()
+
+    state.sync(playback())
+    assert state.fresh()
+
+def test_stale_once_the_track_would_have_ended(clock: list):
+    state: PlaybackState = PlaybackState(max_age=5)
+    state.sync(playback(progress=198000))
+
+    clock[0] += 1
+    assert state.fresh()
+
+    clock[0] += 1.5
+    assert not state.fresh()
+
+def test_progress_moves_only_while_playing(clock: list):
+    state: PlaybackState = PlaybackState()
+
+    state.sync(playback(progress=1000, playing=True))
+    clock[0] += 2
+    assert state.progress() == 3000
+
+    state.sync(playback(progress=1000, playing=False))
+    clock[0] += 2
+    assert state.progress() == 1000
+
+def test_progress_stops_at_the_end_of_the_track(clock: list):
+    state: PlaybackState = PlaybackState()
+    state.sync(playback(progress=199000))
+
+    clock[0] += 10
+    assert state.progress() == 200000
+
+def test_update_pins_the_progress_before_pausing(clock: list):
+    state: PlaybackState = PlaybackState()
+    state.sync(playback(progress=1000))
+
+    clock[0] += 2
+    state.update(is_playing=False)
+    clock[0] += 2
+
+    result: dict = state.as_result()
+    assert result["is_playing"] is False
+    assert result["progress_ms"] == 3000
+
+def test_nothing_playing(clock: list):
+    state: PlaybackState = PlaybackState()
+    state.sync(None)
+
+    state.update(is_playing=True)
+    assert state.fresh()
+    assert state.as_result() is None
+    assert state.progress() == 0
@@ -0,0 +1,66 @@
+import pytest
+
+import ResponseCache as module
+
+from ResponseCache import ResponseCache
+
+@pytest.fixture
+def clock(monkeypatch) -> list:
+    now: list = [1000.0]
+    monkeypatch.setattr(module.time, "monotonic", lambda: now[0])
+    return now
+
+def test_entry_is_fresh_until_its_endpoint_ttl(clock: list):
+    cache: ResponseCache = ResponseCache({"album": 60, "queue": 5})
+    cache.set("album", "a1", "album")
+    cache.set("queue", None, "queue")
+
+    clock[0] += 5
+    assert cache.get("album", "a1") == "album"
+    assert cache.get("queue", None) == "queue"
+
+    clock[0] += 0.1
+    assert cache.get("album", "a1") == "album"
+    assert cache.get("queue", None) is ResponseCache.MISSING
+    assert cache.stats() == {"hits": 3, "misses": 1, "size": 1}
+
+def test_unknown_endpoint_lives_a_minute(clock: list):
+    cache: ResponseCache = ResponseCache({})
+    cache.set("track", "t1", "track")
+
+    clock[0] += 60
+    assert cache.contains("track", "t1")
+
+    clock[0] += 0.1
+    assert not cache.contains("track", "t1")
+
+def test_none_is_a_cached_value(clock: list):
+    cache: ResponseCache = ResponseCache({"current_playback": 5})
+    cache.set("current_playback", None, None)
+
+    assert cache.get("current_playback", None) is None
+
+def test_least_recently_used_is_evicted(clock: list):
+    cache: ResponseCache = ResponseCache({}, max_size=2)
+    cache.set("album", "a1", 1)
+    cache.set("album", "a2", 2)
+
+    cache.get("album", "a1") # a2 is now the least recently used
+    cache.set("album", "a3", 3)
+
+    assert cache.contains("album", "a1")
+    assert not cache.contains("album", "a2")
+    assert cache.contains("album", "a3")
+    assert cache.stats()["size"] == 2
+
+def test_invalidate_by_endpoint_and_key(clock: list):
+    cache: ResponseCache = ResponseCache({})
+    cache.set("album", "a1", 1)
+    cache.set("album", "a2", 2)
+    cache.set("playlist", "p1", 3)
+
+    assert cache.invalidate("album", "a1") == 1
+    assert cache.invalidate("album") == 1
+    assert cache.contains("playlist", "p1")
+    assert cache.invalidate() == 1
+    assert cache.stats()["size"] == 0
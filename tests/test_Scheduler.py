@@ -0,0 +1,115 @@
+import threading
+import time
+
+import pytest
+
+from spotipy.exceptions import SpotifyException
+
+from Scheduler import Scheduler, RateLimited, RequestExpired
+
+def rate_limit(retry_after: str = None) -> SpotifyException:
+    return SpotifyException(429, -1, "Too many requests", headers={"Retry-After": retry_after} if (retry_after is not None) else None)
+
+def test_lanes_go_by_priority():
+    scheduler: Scheduler = Scheduler(rate=5, burst=1)
+    scheduler.acquire(Scheduler.BROWSE, time.monotonic() + 1) # Spends the only token, so the next calls have to wait in line
+    order: list = []
+
+    def call(lane: int):
+        scheduler.acquire(lane, time.monotonic() + 5)
+        order.append(lane)
+
+    # They come in from the lowest to the highest priority, while no token is left
+    threads: list = [threading.Thread(target=call, args=(x,)) for x in (Scheduler.PREFETCH, Scheduler.BROWSE, Scheduler.CONTROL)]
+    for thread in threads:
+        thread.start()
+        time.sleep(0.02)
+    for thread in threads:
+        thread.join()
+
+    assert order == [Scheduler.CONTROL, Scheduler.BROWSE, Scheduler.PREFETCH]
+
+def test_same_lane_goes_in_order():
+    scheduler: Scheduler = Scheduler(rate=20, burst=1)
+    scheduler.acquire(Scheduler.BROWSE, time.monotonic() + 1)
+    order: list = []
+
+    def call(i: int):
+        scheduler.acquire(Scheduler.BROWSE, time.monotonic() + 5)
+        order.append(i)
+
+    threads: list = [threading.Thread(target=call, args=(x,)) for x in range(4)]
+    for thread in threads:
+        thread.start()
+        time.sleep(0.01)
+    for thread in threads:
+        thread.join()
+
+    assert order == [0, 1, 2, 3]
+
+def test_call_is_dropped_after_its_deadline():
+    scheduler: Scheduler = Scheduler(rate=0.01, burst=1)
+    scheduler.acquire(Scheduler.BROWSE, time.monotonic() + 1)
+
+    start: float = time.monotonic()
+    with pytest.raises(RequestExpired):
+        scheduler.acquire(Scheduler.PREFETCH, time.monotonic() + 0.1)
+
+    assert 0.1 <= time.monotonic() - start < 1
+    assert scheduler.expired == 1
+    assert scheduler.depth() == 0
+
+def test_lane_deadline_is_used_by_run():
+    scheduler: Scheduler = Scheduler(rate=0.01, burst=1)
+    scheduler.DEADLINES = {**Scheduler.DEADLINES, Scheduler.PREFETCH: 0.05}
+    scheduler.run(lambda: None)
+
+    with Scheduler.lane(Scheduler.PREFETCH), pytest.raises(RequestExpired):
+        scheduler.run(lambda: None)
+
+def test_rate_limit_is_retried_after_waiting():
+    scheduler: Scheduler = Scheduler(rate=100, burst=10)
+    calls: list          = []
+
+    def call():
+        calls.append(time.monotonic())
+        if (len(calls) == 1):
+            raise rate_limit("0.2")
+        return "ok"
+
+    assert scheduler.run(call) == "ok"
+    assert len(calls) == 2
+    assert calls[1] - calls[0] >= 0.2
+    assert scheduler.rate_limited == 1
+
+def test_rate_limit_past_the_deadline_is_raised():
+    scheduler: Scheduler = Scheduler(rate=100, burst=10)
+
+    def call():
+        raise rate_limit("60")
+
+    with pytest.raises(RateLimited) as error:
+        scheduler.run(call)
+
+    assert error.value.retry_after == 60
+    assert not scheduler.idle() # Every other call of the account waits out the Retry-After too
+
+def test_back_off_without_retry_after_waits_a_second():
+    scheduler: Scheduler = Scheduler()
+
+    assert scheduler.back_off(None) == 1.0
+    assert scheduler.back_off({"Retry-After": "nonsense"}) == 1.0
+    assert scheduler.back_off({"Retry-After": "3"}) == 3.0
+
+def test_other_errors_are_not_retried():
+    scheduler: Scheduler = Scheduler()
+    calls: list          = []
+
+    def call():
+        calls.append(None)
+        raise SpotifyException(404, -1, "Not found")
+
+    with pytest.raises(SpotifyException):
+        scheduler.run(call)
+
+    assert len(calls) == 1
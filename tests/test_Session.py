@@ -0,0 +1,34 @@
+import threading
+
+from Session import Session
+
+PAGE: str = "[PLAYLIST]\tPlaylist\tUser\t3\tspotify:playlist:p1\ticon\n\tTrack 1\tArtist\tspotify:track:t1\ticon\n\tTrack 2\tArtist\tspotify:track:t2\ticon\n"
+
+def test_show_remembers_the_listing():
+    session: Session = Session("1", None)
+    session.show("playlist", PAGE, context="spotify:playlist:p1")
+
+    assert (session.view, session.context) == ("playlist", "spotify:playlist:p1")
+    assert session.following("spotify:track:t1") == ["spotify:track:t1", "spotify:track:t2"]
+    assert session.following("spotify:track:t9") == ["spotify:track:t9"]
+
+def test_replaced_command_does_not_change_what_is_shown():
+    session: Session           = Session("1", None)
+    cancelled: threading.Event = threading.Event()
+    session.show("search", "[SEARCH]\tTrack 3\tArtist\tspotify:track:t3\ticon\n")
+
+    cancelled.set()
+    session.show("playlist", PAGE, context="spotify:playlist:p1", cancelled=cancelled)
+
+    assert (session.view, session.context, session.listing) == ("search", None, ["spotify:track:t3"])
+
+def test_cursor_of_a_replaced_command_is_not_remembered():
+    session: Session           = Session("1", None)
+    cancelled: threading.Event = threading.Event()
+
+    assert session.cursor("spotify:playlist:p1") == 0
+    assert session.cursor("spotify:playlist:p1", 40, cancelled=cancelled) == 40
+
+    cancelled.set()
+    assert session.cursor("spotify:playlist:p1", 80, cancelled=cancelled) == 80 # Its own page still uses it
+    assert session.cursor("spotify:playlist:p1") == 40